@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк памяти при обходе больших списков панели
+
+Сравнивает полный разбор страниц с постраничным обходом PterodactylAPI.iter_users.
+Имитация панели запускается в отдельном процессе, чтобы ее память не попадала в замер.
+
+Запуск: python benchmark_memory.py --users 50000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+import tracemalloc
+import aiohttp
+from mock_panel import MockPanel
+from pterodactyl_api import PterodactylAPI
+
+
+def serve_panel(users: int, port_queue: multiprocessing.Queue) -> None:
+    """Запустить имитацию панели с users пользователями"""
+    async def run():
+        panel = MockPanel()
+        for user_id in range(1, users + 1):
+            panel.users[user_id] = {
+                'id': user_id, 'external_id': f"tg-{user_id}", 'uuid': f"00000000-0000-0000-0000-{user_id:012d}",
+                'username': f"user_{user_id}", 'email': f"user_{user_id}@cloudspb.ru",
+                'first_name': f"user_{user_id}", 'last_name': "User", 'language': 'en',
+                'root_admin': False, '2fa': False, 'created_at': "2024-01-01T00:00:00+00:00",
+                'updated_at': "2024-01-01T00:00:00+00:00",
+            }
+        url = await panel.start()
+        port_queue.put(url)
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+async def load_full_pages(api: PterodactylAPI, per_page: int) -> int:
+    """Прежний подход: полные страницы ответа держатся в памяти до конца обхода"""
+    pages = []
+    page = 1
+    async with aiohttp.ClientSession(timeout=api.timeout) as session:
+        while True:
+            async with session.get(f"{api.api_url}/api/application/users", headers=api.headers,
+                                   params={'page': page, 'per_page': per_page}) as response:
+                data = await response.json()
+            pages.append(data)
+            if page >= data['meta']['pagination']['total_pages']:
+                break
+            page += 1
+    return sum(len(data['data']) for data in pages)
+
+
+async def collect_projections(api: PterodactylAPI, per_page: int) -> int:
+    """Постраничный обход с сохранением компактных проекций"""
+    users = [user async for user in api.iter_users(per_page=per_page)]
+    return len(users)
+
+
+async def stream_only(api: PterodactylAPI, per_page: int) -> int:
+    """Постраничный обход без накопления (проверка, подсчет)"""
+    count = 0
+    async for _ in api.iter_users(per_page=per_page):
+        count += 1
+    return count
+
+
+async def measure(name: str, scenario, api: PterodactylAPI, per_page: int) -> None:
+    """Замерить пиковую память и время сценария"""
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    count = await scenario(api, per_page)
+    elapsed = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {name}: {count} пользователей, пик {peak / 1024 / 1024:.1f} МБ, {elapsed:.2f} с")
+
+
+async def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк памяти при обходе списков панели")
+    parser.add_argument("--users", type=int, default=50000, help="пользователей в панели")
+    parser.add_argument("--per-page", type=int, default=100, help="размер страницы")
+    args = parser.parse_args()
+
+    print(f"🧪 Бенчмарк памяти: {args.users} пользователей, {args.per_page} на странице...\n")
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_panel, args=(args.users, port_queue), daemon=True)
+    server.start()
+    try:
+        url = port_queue.get(timeout=120)
+        api = PterodactylAPI(url, "test-token")
+
+        print("📊 Результаты:")
+        await measure("Полные страницы", load_full_pages, api, args.per_page)
+        await measure("Проекции PanelUser", collect_projections, api, args.per_page)
+        await measure("Потоковый обход", stream_only, api, args.per_page)
+    finally:
+        server.terminate()
+        server.join()
+
+if __name__ == "__main__":
+    asyncio.run(main())
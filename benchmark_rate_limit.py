@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк защиты от спама на большом числе пользователей
+
+Сравнивает прежнюю проверку (список datetime на пользователя, без удаления
+записей) с KeyedRateLimiter: скорость проверки, память на пользователя и
+вытеснение простаивающих ключей.
+
+Запуск: python benchmark_rate_limit.py --users 1000000
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+from utils.rate_limit import KeyedRateLimiter
+
+
+class LegacySpamProtection:
+    """Прежняя логика TelegramBot.is_spam"""
+
+    def __init__(self):
+        self.spam_protection = {}
+
+    def is_spam(self, user_id: int) -> bool:
+        current_time = datetime.now()
+        if user_id not in self.spam_protection:
+            self.spam_protection[user_id] = []
+        self.spam_protection[user_id] = [
+            req_time for req_time in self.spam_protection[user_id]
+            if (current_time - req_time).seconds < 5
+        ]
+        self.spam_protection[user_id].append(current_time)
+        return len(self.spam_protection[user_id]) > 5
+
+
+def run(users: int, check) -> float:
+    """Одно действие каждого пользователя и еще по пять - для первой тысячи, вернуть время"""
+    started = time.perf_counter()
+    for user_id in range(users):
+        check(user_id)
+    for _ in range(5):
+        for user_id in range(1000):
+            check(user_id)
+    return time.perf_counter() - started
+
+
+def measure(name: str, users: int, factory):
+    """Замерить скорость и (отдельным прогоном под tracemalloc) память, вернуть второй экземпляр"""
+    elapsed = run(users, factory()[1])
+    tracemalloc.start()
+    instance, check = factory()
+    run(users, check)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    operations = users + 5000
+    print(f"{name}:")
+    print(f"   {operations / elapsed:,.0f} проверок/с, {elapsed / operations * 1e6:.2f} мкс на проверку")
+    print(f"   Память: {memory / 2**20:.1f} МБ ({memory / users:.0f} байт на пользователя)")
+    return instance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк защиты от спама")
+    parser.add_argument("--users", type=int, default=1_000_000, help="Число разных пользователей")
+    parser.add_argument("--skip-legacy", action="store_true", help="Не замерять прежнюю реализацию")
+    args = parser.parse_args()
+
+    print(f"🧪 Бенчмарк защиты от спама: {args.users:,} пользователей\n")
+
+    if not args.skip_legacy:
+        def legacy_factory():
+            legacy = LegacySpamProtection()
+            return legacy, legacy.is_spam
+        legacy = measure("Список datetime (прежний is_spam)", args.users, legacy_factory)
+        print(f"   Записей после простоя: {len(legacy.spam_protection):,} (не удаляются)\n")
+        del legacy
+
+    clock = [time.monotonic()]
+
+    def limiter_factory():
+        limiter = KeyedRateLimiter(rate=1, burst=5, clock=lambda: clock[0])
+        return limiter, lambda user_id: not limiter.allow(user_id)
+    limiter = measure("KeyedRateLimiter (GCRA)", args.users, limiter_factory)
+    before = len(limiter)
+    clock[0] += 10
+    started = time.perf_counter()
+    evicted = limiter.evict()
+    print(f"   Записей: {before:,}, после простоя вытеснено {evicted:,} "
+          f"за {time.perf_counter() - started:.2f} с, осталось {len(limiter):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк обработки обновлений на синтетической нагрузке
+
+Сравнивает последовательную обработку (как без concurrent_updates),
+SimpleUpdateProcessor PTB (параллельно, без порядка) и PerUserUpdateProcessor
+(параллельно между пользователями, по порядку у каждого). Обработчик
+имитирует задержку запросов к панели и Telegram, часть обновлений -
+медленные (как /deleteserver или создание сервера).
+
+Запуск: python benchmark_updates.py --users 200 --updates 10 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor, SimpleUpdateProcessor
+from utils.update_processor import PerUserUpdateProcessor
+
+
+def make_updates(users: int, per_user: int, slow_share: float, seed: int) -> List[Tuple[Update, float]]:
+    """Обновления пользователей вперемешку с задержкой обработки каждого"""
+    rng = random.Random(seed)
+    updates = []
+    sequence = [user_id for user_id in range(1, users + 1) for _ in range(per_user)]
+    rng.shuffle(sequence)
+    for update_id, user_id in enumerate(sequence, start=1):
+        user = {'id': user_id, 'is_bot': False, 'first_name': "User"}
+        update = Update.de_json({
+            'update_id': update_id,
+            'message': {'message_id': update_id, 'date': 0, 'text': "/check",
+                        'from': user, 'chat': {'id': user_id, 'type': 'private'}},
+        }, None)
+        delay = 1.0 if rng.random() < slow_share else rng.uniform(0.005, 0.05)
+        updates.append((update, delay))
+    return updates
+
+
+async def run(processor: BaseUpdateProcessor, updates: List[Tuple[Update, float]]) -> Dict[str, float]:
+    """Обработать обновления так же, как Application: задача на каждое в порядке получения"""
+    finished: Dict[int, List[int]] = defaultdict(list)
+    latencies = []
+
+    async def handle(update: Update, delay: float, received: float) -> None:
+        await asyncio.sleep(delay)
+        finished[update.effective_user.id].append(update.update_id)
+        latencies.append(time.perf_counter() - received)
+
+    started = time.perf_counter()
+    async with processor:
+        tasks = [
+            asyncio.create_task(processor.process_update(update, handle(update, delay, time.perf_counter())))
+            for update, delay in updates
+        ]
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    out_of_order = sum(1 for ids in finished.values() for a, b in zip(ids, ids[1:]) if a > b)
+    return {
+        'elapsed': elapsed,
+        'throughput': len(updates) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95)],
+        'out_of_order': out_of_order,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк обработки обновлений")
+    parser.add_argument("--users", type=int, default=200, help="Число пользователей")
+    parser.add_argument("--updates", type=int, default=10, help="Обновлений на пользователя")
+    parser.add_argument("--concurrency", type=int, default=64, help="Общий лимит параллельной обработки")
+    parser.add_argument("--slow", type=float, default=0.01, help="Доля медленных (1 с) обновлений")
+    parser.add_argument("--skip-sequential", action="store_true", help="Не замерять последовательную обработку")
+    args = parser.parse_args()
+
+    updates = make_updates(args.users, args.updates, args.slow, seed=42)
+    print(f"🧪 Бенчмарк обработки: {len(updates)} обновлений от {args.users} пользователей, "
+          f"лимит {args.concurrency}\n")
+
+    processors = []
+    if not args.skip_sequential:
+        processors.append(("Последовательно", SimpleUpdateProcessor(1)))
+    processors += [
+        ("SimpleUpdateProcessor (без порядка)", SimpleUpdateProcessor(args.concurrency)),
+        ("PerUserUpdateProcessor", PerUserUpdateProcessor(args.concurrency)),
+    ]
+    for name, processor in processors:
+        result = await run(processor, updates)
+        print(f"{name}:")
+        print(f"   {result['throughput']:.0f} обновлений/с за {result['elapsed']:.2f} с, "
+              f"задержка p50 {result['p50'] * 1000:.0f} мс, p95 {result['p95'] * 1000:.0f} мс")
+        print(f"   Нарушений порядка у пользователя: {result['out_of_order']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
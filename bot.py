@@ -1,24 +1,44 @@
 import os
 import logging
 import asyncio
-from datetime import datetime
+import signal
 from functools import wraps
 from typing import Callable, Any, Coroutine, Dict
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import (
-    Application, CommandHandler, CallbackQueryHandler, 
+    Application, CommandHandler, CallbackQueryHandler, ChatMemberHandler,
     MessageHandler, filters, ContextTypes
 )
 from dotenv import load_dotenv
 
 # Импортируем наши модули
 from db.database import Database
-from subscription_checker import SubscriptionChecker
+from subscription_checker import SubscriptionChecker, parse_channel_rules
 from pterodactyl_api import PterodactylAPI
 from commands.start import StartCommand
 from commands.check import CheckCommand
 from commands.admin import AdminCommands
 from email_handler import EmailHandler
+from provisioning import ProvisioningQueue
+from server_profiles import ServerProfileRegistry
+from warm_pool import WarmPool, parse_hours
+from reconciler import StatusReconciler
+from reclaimer import IdleReclaimer
+from subscription_sweeper import SubscriptionSweeper
+from webhook_server import WebhookServer
+from views import (
+    Html, BANNED, MAIN_MENU, JOB_ACCEPTED, ACTIVE_JOB, SERVER_EXISTS, SERVER_ITEM, ADMIN_LOG_ENTRY,
+    SPAM_TEXT, ACCESS_DENIED_TEXT, ADMIN_UNAVAILABLE_TEXT, SET_EMAIL_TEXT, SERVICE_UNAVAILABLE_TEXT,
+    EMAIL_REQUIRED_TEXT, JOB_CREATE_FAILED_TEXT, NO_SERVERS_TEXT, SERVERS_HEADER, HELP_TEXT,
+    ADMIN_PANEL_TEXT, ADMIN_USERS_TEXT, ADMIN_SERVERS_TEXT, ADMIN_LOGS_HEADER, ADMIN_LOGS_EMPTY_TEXT,
+    BACK_KEYBOARD, MAIN_MENU_KEYBOARD, GET_SERVER_KEYBOARD, MY_SERVER_KEYBOARD, SET_EMAIL_KEYBOARD,
+    SUBSCRIPTION_KEYBOARD, ADMIN_PANEL_KEYBOARD, ADMIN_BACK_KEYBOARD
+)
+from utils.request_context import RequestContext
+from utils.message_editor import MessageEditor
+from utils.rate_limit import KeyedRateLimiter
+from utils.telegram_limiter import FloodControlLimiter
+from utils.update_processor import PerUserUpdateProcessor
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -30,10 +50,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def async_handler(func: Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]]) -> Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]]:
+# Стоимость действий пользователя для защиты от спама (по умолчанию DEFAULT_ACTION_COST):
+# создание сервера и проверка подписки нагружают панель и Telegram, справка - нет
+ACTION_COSTS = {
+    'get_server': 3.0,
+    'check': 2.0,
+    'check_subscription': 2.0,
+    'help': 0.5,
+    'back_to_start': 0.5,
+}
+DEFAULT_ACTION_COST = 1.0
+
+def async_handler(func: Callable[[Update, RequestContext], Coroutine[Any, Any, None]]) -> Callable[[Update, RequestContext], Coroutine[Any, Any, None]]:
     """Декоратор для обработки асинхронных функций"""
     @wraps(func)
-    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def wrapper(update: Update, context: RequestContext) -> None:
         return await func(update, context)
     return wrapper
 
@@ -44,113 +75,284 @@ class TelegramBot:
         self.pterodactyl_token = os.getenv("PTERODACTYL_TOKEN")
         self.pterodactyl_url = os.getenv("PTERODACTYL_URL", "https://panel.cloudspb.ru")
         self.channel_username = os.getenv("CHANNEL_USERNAME", "@CloudSPBru")
+        # Список каналов с минимальным временем подписки ("@канал:минуты,..."), по умолчанию - CHANNEL_USERNAME
+        self.channel_rules = parse_channel_rules(os.getenv("CHANNEL_RULES") or self.channel_username)
+        if not self.channel_rules:
+            raise ValueError("CHANNEL_RULES не содержит ни одного канала")
         
         if not self.bot_token:
             raise ValueError("BOT_TOKEN не найден в переменных окружения")
         
+        # Webhook вместо polling, если задан публичный адрес бота
+        self.webhook_url = os.getenv("WEBHOOK_URL", "").rstrip("/")
+        self.webhook_path = os.getenv("WEBHOOK_PATH", "/telegram")
+        self.webhook_listen = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+        self.webhook_port = int(os.getenv("WEBHOOK_PORT", "8080"))
+        self.webhook_secret = os.getenv("WEBHOOK_SECRET", "")
+        # /health и /metrics - на отдельном служебном адресе, не на публичном (пустой порт - отключены)
+        self.health_listen = os.getenv("HEALTH_LISTEN", "127.0.0.1")
+        self.health_port = int(os.getenv("HEALTH_PORT", "8081") or 0) or None
+        if self.webhook_url and not self.webhook_secret:
+            # Без секрета webhook примет поддельные обновления, а у экземпляров за балансировщиком он общий
+            raise ValueError("WEBHOOK_SECRET не найден в переменных окружения (обязателен при WEBHOOK_URL)")
+        
+        # Создаем приложение; все исходящие запросы бота проходят через планировщик flood control
+        self.application = (
+            Application.builder()
+            .token(self.bot_token)
+            .rate_limiter(FloodControlLimiter(
+                overall_rate=float(os.getenv("TELEGRAM_RATE", "30")),
+                lookup_rate=float(os.getenv("SUBSCRIPTION_API_RATE", "20")),
+                max_retries=int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+            ))
+            # Обновления одного пользователя - по порядку, разных - параллельно
+            .concurrent_updates(PerUserUpdateProcessor(int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))))
+            .post_init(self.post_init)
+            .post_stop(self.post_stop)
+            .post_shutdown(self.post_shutdown)
+            .context_types(ContextTypes(context=RequestContext))
+            .build()
+        )
+        
         # Инициализируем компоненты
-        self.db = Database()
-        self.subscription_checker = SubscriptionChecker(self.bot_token, self.channel_username)
+        # Подписки версий с одним каналом относятся к первому каналу списка
+        self.db = Database(default_channel=self.channel_rules[0].key)
+        self.subscription_checker = SubscriptionChecker(
+            self.application.bot,
+            self.channel_rules,
+            db=self.db,
+            member_ttl=float(os.getenv("SUBSCRIPTION_CACHE_TTL", "300")),
+            negative_ttl=float(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", "15")),
+            channel_ttl=float(os.getenv("CHANNEL_CACHE_TTL", "3600"))
+        )
         
         # Инициализируем Pterodactyl API только если токен есть
         if self.pterodactyl_token:
-            self.pterodactyl_api = PterodactylAPI(self.pterodactyl_url, self.pterodactyl_token)
+            self.pterodactyl_api = PterodactylAPI(
+                self.pterodactyl_url,
+                self.pterodactyl_token,
+                cache_ttl=float(os.getenv("PTERODACTYL_CACHE_TTL", "15")),
+                cache_stale_ttl=float(os.getenv("PTERODACTYL_CACHE_STALE_TTL", "0")),
+                timeout=float(os.getenv("PTERODACTYL_TIMEOUT", "30")),
+                client_token=os.getenv("PTERODACTYL_CLIENT_TOKEN") or None,
+                client_rate_limit=float(os.getenv("PTERODACTYL_CLIENT_RATE_LIMIT", "720")),
+                usage_ttl=float(os.getenv("PTERODACTYL_USAGE_TTL", "10"))
+            )
         else:
             self.pterodactyl_api = None
             logger.warning("PTERODACTYL_TOKEN не найден, функции создания серверов недоступны")
         
+        # Правки сообщений: одинаковые не отправляются (EDIT_TRUST_TTL > 0 ограничивает срок доверия
+        # запомненному тексту при нескольких экземплярах), ход заявки - не чаще раза в PROGRESS_EDIT_INTERVAL секунд
+        self.message_editor = MessageEditor(
+            max_size=int(os.getenv("EDIT_CACHE_SIZE", "10000")),
+            min_interval=float(os.getenv("PROGRESS_EDIT_INTERVAL", "2")),
+            trust_ttl=float(os.getenv("EDIT_TRUST_TTL", "0"))
+        )
+        
+        # Профили серверов и очередь их создания
+        self.server_profiles = ServerProfileRegistry(
+            os.getenv("SERVER_PROFILES_FILE", "server_profiles.json"),
+            refresh_interval=float(os.getenv("SERVER_PROFILES_REFRESH", "3600"))
+        )
+        warm_pool_size = int(os.getenv("WARM_POOL_SIZE", "0"))
+        if self.pterodactyl_api and warm_pool_size > 0:
+            warm_pool_profiles = os.getenv("WARM_POOL_PROFILES", "")
+            self.warm_pool = WarmPool(
+                self.db,
+                self.pterodactyl_api,
+                self.server_profiles,
+                size=warm_pool_size,
+                profile_names=[name.strip() for name in warm_pool_profiles.split(",") if name.strip()],
+                hours=parse_hours(os.getenv("WARM_POOL_HOURS", "2-8")),
+                interval=float(os.getenv("WARM_POOL_INTERVAL", "300"))
+            )
+        else:
+            self.warm_pool = None
+        if self.pterodactyl_api:
+            self.provisioning_queue = ProvisioningQueue(
+                self.db,
+                self.pterodactyl_api,
+                workers=int(os.getenv("PROVISIONING_WORKERS", "2")),
+                profiles=self.server_profiles,
+                warm_pool=self.warm_pool,
+                message_editor=self.message_editor,
+                lease_seconds=float(os.getenv("PROVISIONING_LEASE", "60"))
+            )
+        else:
+            self.provisioning_queue = None
+        
         # Инициализируем команды
         self.start_command = StartCommand(self.db, self.subscription_checker)
         self.check_command = CheckCommand(self.db, self.subscription_checker)
-        self.admin_commands = AdminCommands(self.db, self.pterodactyl_api) if self.pterodactyl_api else None
+        self.admin_commands = AdminCommands(self.db, self.pterodactyl_api, self.provisioning_queue,
+                                            self.message_editor) if self.pterodactyl_api else None
         self.email_handler = EmailHandler(self.db)
         
-        # Создаем приложение
-        self.application = Application.builder().token(self.bot_token).build()
+        # Сверка статусов серверов с панелью
+        if self.admin_commands:
+            self.status_reconciler = StatusReconciler(
+                self.db,
+                self.pterodactyl_api,
+                self.admin_commands.admin_ids,
+                interval=float(os.getenv("RECONCILE_INTERVAL", "300")),
+                per_page=int(os.getenv("RECONCILE_PER_PAGE", "500"))
+            )
+        else:
+            self.status_reconciler = None
+        
+        # Освобождение простаивающих серверов (RECLAIM_INTERVAL=0 - выключено)
+        reclaim_interval = float(os.getenv("RECLAIM_INTERVAL", "0"))
+        if self.pterodactyl_api and reclaim_interval > 0:
+            self.idle_reclaimer = IdleReclaimer(
+                self.db,
+                self.pterodactyl_api,
+                interval=reclaim_interval,
+                warn_days=float(os.getenv("RECLAIM_WARN_DAYS", "7")),
+                suspend_days=float(os.getenv("RECLAIM_SUSPEND_DAYS", "10")),
+                delete_days=float(os.getenv("RECLAIM_DELETE_DAYS", "14")),
+                batch_size=int(os.getenv("RECLAIM_BATCH", "20"))
+            )
+        else:
+            self.idle_reclaimer = None
+        
+        # Перепроверка подписки владельцев серверов (SWEEP_INTERVAL=0 - выключено)
+        sweep_interval = float(os.getenv("SWEEP_INTERVAL", "0"))
+        if self.pterodactyl_api and sweep_interval > 0:
+            self.subscription_sweeper = SubscriptionSweeper(
+                self.db,
+                self.pterodactyl_api,
+                self.subscription_checker,
+                interval=sweep_interval,
+                batch_size=int(os.getenv("SWEEP_BATCH", "100")),
+                concurrency=int(os.getenv("SWEEP_CONCURRENCY", "5")),
+                grace_hours=float(os.getenv("SWEEP_GRACE_HOURS", "24")),
+                delete_days=float(os.getenv("SWEEP_DELETE_DAYS", "7"))
+            )
+        else:
+            self.subscription_sweeper = None
         
-        # Словарь для защиты от спама
-        self.spam_protection = {}
+        # Защита от спама: SPAM_RATE единиц стоимости действий в секунду, запас SPAM_BURST
+        self.spam_limiter = KeyedRateLimiter(
+            rate=float(os.getenv("SPAM_RATE", "1")),
+            burst=float(os.getenv("SPAM_BURST", "5"))
+        )
     
-    def is_spam(self, user_id: int) -> bool:
-        """Проверка на спам - максимум 5 запросов за 5 секунд"""
-        current_time = datetime.now()
-        
-        if user_id not in self.spam_protection:
-            self.spam_protection[user_id] = []
-        
-        # Удаляем старые запросы (старше 5 секунд)
-        self.spam_protection[user_id] = [
-            req_time for req_time in self.spam_protection[user_id]
-            if (current_time - req_time).seconds < 5
-        ]
-        
-        # Добавляем текущий запрос
-        self.spam_protection[user_id].append(current_time)
-        
-        # Проверяем количество запросов за последние 5 секунд
-        if len(self.spam_protection[user_id]) > 5:
-            return True
-        
-        return False
+    async def post_init(self, application: Application) -> None:
+        """Запуск фоновых задач после инициализации приложения"""
+        if self.pterodactyl_api:
+            # Яйца проверяются один раз при запуске, дальше данные берутся из кэша
+            await self.server_profiles.start(self.pterodactyl_api)
+        if self.provisioning_queue:
+            await self.provisioning_queue.start(application.bot)
+        if self.warm_pool:
+            await self.warm_pool.start()
+        if self.status_reconciler:
+            await self.status_reconciler.start(application.bot)
+        if self.idle_reclaimer:
+            await self.idle_reclaimer.start(application.bot)
+        if self.subscription_sweeper:
+            await self.subscription_sweeper.start(application.bot)
+    
+    async def post_stop(self, application: Application) -> None:
+        """Отправить отложенные правки, пока бот еще может делать запросы (при polling
+        post_shutdown вызывается уже после остановки бота)"""
+        await self.message_editor.close()
+    
+    async def post_shutdown(self, application: Application) -> None:
+        """Остановка фоновых задач"""
+        if self.subscription_sweeper:
+            await self.subscription_sweeper.stop()
+        if self.idle_reclaimer:
+            await self.idle_reclaimer.stop()
+        if self.status_reconciler:
+            await self.status_reconciler.stop()
+        if self.warm_pool:
+            await self.warm_pool.stop()
+        if self.provisioning_queue:
+            await self.provisioning_queue.stop()
+        await self.server_profiles.stop()
+        # Отложенный ход заявок и массовых команд показывается сразу, а не теряется; при webhook
+        # бот здесь еще работает, при polling отправляется отложенное после post_stop
+        await self.message_editor.close()
     
-    async def handle_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    def is_spam(self, user_id: int, action: str = "") -> bool:
+        """Проверка на спам: действия пользователя расходуют лимит по своей стоимости"""
+        return not self.spam_limiter.allow(user_id, ACTION_COSTS.get(action, DEFAULT_ACTION_COST))
+    
+    async def handle_start(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /start"""
         if not update.effective_user or not update.message:
             return
             
-        if self.is_spam(update.effective_user.id):
-            await update.message.reply_text("⚠️ Слишком много запросов. Подождите немного.")
+        if self.is_spam(update.effective_user.id, "start"):
+            await update.message.reply_text(SPAM_TEXT)
             return
         
         await self.start_command.handle(update, context)
     
-    async def handle_check(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_chat_member(self, update: Update, context: RequestContext) -> None:
+        """Обработчик вступления в канал и выхода из него (бот должен быть администратором канала)"""
+        if update.chat_member:
+            self.subscription_checker.handle_member_update(update.chat_member)
+    
+    async def handle_check(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /check"""
         if not update.effective_user or not update.message:
             return
             
-        if self.is_spam(update.effective_user.id):
-            await update.message.reply_text("⚠️ Слишком много запросов. Подождите немного.")
+        if self.is_spam(update.effective_user.id, "check"):
+            await update.message.reply_text(SPAM_TEXT)
             return
         
         await self.check_command.handle(update, context)
     
-    async def handle_ban(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_ban(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /ban"""
         if self.admin_commands:
             await self.admin_commands.handle_ban(update, context)
     
-    async def handle_unban(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_unban(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /unban"""
         if self.admin_commands:
             await self.admin_commands.handle_unban(update, context)
     
-    async def handle_give_server(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_give_server(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /giveserver"""
         if self.admin_commands:
             await self.admin_commands.handle_give_server(update, context)
     
-    async def handle_delete_server(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_delete_server(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /deleteserver"""
         if self.admin_commands:
             await self.admin_commands.handle_delete_server(update, context)
     
-    async def handle_admin_panel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_power(self, update: Update, context: RequestContext) -> None:
+        """Обработчик команды /power"""
+        if self.admin_commands:
+            await self.admin_commands.handle_power(update, context)
+    
+    async def handle_api_metrics(self, update: Update, context: RequestContext) -> None:
+        """Обработчик команды /apimetrics"""
+        if self.admin_commands:
+            await self.admin_commands.handle_api_metrics(update, context)
+    
+    async def handle_admin_panel(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /admin"""
         if self.admin_commands:
             await self.admin_commands.handle_admin_panel(update, context)
     
-    async def handle_server_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_server_info(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /serverinfo"""
         if self.admin_commands:
             await self.admin_commands.handle_server_info(update, context)
     
-    async def handle_list_servers(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_list_servers(self, update: Update, context: RequestContext) -> None:
         """Обработчик команды /listservers"""
         if self.admin_commands:
             await self.admin_commands.handle_list_servers(update, context)
     
-    async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_callback_query(self, update: Update, context: RequestContext) -> None:
         """Обработчик callback запросов"""
         query = update.callback_query
         if not query or not query.from_user:
@@ -158,330 +360,175 @@ class TelegramBot:
             
         await query.answer()
         
-        if self.is_spam(query.from_user.id):
-            await query.edit_message_text("⚠️ Слишком много запросов. Подождите немного.")
+        if self.is_spam(query.from_user.id, query.data or ""):
+            await self.message_editor.edit_query(query, SPAM_TEXT)
             return
         
         if not query.data:
             return
             
         if query.data == "set_email":
-            await self.handle_set_email(query)
+            await self.handle_set_email(query, context)
         elif query.data == "get_server":
-            await self.handle_get_server(query)
+            await self.handle_get_server(query, context)
         elif query.data == "my_servers":
-            await self.handle_my_servers(query)
+            await self.handle_my_servers(query, context)
         elif query.data == "help":
-            await self.handle_help(query)
+            await self.handle_help(query, context)
         elif query.data == "check_subscription":
-            await self.handle_check_subscription(query)
+            await self.handle_check_subscription(query, context)
         elif query.data == "back_to_start":
-            await self.handle_back_to_start(query)
+            await self.handle_back_to_start(query, context)
         elif query.data.startswith("admin_"):
-            await self.handle_admin_callback(query)
+            await self.handle_admin_callback(query, context)
     
-    async def handle_set_email(self, query) -> None:
+    async def handle_set_email(self, query, context: RequestContext) -> None:
         """Обработчик установки email"""
-        keyboard = [
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            "📧 <b>Укажите ваш email:</b>\n\n"
-            "Отправьте ваш email в следующем сообщении.\n"
-            "Он будет использован для входа в панель управления сервером.\n\n"
-            "Пример: user@example.com",
-            reply_markup=reply_markup,
-            parse_mode='HTML'
-        )
+        await self.message_editor.edit_query(query, SET_EMAIL_TEXT, reply_markup=BACK_KEYBOARD, parse_mode='HTML')
     
-    async def handle_get_server(self, query) -> None:
+    async def handle_get_server(self, query, context: RequestContext) -> None:
         """Обработчик получения сервера"""
         user_id = query.from_user.id
         
         # Проверяем, не заблокирован ли пользователь
-        user_data = self.db.get_user(user_id)
+        user_data = context.get_user(self.db, user_id)
         if user_data and user_data.get('is_banned'):
             ban_reason = user_data.get('ban_reason', 'Причина не указана')
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                f"🚫 <b>Вы заблокированы!</b>\n\n"
-                f"Причина: {ban_reason}\n\n"
-                "Обратитесь к администратору для разблокировки.",
-                reply_markup=reply_markup,
+            await self.message_editor.edit_query(
+                query,
+                BANNED.render(reason=ban_reason),
+                reply_markup=BACK_KEYBOARD,
                 parse_mode='HTML'
             )
             return
         # Проверяем подписку
-        subscription_info = await self.subscription_checker.check_subscription(user_id)
+        subscription_info = await context.check_subscription(self.subscription_checker, user_id)
         if not subscription_info['is_subscribed'] or not subscription_info['meets_time_requirement']:
-            subscription_message = await self.subscription_checker.get_subscription_message(user_id)
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
+            subscription_message = await self.subscription_checker.get_subscription_message(user_id, subscription_info)
+            await self.message_editor.edit_query(
+                query,
                 subscription_message,
-                reply_markup=reply_markup,
+                reply_markup=BACK_KEYBOARD,
                 parse_mode='HTML'
             )
             return
         
-        # Проверяем, есть ли уже сервер у пользователя
-        user_servers = self.db.get_user_servers(user_id)
-        if user_servers:
-            keyboard = [
-                [InlineKeyboardButton("📊 Мой сервер", callback_data="my_servers")],
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                "❌ <b>У вас уже есть сервер!</b>\n\n"
-                f"Количество серверов: {len(user_servers)}\n"
-                "Один пользователь может иметь только один сервер.",
-                reply_markup=reply_markup,
+        if not self.provisioning_queue:
+            await self.message_editor.edit_query(
+                query,
+                SERVICE_UNAVAILABLE_TEXT,
+                reply_markup=BACK_KEYBOARD,
                 parse_mode='HTML'
             )
             return
-        # Проверяем, указан ли email
-        if not user_data or not user_data.get('email'):
-            keyboard = [
-                [InlineKeyboardButton("📧 Указать email", callback_data="set_email")],
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                "📧 <b>Сначала укажите email!</b>\n\n"
-                "Для получения сервера необходимо указать email.\n"
-                "Используйте кнопку '📧 Указать email'",
-                reply_markup=reply_markup,
-                parse_mode='HTML'
-            )
-            return
-        # Проверяем email на уникальность в Pterodactyl
-        if self.pterodactyl_api:
-            try:
-                exists = await self.pterodactyl_api.check_user_exists(email=user_data.get('email'))
-                if exists:
-                    keyboard = [
-                        [InlineKeyboardButton("📧 Указать другой email", callback_data="set_email")],
-                        [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    await query.edit_message_text(
-                        "❌ <b>Ошибка: Email уже используется в панели!</b>\n\n"
-                        "Код ошибки: EMAIL_EXISTS\n"
-                        "Пожалуйста, укажите другой email.",
-                        reply_markup=reply_markup,
-                        parse_mode='HTML'
-                    )
-                    return
-            except Exception as e:
-                logger.error(f"Ошибка проверки email в Pterodactyl: {e}")
-                keyboard = [
-                    [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await query.edit_message_text(
-                    "❌ <b>Ошибка при проверке email!</b>\n\n"
-                    "Код ошибки: PT_EMAIL_CHECK\n"
-                    "Попробуйте позже.",
-                    reply_markup=reply_markup,
+        # Двойное нажатие не должно создать второй сервер: проверка и постановка заявки
+        # выполняются под блокировкой пользователя, а в базе активная заявка может быть только одна
+        async with self.provisioning_queue.user_locks(user_id):
+            active_job = self.db.get_active_provisioning_job(user_id)
+            if active_job:
+                await self.show_active_job(query, active_job)
+                return
+            # Проверяем, есть ли уже сервер у пользователя
+            user_servers = context.get_user_servers(self.db, user_id)
+            if user_servers:
+                await self.message_editor.edit_query(
+                    query,
+                    SERVER_EXISTS.render(count=len(user_servers)),
+                    reply_markup=MY_SERVER_KEYBOARD,
                     parse_mode='HTML'
                 )
                 return
-        # Генерируем безопасные учетные данные с попытками
-        from utils.credentials import CredentialGenerator
-        max_attempts = 3
-        server_result = None
-        credentials = None
-        error_code = None
-        error_message = None
-        if not self.pterodactyl_api:
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                "❌ <b>Сервис создания серверов недоступен!</b>\n\nКод ошибки: PT_API_UNAVAILABLE\nОбратитесь к администратору.",
-                reply_markup=reply_markup,
-                parse_mode='HTML'
-            )
-            return
-        for attempt in range(max_attempts):
-            credentials = CredentialGenerator.generate_credentials(user_id, user_data.get('first_name'))
-            # Проверяем уникальность username/email в Pterodactyl
-            try:
-                exists = await self.pterodactyl_api.check_user_exists(
-                    email=credentials['email'],
-                    username=credentials['username']
+            # Проверяем, указан ли email
+            if not user_data or not user_data.get('email'):
+                await self.message_editor.edit_query(
+                    query,
+                    EMAIL_REQUIRED_TEXT,
+                    reply_markup=SET_EMAIL_KEYBOARD,
+                    parse_mode='HTML'
                 )
-            except Exception as e:
-                logger.error(f"Ошибка проверки username/email в Pterodactyl: {e}")
-                exists = True
-            if exists:
-                if attempt == max_attempts - 1:
-                    error_code = "PT_USER_EXISTS"
-                    error_message = "Не удалось сгенерировать уникальные данные для панели. Попробуйте позже."
-                continue
-            # Пытаемся создать сервер
-            await query.edit_message_text(
-                f"⏳ <b>Создаем сервер... (попытка {attempt+1})</b>\n\nПожалуйста, подождите.",
+                return
+            # Ставим заявку в очередь: сервер создадут фоновые воркеры и обновят это сообщение
+            await self.message_editor.edit_query(
+                query,
+                JOB_ACCEPTED.render(position=self.provisioning_queue.next_position()),
                 parse_mode='HTML'
             )
-            try:
-                server_result = await self.pterodactyl_api.create_server_with_credentials(credentials)
-                if server_result:
-                    break
-                else:
-                    error_code = "PT_SERVER_CREATE"
-                    error_message = "Ошибка при создании сервера."
-            except Exception as e:
-                logger.error(f"Ошибка создания сервера: {e}")
-                error_code = "PT_SERVER_CREATE_EXCEPTION"
-                error_message = f"Ошибка при создании сервера: {e}"
-        if not server_result or not credentials:
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                f"❌ <b>Ошибка при создании сервера!</b>\n\nКод ошибки: {error_code or 'UNKNOWN'}\n{error_message or ''}\nОбратитесь к администратору.",
-                reply_markup=reply_markup,
+            chat_id = query.message.chat_id if query.message else user_id
+            message_id = query.message.message_id if query.message else None
+            job, created = self.provisioning_queue.request(user_id, chat_id, message_id)
+        if job and not created:
+            # Заявку успел поставить другой экземпляр бота
+            await self.show_active_job(query, job)
+        elif not job:
+            await self.message_editor.edit_query(
+                query,
+                JOB_CREATE_FAILED_TEXT,
+                reply_markup=BACK_KEYBOARD,
                 parse_mode='HTML'
             )
-            return
-        server_id = server_result.get('attributes', {}).get('identifier') if server_result else None
-        server_name = server_result.get('attributes', {}).get('name') if server_result else None
-        if not server_id or not server_name:
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                "❌ <b>Ошибка при получении данных сервера!</b>\n\nКод ошибки: PT_SERVER_ATTRS\nОбратитесь к администратору.",
-                reply_markup=reply_markup,
+    
+    async def show_active_job(self, query, job: Dict[str, Any]) -> None:
+        """Показать ход уже созданной заявки вместо постановки новой"""
+        if not query.message:
+            await self.message_editor.edit_query(
+                query,
+                ACTIVE_JOB.render(progress=self.provisioning_queue.progress_text(job)),
                 parse_mode='HTML'
             )
             return
-        # Сохраняем в базу данных с учетными данными
-        if self.db.create_server_with_credentials(user_id, server_id, server_name, credentials):
-            keyboard = [
-                [InlineKeyboardButton("📊 Мой сервер", callback_data="my_servers")],
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                f"✅ <b>Сервер создан успешно!</b>\n\n"
-                f"Server ID: {server_id}\n"
-                f"Username: {credentials['username']}\n"
-                f"Password: {credentials['password']}\n"
-                f"Email: {credentials['email']}\n\n"
-                "Данные для входа в панель управления.",
-                reply_markup=reply_markup,
-                parse_mode='HTML'
-            )
-        else:
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                "❌ <b>Ошибка при сохранении сервера!</b>\n\nКод ошибки: DB_SERVER_SAVE\nОбратитесь к администратору.",
-                reply_markup=reply_markup,
-                parse_mode='HTML'
-            )
+        if (query.message.chat_id, query.message.message_id) == (job['chat_id'], job['message_id']):
+            # Сообщение заявки обновляют воркеры: устаревший этап мог бы затереть результат
+            return
+        # Воркеры будут обновлять и это сообщение, вплоть до итога
+        await self.provisioning_queue.watch(job['id'], query.message.chat_id, query.message.message_id)
     
-    async def handle_my_servers(self, query) -> None:
+    async def handle_my_servers(self, query, context: RequestContext) -> None:
         """Обработчик просмотра серверов"""
         user_id = query.from_user.id
-        user_servers = self.db.get_user_servers(user_id)
+        user_servers = context.get_user_servers(self.db, user_id)
         
         if not user_servers:
-            keyboard = [
-                [InlineKeyboardButton("🖥️ Получить сервер", callback_data="get_server")],
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
-                "📊 <b>У вас нет серверов</b>\n\n"
-                "Используйте кнопку '🖥️ Получить сервер' для создания сервера.",
-                reply_markup=reply_markup,
+            await self.message_editor.edit_query(
+                query,
+                NO_SERVERS_TEXT,
+                reply_markup=GET_SERVER_KEYBOARD,
                 parse_mode='HTML'
             )
             return
         
-        server_text = "📊 <b>Ваши серверы:</b>\n\n"
-        for i, server in enumerate(user_servers, 1):
-            server_text += (
-                f"<b>Сервер {i}:</b>\n"
-                f"ID: {server['pterodactyl_id']}\n"
-                f"Название: {server['server_name']}\n"
-                f"Username: {server.get('username', 'Не указан')}\n"
-                f"Email: {server.get('email', 'Не указан')}\n"
-                f"Статус: {server['status']}\n"
-                f"Создан: {server['created_at']}\n\n"
+        server_text = SERVERS_HEADER + "".join(
+            SERVER_ITEM.render(
+                number=i,
+                server_id=server['pterodactyl_id'],
+                name=server['server_name'],
+                username=server.get('username', 'Не указан'),
+                email=server.get('email', 'Не указан'),
+                status=server['status'],
+                created_at=server['created_at']
             )
+            for i, server in enumerate(user_servers, 1)
+        )
         
-        keyboard = [
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(server_text, reply_markup=reply_markup, parse_mode='HTML')
+        await self.message_editor.edit_query(query, server_text, reply_markup=BACK_KEYBOARD, parse_mode='HTML')
     
-    async def handle_help(self, query) -> None:
+    async def handle_help(self, query, context: RequestContext) -> None:
         """Обработчик помощи"""
-        help_text = (
-            "ℹ️ <b>Помощь</b>\n\n"
-            "<b>Команды:</b>\n"
-            "/start - Главное меню\n"
-            "/check - Проверить подписку\n"
-            "/help - Эта справка\n\n"
-            "<b>Как получить сервер:</b>\n"
-            "1. Подпишитесь на наш канал\n"
-            "2. Подождите минимум 10 минут\n"
-            "3. Укажите ваш email\n"
-            "4. Получите сервер\n\n"
-            "<b>Поддержка:</b>\n"
-            "По всем вопросам обращайтесь к администратору."
-        )
-        
-        keyboard = [
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(help_text, reply_markup=reply_markup, parse_mode='HTML')
+        await self.message_editor.edit_query(query, HELP_TEXT, reply_markup=BACK_KEYBOARD, parse_mode='HTML')
     
-    async def handle_check_subscription(self, query) -> None:
+    async def handle_check_subscription(self, query, context: RequestContext) -> None:
         """Обработчик повторной проверки подписки"""
         user_id = query.from_user.id
-        subscription_message = await self.subscription_checker.get_subscription_message(user_id)
+        subscription_info = await context.check_subscription(self.subscription_checker, user_id)
+        subscription_message = await self.subscription_checker.get_subscription_message(user_id, subscription_info)
         
-        keyboard = [
-            [InlineKeyboardButton("🖥️ Получить сервер", callback_data="get_server")],
-            [InlineKeyboardButton("📧 Указать email", callback_data="set_email")],
-            [InlineKeyboardButton("📊 Мои серверы", callback_data="my_servers")],
-            [InlineKeyboardButton("🔄 Проверить снова", callback_data="check_subscription")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
+        await self.message_editor.edit_query(
+            query,
             subscription_message,
-            reply_markup=reply_markup,
+            reply_markup=SUBSCRIPTION_KEYBOARD,
             parse_mode='HTML'
         )
     
-    async def handle_back_to_start(self, query) -> None:
+    async def handle_back_to_start(self, query, context: RequestContext) -> None:
         """Обработчик кнопки 'Назад' - возврат в главное меню"""
         user = query.from_user
         
@@ -492,49 +539,34 @@ class TelegramBot:
             first_name=user.first_name,
             last_name=user.last_name
         )
+        context.invalidate(('user', user.id))
         
         # Проверяем подписку
-        subscription_message = await self.subscription_checker.get_subscription_message(user.id)
-        
-        # Создаем клавиатуру
-        keyboard = [
-            [InlineKeyboardButton("📧 Указать email", callback_data="set_email")],
-            [InlineKeyboardButton("🖥️ Получить сервер", callback_data="get_server")],
-            [InlineKeyboardButton("📊 Мой сервер", callback_data="my_servers")],
-            [InlineKeyboardButton("ℹ️ Помощь", callback_data="help")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        welcome_text = (
-            f"👋 <b>Главное меню</b>\n\n"
-            f"{subscription_message}\n\n"
-            "Выберите действие:"
-        )
+        subscription_info = await context.check_subscription(self.subscription_checker, user.id)
+        subscription_message = await self.subscription_checker.get_subscription_message(user.id, subscription_info)
         
-        await query.edit_message_text(
-            welcome_text,
-            reply_markup=reply_markup,
+        await self.message_editor.edit_query(
+            query,
+            MAIN_MENU.render(subscription=Html(subscription_message)),
+            reply_markup=MAIN_MENU_KEYBOARD,
             parse_mode='HTML'
         )
     
-    async def handle_admin_callback(self, query) -> None:
+    async def handle_admin_callback(self, query, context: RequestContext) -> None:
         """Обработчик админских callback"""
         if not self.admin_commands or not self.admin_commands.is_admin(query.from_user.id):
-            await query.edit_message_text("❌ Доступ запрещен")
+            await self.message_editor.edit_query(query, ACCESS_DENIED_TEXT)
             return
         
         if query.data == "admin_stats":
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="admin_panel")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
             if not self.admin_commands:
-                await query.edit_message_text("❌ Админские функции недоступны")
+                await self.message_editor.edit_query(query, ADMIN_UNAVAILABLE_TEXT)
                 return
             
             stats = self.admin_commands.get_statistics()
+            subscription_stats = self.subscription_checker.stats()
+            edit_stats = self.message_editor.stats()
+            last_sweep = self.db.get_last_subscription_sweep()
             if stats:
                 stats_text = (
                     "📊 <b>Статистика бота</b>\n\n"
@@ -546,94 +578,90 @@ class TelegramBot:
                     f"🖥️ <b>Серверы:</b>\n"
                     f"• Всего: {stats.get('total_servers', 0)}\n"
                     f"• Активных: {stats.get('active_servers', 0)}\n"
-                    f"• Новых за 24ч: {stats.get('new_servers_today', 0)}"
+                    f"• Новых за 24ч: {stats.get('new_servers_today', 0)}\n\n"
+                    f"♻️ <b>Освобождено за простой:</b>\n"
+                    f"• Приостановлено: {stats.get('reclaimed_suspended', 0)} "
+                    f"({stats.get('reclaimed_suspended_memory', 0)} МБ RAM)\n"
+                    f"• Удалено: {stats.get('reclaimed_deleted', 0)} "
+                    f"({stats.get('reclaimed_deleted_memory', 0)} МБ RAM, "
+                    f"{stats.get('reclaimed_deleted_disk', 0)} МБ диска)\n\n"
+                    f"⚡ <b>Кэш панели:</b>\n"
+                    f"• Попаданий: {stats.get('cache_hit_rate', 0.0):.0%}\n"
+                    f"• Запросов в панель: {stats.get('cache_misses', 0)}\n\n"
+                    f"📡 <b>Проверка подписки:</b>\n"
+                    f"• Запросов к Telegram: {subscription_stats['api_calls']}\n"
+                    f"• Сэкономлено: {subscription_stats['channel_saved'] + subscription_stats['member_saved']} "
+                    f"(канал {subscription_stats['channel_saved']}, подписка {subscription_stats['member_saved']})\n"
+                    f"• Повторов после flood control: {self.application.bot.rate_limiter.retries}\n"
+                    f"• Правок сообщений: {edit_stats['sent']}, без изменений пропущено: {edit_stats['skipped']}, "
+                    f"объединено: {edit_stats['debounced']}"
                 )
+                if last_sweep:
+                    throughput = last_sweep['checked'] / last_sweep['elapsed'] if last_sweep['elapsed'] else 0.0
+                    stats_text += (
+                        f"\n\n🔁 <b>Последняя перепроверка подписок:</b>\n"
+                        f"• Завершена: {last_sweep['finished_at']}\n"
+                        f"• Проверено: {last_sweep['checked']} ({throughput:.1f}/с)\n"
+                        f"• Отписались: {last_sweep['unsubscribed']}, приостановлено: {last_sweep['suspended']}, "
+                        f"удалено: {last_sweep['deleted']}, восстановлено: {last_sweep['restored']}"
+                    )
             else:
                 stats_text = "❌ Ошибка получения статистики"
             
-            await query.edit_message_text(
+            await self.message_editor.edit_query(
+                query,
                 stats_text,
-                reply_markup=reply_markup,
+                reply_markup=ADMIN_BACK_KEYBOARD,
                 parse_mode='HTML'
             )
         elif query.data == "admin_users":
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="admin_panel")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
-                "👥 <b>Управление пользователями</b>\n\n"
-                "Команды:\n"
-                "/ban &lt;user_id&gt; [причина] - Забанить пользователя\n"
-                "/unban &lt;user_id&gt; - Разбанить пользователя",
-                reply_markup=reply_markup,
+            await self.message_editor.edit_query(
+                query,
+                ADMIN_USERS_TEXT,
+                reply_markup=ADMIN_BACK_KEYBOARD,
                 parse_mode='HTML'
             )
         elif query.data == "admin_servers":
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="admin_panel")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
-                "🖥️ <b>Управление серверами</b>\n\n"
-                "Команды:\n"
-                "/giveserver &lt;user_id&gt; - Выдать сервер\n"
-                "/deleteserver &lt;user_id&gt; - Удалить сервер",
-                reply_markup=reply_markup,
+            await self.message_editor.edit_query(
+                query,
+                ADMIN_SERVERS_TEXT,
+                reply_markup=ADMIN_BACK_KEYBOARD,
                 parse_mode='HTML'
             )
         elif query.data == "admin_logs":
             if not self.admin_commands:
-                await query.edit_message_text("❌ Админские функции недоступны")
+                await self.message_editor.edit_query(query, ADMIN_UNAVAILABLE_TEXT)
                 return
             
             logs = self.admin_commands.get_recent_logs(10)
             if logs:
-                logs_text = "📝 <b>Последние действия администраторов:</b>\n\n"
-                for log in logs:
-                    admin_name = log.get('admin_first_name', 'Неизвестно')
-                    action = log.get('action_type', 'Неизвестно')
-                    details = log.get('details', '')
-                    created_at = log.get('created_at', '')
-                    
-                    logs_text += (
-                        f"👤 <b>{admin_name}</b>\n"
-                        f"Действие: {action}\n"
-                        f"Детали: {details}\n"
-                        f"Время: {created_at}\n\n"
+                logs_text = ADMIN_LOGS_HEADER + "".join(
+                    ADMIN_LOG_ENTRY.render(
+                        admin=log.get('admin_first_name') or ('Система' if log.get('admin_id') == 0 else 'Неизвестно'),
+                        action=log.get('action_type', 'Неизвестно'),
+                        details=log.get('details', ''),
+                        created_at=log.get('created_at', '')
                     )
+                    for log in logs
+                )
             else:
-                logs_text = "📝 <b>Логи действий</b>\n\nНет записей"
+                logs_text = ADMIN_LOGS_EMPTY_TEXT
             
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="admin_panel")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
+            await self.message_editor.edit_query(
+                query,
                 logs_text,
-                reply_markup=reply_markup,
+                reply_markup=ADMIN_BACK_KEYBOARD,
                 parse_mode='HTML'
             )
         elif query.data == "admin_panel":
-            keyboard = [
-                [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
-                [InlineKeyboardButton("👥 Управление пользователями", callback_data="admin_users")],
-                [InlineKeyboardButton("🖥️ Управление серверами", callback_data="admin_servers")],
-                [InlineKeyboardButton("📝 Логи действий", callback_data="admin_logs")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
-                "🔧 <b>Панель администратора</b>\n\n"
-                "Выберите действие:",
-                reply_markup=reply_markup,
+            await self.message_editor.edit_query(
+                query,
+                ADMIN_PANEL_TEXT,
+                reply_markup=ADMIN_PANEL_KEYBOARD,
                 parse_mode='HTML'
             )
     
-    async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_text_message(self, update: Update, context: RequestContext) -> None:
         """Обработчик текстовых сообщений (для email)"""
         if not update.message or not update.message.text:
             return
@@ -643,15 +671,10 @@ class TelegramBot:
             return
         
         # Проверяем, не заблокирован ли пользователь
-        user_data = self.db.get_user(user.id)
+        user_data = context.get_user(self.db, user.id)
         if user_data and user_data.get('is_banned'):
             ban_reason = user_data.get('ban_reason', 'Причина не указана')
-            await update.message.reply_text(
-                f"🚫 <b>Вы заблокированы!</b>\n\n"
-                f"Причина: {ban_reason}\n\n"
-                "Обратитесь к администратору для разблокировки.",
-                parse_mode='HTML'
-            )
+            await update.message.reply_text(BANNED.render(reason=ban_reason), parse_mode='HTML')
             return
         
         # Обрабатываем email
@@ -659,16 +682,20 @@ class TelegramBot:
     
     def setup_handlers(self):
         """Настройка обработчиков"""
+        # Обработчики блокирующие: параллельность между пользователями и порядок
+        # обновлений одного пользователя обеспечивает PerUserUpdateProcessor
         # Команды пользователей
-        self.application.add_handler(CommandHandler("start", self.handle_start, block=False))
-        self.application.add_handler(CommandHandler("check", self.handle_check, block=False))
-        self.application.add_handler(CommandHandler("help", self.handle_help, block=False))
+        self.application.add_handler(CommandHandler("start", self.handle_start))
+        self.application.add_handler(CommandHandler("check", self.handle_check))
+        self.application.add_handler(CommandHandler("help", self.handle_help))
         
         # Админские команды
-        self.application.add_handler(CommandHandler("ban", self.handle_ban, block=False))
-        self.application.add_handler(CommandHandler("unban", self.handle_unban, block=False))
+        self.application.add_handler(CommandHandler("ban", self.handle_ban))
+        self.application.add_handler(CommandHandler("unban", self.handle_unban))
         self.application.add_handler(CommandHandler("giveserver", self.handle_give_server))
         self.application.add_handler(CommandHandler("deleteserver", self.handle_delete_server))
+        self.application.add_handler(CommandHandler("power", self.handle_power))
+        self.application.add_handler(CommandHandler("apimetrics", self.handle_api_metrics))
         self.application.add_handler(CommandHandler("admin", self.handle_admin_panel))
         self.application.add_handler(CommandHandler("serverinfo", self.handle_server_info))
         self.application.add_handler(CommandHandler("listservers", self.handle_list_servers))
@@ -676,14 +703,54 @@ class TelegramBot:
         # Callback обработчики
         self.application.add_handler(CallbackQueryHandler(self.handle_callback_query))
         
+        # Подписки на канал
+        self.application.add_handler(ChatMemberHandler(self.handle_chat_member, ChatMemberHandler.CHAT_MEMBER))
+        
         # Обработчик сообщений для email
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text_message))
     
+    async def run_webhook(self) -> None:
+        """Работа через webhook на встроенном aiohttp сервере (до SIGINT/SIGTERM)"""
+        server = WebhookServer(
+            self.application,
+            self.webhook_path,
+            self.webhook_secret,
+            render_metrics=self.pterodactyl_api.metrics.render_prometheus if self.pterodactyl_api else None
+        )
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        
+        async with self.application:
+            # post_init/post_shutdown PTB вызывает сам только в run_polling/run_webhook
+            await self.post_init(self.application)
+            await self.application.start()
+            await server.start(self.webhook_listen, self.webhook_port, self.health_listen, self.health_port)
+            try:
+                # Несколько экземпляров за балансировщиком ставят один и тот же webhook
+                await self.application.bot.set_webhook(
+                    url=f"{self.webhook_url}{self.webhook_path}",
+                    secret_token=self.webhook_secret,
+                    allowed_updates=Update.ALL_TYPES
+                )
+                logger.info(f"Webhook установлен: {self.webhook_url}{self.webhook_path}")
+                await stop_event.wait()
+            finally:
+                # Webhook не удаляем: остальные экземпляры продолжают принимать обновления
+                await server.stop()
+                await self.application.stop()
+                await self.post_shutdown(self.application)
+    
     def run(self):
         """Запуск бота"""
         self.setup_handlers()
         logger.info("Бот запущен")
-        self.application.run_polling()
+        if self.webhook_url:
+            asyncio.run(self.run_webhook())
+        else:
+            # chat_member не входит в обновления по умолчанию, его нужно запросить явно
+            self.application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == "__main__":
     bot = TelegramBot()
@@ -1,19 +1,35 @@
+import asyncio
+import io
 import logging
 import os
 from datetime import datetime, timedelta
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram import Update
 from db.database import Database
-from pterodactyl_api import PterodactylAPI
-from utils.credentials import CredentialGenerator
+from typing import Optional, List, Dict, Any
+from pterodactyl_api import PterodactylAPI, PterodactylError
+from provisioning import ProvisioningQueue
+from utils.message_editor import MessageEditor
+from utils.request_context import RequestContext
+from views import (
+    ADMIN_PANEL_TEXT, ADMIN_PANEL_KEYBOARD, GIVE_PROFILE_NOT_FOUND, GIVE_IN_PROGRESS, GIVE_SERVER_EXISTS,
+    GIVE_ACCEPTED
+)
 
 logger = logging.getLogger(__name__)
 
 class AdminCommands:
-    def __init__(self, db: Database, pterodactyl_api: PterodactylAPI):
+    def __init__(self, db: Database, pterodactyl_api: PterodactylAPI,
+                 provisioning_queue: Optional[ProvisioningQueue] = None,
+                 message_editor: Optional[MessageEditor] = None):
         self.db = db
         self.pterodactyl_api = pterodactyl_api
+        self.provisioning_queue = provisioning_queue
+        self.message_editor = message_editor or MessageEditor()
         self.admin_ids = [int(id.strip()) for id in os.getenv("ADMIN_IDS", "").split(",") if id.strip()]
+        # Сколько серверов удалять одновременно
+        self.delete_concurrency = max(1, int(os.getenv("DELETE_CONCURRENCY", "5")))
+        # Сколько сигналов питания отправлять одновременно (частоту ограничивает PterodactylAPI)
+        self.power_concurrency = max(1, int(os.getenv("POWER_CONCURRENCY", "10")))
     
     def is_admin(self, user_id: int) -> bool:
         """Проверить, является ли пользователь администратором"""
@@ -22,26 +38,25 @@ class AdminCommands:
     async def get_server_info(self, server_id: str) -> str:
         """Получить подробную информацию о сервере"""
         try:
-            # Получаем информацию из Pterodactyl
-            server_info = await self.pterodactyl_api.get_server_info(server_id)
+            # Панель, потребление ресурсов и запись в базе запрашиваются одновременно
+            server_info, usage, db_server = await asyncio.gather(
+                self.pterodactyl_api.get_server_info(server_id),
+                self.pterodactyl_api.get_server_resources(server_id),
+                asyncio.to_thread(self.db.get_server_with_owner, server_id)
+            )
             if not server_info:
                 return "❌ Сервер не найден в панели Pterodactyl"
             
-            # Получаем информацию из базы данных
-            db_server = self.db.get_server(server_id)
             if not db_server:
                 return "❌ Сервер не найден в базе данных"
             
-            # Получаем информацию о владельце (по id из таблицы users)
-            user_data = self.db.get_user_by_id(db_server['user_id']) if hasattr(self.db, 'get_user_by_id') else None
             owner_info = "👤 <b>Владелец</b>\nИнформация о владельце не найдена"
-            
-            if user_data:
+            if db_server.get('owner_telegram_id'):
                 owner_info = (
                     "👤 <b>Владелец</b>\n"
-                    f"ID: {user_data.get('telegram_id', 'Не указан')}\n"
-                    f"Username: @{user_data.get('username', 'Не указан')}\n"
-                    f"Имя: {user_data.get('first_name', 'Не указано')}"
+                    f"ID: {db_server.get('owner_telegram_id')}\n"
+                    f"Username: @{db_server.get('owner_username') or 'Не указан'}\n"
+                    f"Имя: {db_server.get('owner_first_name') or 'Не указано'}"
                 )
             
             # Получаем параметры сервера
@@ -61,14 +76,39 @@ class AdminCommands:
                 f"Статус: {db_server.get('status', 'Не указан')}\n"
                 f"Создан: {db_server.get('created_at', 'Не указано')}\n\n"
                 f"{owner_info}\n\n"
-                f"{server_params}"
+                f"{server_params}\n\n"
+                f"{self._format_usage(usage, server_limits)}"
             )
             return info
         except Exception as e:
             logger.error(f"Ошибка получения информации о сервере: {e}")
             return "❌ Ошибка получения информации о сервере"
     
-    async def handle_server_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @staticmethod
+    def _format_usage(usage: Optional[dict], limits: dict) -> str:
+        """Текущее потребление ресурсов относительно лимитов"""
+        if not usage:
+            return "📈 <b>Нагрузка</b>\nНет данных (client API недоступен)"
+        
+        resources = usage.get('resources', {})
+        memory_mb = resources.get('memory_bytes', 0) / 1024 / 1024
+        disk_mb = resources.get('disk_bytes', 0) / 1024 / 1024
+        
+        def of_limit(value: float, limit) -> str:
+            return f" из {limit} ({value / limit * 100:.0f}%)" if limit else ""
+        
+        uptime_minutes = resources.get('uptime', 0) // 60000
+        return (
+            "📈 <b>Нагрузка</b>\n"
+            f"Состояние: {usage.get('current_state', 'неизвестно')}"
+            f"{' (приостановлен)' if usage.get('is_suspended') else ''}\n"
+            f"CPU: {resources.get('cpu_absolute', 0):.1f}%{of_limit(resources.get('cpu_absolute', 0), limits.get('cpu'))}\n"
+            f"RAM: {memory_mb:.0f} MB{of_limit(memory_mb, limits.get('memory'))}\n"
+            f"Диск: {disk_mb:.0f} MB{of_limit(disk_mb, limits.get('disk'))}\n"
+            f"Аптайм: {uptime_minutes // 60} ч {uptime_minutes % 60} мин"
+        )
+    
+    async def handle_server_info(self, update: Update, context: RequestContext):
         """Обработчик команды /serverinfo"""
         if not update or not update.effective_user or not update.message:
             return
@@ -90,7 +130,7 @@ class AdminCommands:
         info = await self.get_server_info(server_id)
         await update.message.reply_text(info, parse_mode='HTML')
     
-    async def handle_list_servers(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_list_servers(self, update: Update, context: RequestContext):
         """Обработчик команды /listservers"""
         if not update or not update.effective_user or not update.message:
             return
@@ -147,6 +187,14 @@ class AdminCommands:
             new_users_today = len(self.db.get_users_created_after(yesterday))
             new_servers_today = len(self.db.get_servers_created_after(yesterday))
             
+            # Статистика кэша панели
+            cache_stats = self.pterodactyl_api.server_info_cache.stats()
+            
+            # Ресурсы, освобожденные у простаивающих серверов
+            reclaimed = self.db.get_reclaim_stats()
+            suspended = reclaimed.get('suspend', {})
+            deleted = reclaimed.get('delete', {})
+            
             return {
                 'total_users': total_users,
                 'banned_users': banned_users,
@@ -154,7 +202,14 @@ class AdminCommands:
                 'total_servers': total_servers,
                 'active_servers': active_servers,
                 'new_users_today': new_users_today,
-                'new_servers_today': new_servers_today
+                'new_servers_today': new_servers_today,
+                'cache_hit_rate': cache_stats['hit_rate'],
+                'cache_misses': cache_stats['misses'],
+                'reclaimed_suspended': suspended.get('servers', 0),
+                'reclaimed_suspended_memory': suspended.get('memory', 0),
+                'reclaimed_deleted': deleted.get('servers', 0),
+                'reclaimed_deleted_memory': deleted.get('memory', 0),
+                'reclaimed_deleted_disk': deleted.get('disk', 0)
             }
         except Exception as e:
             logger.error(f"Ошибка получения статистики: {e}")
@@ -168,7 +223,7 @@ class AdminCommands:
             logger.error(f"Ошибка получения логов: {e}")
             return []
     
-    async def handle_ban(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_ban(self, update: Update, context: RequestContext):
         """Забанить пользователя"""
         if not update or not update.effective_user or not update.message:
             return
@@ -199,7 +254,7 @@ class AdminCommands:
         else:
             try:
                 user_id = int(target)
-                user_data = self.db.get_user(user_id)
+                user_data = context.get_user(self.db, user_id)
             except ValueError:
                 await update.message.reply_text("❌ Неверный формат ID пользователя")
                 return
@@ -210,6 +265,7 @@ class AdminCommands:
         
         # Баним пользователя
         if self.db.ban_user(user_data['telegram_id'], reason or ""):
+            context.invalidate(('user', user_data['telegram_id']))
             self.db.log_admin_action(
                 update.effective_user.id,
                 "ban_user",
@@ -227,7 +283,7 @@ class AdminCommands:
         else:
             await update.message.reply_text("❌ Ошибка при блокировке пользователя")
     
-    async def handle_unban(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_unban(self, update: Update, context: RequestContext):
         """Разбанить пользователя"""
         if not update or not update.effective_user or not update.message:
             return
@@ -256,7 +312,7 @@ class AdminCommands:
         else:
             try:
                 user_id = int(target)
-                user_data = self.db.get_user(user_id)
+                user_data = context.get_user(self.db, user_id)
             except ValueError:
                 await update.message.reply_text("❌ Неверный формат ID пользователя")
                 return
@@ -267,6 +323,7 @@ class AdminCommands:
         
         # Разбаниваем пользователя
         if self.db.unban_user(user_data['telegram_id']):
+            context.invalidate(('user', user_data['telegram_id']))
             self.db.log_admin_action(
                 update.effective_user.id,
                 "unban_user",
@@ -282,7 +339,7 @@ class AdminCommands:
         else:
             await update.message.reply_text("❌ Ошибка при разблокировке пользователя")
     
-    async def handle_give_server(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_give_server(self, update: Update, context: RequestContext):
         """Выдать сервер пользователю с автоматической генерацией учетных данных"""
         if not update or not update.effective_user or not update.message:
             return
@@ -293,15 +350,30 @@ class AdminCommands:
         
         if not context.args or len(context.args) < 1:
             await update.message.reply_text(
-                "❌ <b>Использование:</b> /giveserver &lt;user_id или username&gt;\n\n"
+                "❌ <b>Использование:</b> /giveserver &lt;user_id или username&gt; [профиль]\n\n"
                 "Примеры:\n"
                 "/giveserver 123456789\n"
-                "/giveserver @username",
+                "/giveserver @username minecraft",
                 parse_mode='HTML'
             )
             return
         
         target = context.args[0]
+        profile_name = context.args[1] if len(context.args) > 1 else None
+        
+        if not self.provisioning_queue:
+            await update.message.reply_text("❌ Очередь создания серверов недоступна")
+            return
+        
+        # Проверяем профиль сервера
+        profiles = self.provisioning_queue.profiles
+        if not profiles.get(profile_name):
+            await update.message.reply_text(
+                GIVE_PROFILE_NOT_FOUND.render(profile=profile_name or profiles.default_name,
+                                              profiles=', '.join(profiles.names()) or 'нет'),
+                parse_mode='HTML'
+            )
+            return
         
         # Определяем пользователя
         user_data = None
@@ -311,7 +383,7 @@ class AdminCommands:
         else:
             try:
                 user_id = int(target)
-                user_data = self.db.get_user(user_id)
+                user_data = context.get_user(self.db, user_id)
             except ValueError:
                 await update.message.reply_text("❌ Неверный формат ID пользователя")
                 return
@@ -320,69 +392,49 @@ class AdminCommands:
             await update.message.reply_text("❌ Пользователь не найден")
             return
         
-        # Проверяем, есть ли уже сервер у пользователя
-        user_servers = self.db.get_user_servers(user_data['telegram_id'])
-        if user_servers:
-            await update.message.reply_text(
-                f"❌ <b>У пользователя уже есть сервер!</b>\n\n"
-                f"ID: {user_data['telegram_id']}\n"
-                f"Username: @{user_data['username']}\n"
-                f"Количество серверов: {len(user_servers)}",
-                parse_mode='HTML'
-            )
-            return
-        
-        # Генерируем учетные данные
-        credentials = CredentialGenerator.generate_credentials(
-            user_data['telegram_id'], 
-            user_data['first_name']
-        )
-        
-        # Создаем сервер
-        server_result = await self.pterodactyl_api.create_server_with_credentials(credentials)
-        if server_result:
-            server_id = server_result.get('attributes', {}).get('identifier')
-            server_name = server_result.get('attributes', {}).get('name')
-            
-            # Сохраняем в базу данных
-            if self.db.create_server_with_credentials(user_data['telegram_id'], server_id, server_name, credentials):
-                self.db.log_admin_action(
-                    update.effective_user.id,
-                    "give_server",
-                    user_data['telegram_id'],
-                    f"Server ID: {server_id}, Username: {credentials['username']}"
+        telegram_id = user_data['telegram_id']
+        async with self.provisioning_queue.user_locks(telegram_id):
+            active_job = self.db.get_active_provisioning_job(telegram_id)
+            if active_job:
+                await update.message.reply_text(
+                    GIVE_IN_PROGRESS.render(progress=self.provisioning_queue.progress_text(active_job)),
+                    parse_mode='HTML'
                 )
-                
-                # Отправляем данные пользователю
-                try:
-                    await update.get_bot().send_message(
-                        chat_id=user_data['telegram_id'],
-                        text=f"🎉 <b>Вам выдан сервер!</b>\n\n"
-                             f"Server ID: {server_id}\n"
-                             f"Username: {credentials['username']}\n"
-                             f"Password: {credentials['password']}\n"
-                             f"Email: {credentials['email']}\n\n"
-                             f"Данные для входа в панель управления.",
-                        parse_mode='HTML'
-                    )
-                except Exception as e:
-                    logger.error(f"Ошибка отправки данных пользователю: {e}")
-                
+                return
+            # Проверяем, есть ли уже сервер у пользователя
+            user_servers = context.get_user_servers(self.db, user_data['telegram_id'])
+            if user_servers:
                 await update.message.reply_text(
-                    f"✅ <b>Сервер выдан!</b>\n\n"
-                    f"Пользователь: {user_data['first_name']} (@{user_data['username']})\n"
-                    f"Server ID: {server_id}\n"
-                    f"Username: {credentials['username']}\n"
-                    f"Email: {credentials['email']}\n\n"
-                    f"Данные отправлены пользователю.",
+                    GIVE_SERVER_EXISTS.render(telegram_id=user_data['telegram_id'], username=user_data['username'],
+                                              count=len(user_servers)),
                     parse_mode='HTML'
                 )
-            else:
-                await update.message.reply_text("❌ Ошибка при сохранении сервера в базу данных")
-        else:
-            await update.message.reply_text("❌ Ошибка при создании сервера в Pterodactyl")
+                return
+            
+            # Сервер создадут воркеры очереди: они обновят это сообщение и отправят данные пользователю
+            status_message = await update.message.reply_text(
+                GIVE_ACCEPTED.render(first_name=user_data['first_name'], username=user_data['username'],
+                                     profile=profile_name or profiles.default_name,
+                                     position=self.provisioning_queue.next_position()),
+                parse_mode='HTML'
+            )
+            job, created = self.provisioning_queue.request(
+                telegram_id,
+                status_message.chat_id,
+                status_message.message_id,
+                requested_by=update.effective_user.id,
+                profile=profile_name
+            )
+        if job and not created:
+            await self.message_editor.edit_message(
+                status_message,
+                GIVE_IN_PROGRESS.render(progress=self.provisioning_queue.progress_text(job)),
+                parse_mode='HTML'
+            )
+        elif not job:
+            await self.message_editor.edit_message(status_message, "❌ Ошибка при постановке заявки в очередь")
     
-    async def handle_delete_server(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_delete_server(self, update: Update, context: RequestContext):
         """Удалить сервер пользователя"""
         if not update or not update.effective_user or not update.message:
             return
@@ -411,7 +463,7 @@ class AdminCommands:
         else:
             try:
                 user_id = int(target)
-                user_data = self.db.get_user(user_id)
+                user_data = context.get_user(self.db, user_id)
             except ValueError:
                 await update.message.reply_text("❌ Неверный формат ID пользователя")
                 return
@@ -421,7 +473,7 @@ class AdminCommands:
             return
         
         # Получаем серверы пользователя
-        user_servers = self.db.get_user_servers(user_data['telegram_id'])
+        user_servers = context.get_user_servers(self.db, user_data['telegram_id'])
         if not user_servers:
             await update.message.reply_text(
                 f"❌ <b>У пользователя нет серверов!</b>\n\n"
@@ -439,24 +491,52 @@ class AdminCommands:
         
         deleted_count = 0
         failed_servers = []
+        total = len(user_servers)
+        semaphore = asyncio.Semaphore(self.delete_concurrency)
         
-        for server in user_servers:
+        async def teardown(server: Dict[str, Any]):
+            """Удалить сервер из панели и базы данных"""
             server_id = server['pterodactyl_id']
-            
-            # Проверяем существование сервера в Pterodactyl
-            server_info = await self.pterodactyl_api.get_server_info(server_id)
-            if not server_info:
-                logger.warning(f"Сервер {server_id} не найден в Pterodactyl, удаляем из базы")
-                if self.db.delete_server(server_id):
-                    deleted_count += 1
-                continue
-            
-            # Пытаемся удалить сервер
-            if await self.pterodactyl_api.delete_server(server_id):
-                if self.db.delete_server(server_id):
-                    deleted_count += 1
+            async with semaphore:
+                panel_id = server.get('panel_server_id')
+                if not panel_id:
+                    # Сервер сохранен без числового ID - ищем его в панели по идентификатору
+                    try:
+                        panel_id = await self.pterodactyl_api.get_server_id(server_id)
+                    except PterodactylError as e:
+                        logger.error(f"Ошибка поиска сервера {server_id} в панели: {e}")
+                        return server_id, False
+                    if not panel_id:
+                        logger.info(f"Сервера {server_id} уже нет в панели")
+                        return server_id, self.db.delete_server(server_id)
+                # 404 от DELETE по числовому ID означает, что сервера уже нет
+                if not await self.pterodactyl_api.delete_server(panel_id, server_id):
+                    return server_id, False
+                return server_id, self.db.delete_server(server_id)
+        
+        tasks = [asyncio.create_task(teardown(server)) for server in user_servers]
+        for completed, task in enumerate(asyncio.as_completed(tasks), 1):
+            server_id, deleted = await task
+            if deleted:
+                deleted_count += 1
             else:
                 failed_servers.append(server_id)
+            
+            # Прогресс обновляется не чаще интервала редактора, итог покажет отчет
+            if completed < total:
+                try:
+                    await self.message_editor.edit_message(
+                        status_message,
+                        f"⏳ <b>Удаление серверов...</b>\n\n"
+                        f"Обработано: {completed}/{total}\n"
+                        f"Удалено: {deleted_count}",
+                        parse_mode='HTML',
+                        progress=True
+                    )
+                except Exception as e:
+                    logger.warning(f"Не удалось обновить прогресс удаления: {e}")
+        
+        context.invalidate(('servers', user_data['telegram_id']))
         
         # Формируем отчет
         report = f"✅ <b>Результат удаления серверов</b>\n\n"
@@ -476,10 +556,143 @@ class AdminCommands:
                 f"Удалено серверов: {deleted_count}, Ошибок: {len(failed_servers)}"
             )
         
-        await status_message.edit_text(report, parse_mode='HTML')
+        await self.message_editor.edit_message(status_message, report, parse_mode='HTML')
     
-    async def handle_admin_panel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Панель администратора"""
+    POWER_SIGNALS = ("start", "stop", "restart", "kill")
+    
+    async def select_power_targets(self, target_filter: str) -> Optional[List[str]]:
+        """Серверы бота по фильтру node:N, profile:имя или all
+        
+        Возвращает None, если фильтр неверный или панель недоступна.
+        """
+        servers = [server for server in self.db.get_all_servers() if server.get('status') != 'missing']
+        if target_filter == "all":
+            return [server['pterodactyl_id'] for server in servers]
+        
+        kind, _, value = target_filter.partition(":")
+        if kind == "profile" and value:
+            return [server['pterodactyl_id'] for server in servers if server.get('profile') == value]
+        if kind == "node" and value.isdigit():
+            # Нода сервера известна только панели
+            try:
+                on_node = {panel_server.identifier async for panel_server in self.pterodactyl_api.iter_servers()
+                           if panel_server.node == int(value)}
+            except PterodactylError as e:
+                logger.error(f"Ошибка получения серверов ноды {value}: {e}")
+                return None
+            return [server['pterodactyl_id'] for server in servers if server['pterodactyl_id'] in on_node]
+        return None
+    
+    async def handle_power(self, update: Update, context: RequestContext):
+        """Массовое управление питанием серверов"""
+        if not update or not update.effective_user or not update.message:
+            return
+            
+        if not self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Доступ запрещен", parse_mode='HTML')
+            return
+        
+        if not context.args or len(context.args) < 2 or context.args[0] not in self.POWER_SIGNALS:
+            await update.message.reply_text(
+                "❌ <b>Использование:</b> /power &lt;start|stop|restart|kill&gt; &lt;node:N|profile:имя|all&gt;\n\n"
+                "Примеры:\n"
+                "/power stop node:2\n"
+                "/power restart profile:minecraft\n"
+                "/power start all",
+                parse_mode='HTML'
+            )
+            return
+        
+        signal, target_filter = context.args[0], context.args[1]
+        server_ids = await self.select_power_targets(target_filter)
+        if server_ids is None:
+            await update.message.reply_text("❌ Неверный фильтр или панель недоступна")
+            return
+        if not server_ids:
+            await update.message.reply_text("📊 Нет серверов по этому фильтру")
+            return
+        
+        status_message = await update.message.reply_text(
+            f"⏳ <b>Сигнал {signal}: {target_filter}</b>\n\nСерверов: {len(server_ids)}",
+            parse_mode='HTML'
+        )
+        
+        succeeded = 0
+        failed_servers = []
+        total = len(server_ids)
+        semaphore = asyncio.Semaphore(self.power_concurrency)
+        
+        async def send(server_id: str):
+            async with semaphore:
+                return server_id, await self.pterodactyl_api.send_power_signal(server_id, signal)
+        
+        tasks = [asyncio.create_task(send(server_id)) for server_id in server_ids]
+        for completed, task in enumerate(asyncio.as_completed(tasks), 1):
+            server_id, ok = await task
+            if ok:
+                succeeded += 1
+            else:
+                failed_servers.append(server_id)
+            
+            # Прогресс обновляется не чаще интервала редактора, итог покажет отчет
+            if completed < total:
+                try:
+                    await self.message_editor.edit_message(
+                        status_message,
+                        f"⏳ <b>Сигнал {signal}: {target_filter}</b>\n\n"
+                        f"Обработано: {completed}/{total}\n"
+                        f"Успешно: {succeeded}\n"
+                        f"Ошибок: {len(failed_servers)}",
+                        parse_mode='HTML',
+                        progress=True
+                    )
+                except Exception as e:
+                    logger.warning(f"Не удалось обновить прогресс сигнала питания: {e}")
+        
+        report = (
+            f"{'✅' if not failed_servers else '⚠️'} <b>Сигнал {signal}: {target_filter}</b>\n\n"
+            f"Серверов: {total}\n"
+            f"Успешно: {succeeded}\n"
+        )
+        if failed_servers:
+            report += f"\n❌ <b>Не удалось ({len(failed_servers)}):</b>\n"
+            for server_id in failed_servers[:30]:
+                report += f"• {server_id}\n"
+            if len(failed_servers) > 30:
+                report += f"... и еще {len(failed_servers) - 30}\n"
+        
+        self.db.log_admin_action(
+            update.effective_user.id,
+            "power",
+            None,
+            f"Сигнал: {signal}, Фильтр: {target_filter}, Успешно: {succeeded}, Ошибок: {len(failed_servers)}"
+        )
+        
+        await self.message_editor.edit_message(status_message, report, parse_mode='HTML')
+    
+    def format_api_metrics(self, limit: int = 15) -> str:
+        """Сводка задержек и ошибок запросов к панели"""
+        rows = self.pterodactyl_api.metrics.snapshot()
+        if not rows:
+            return "📈 Запросов к панели еще не было"
+        
+        text = "📈 <b>Запросы к панели</b> (по суммарному времени)\n\n"
+        for row in rows[:limit]:
+            statuses = ", ".join(f"{status}: {count}" for status, count in sorted(row['statuses'].items()))
+            response_kb = row['response_bytes'] / row['count'] / 1024 if row['count'] else 0
+            text += (
+                f"<code>{row['method']} {row['endpoint']}</code>\n"
+                f"Запросов: {row['count']}, ошибок: {row['errors']} ({statuses})\n"
+                f"Среднее: {row['avg'] * 1000:.0f} мс, p50 ≤ {row['p50'] * 1000:.0f} мс, "
+                f"p95 ≤ {row['p95'] * 1000:.0f} мс\n"
+                f"Ответ: {response_kb:.1f} КБ в среднем\n\n"
+            )
+        if len(rows) > limit:
+            text += f"... и еще эндпоинтов: {len(rows) - limit}"
+        return text
+    
+    async def handle_api_metrics(self, update: Update, context: RequestContext):
+        """Обработчик команды /apimetrics"""
         if not update or not update.effective_user or not update.message:
             return
             
@@ -487,18 +700,25 @@ class AdminCommands:
             await update.message.reply_text("❌ Доступ запрещен", parse_mode='HTML')
             return
         
-        keyboard = [
-            [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
-            [InlineKeyboardButton("👥 Управление пользователями", callback_data="admin_users")],
-            [InlineKeyboardButton("🖥️ Управление серверами", callback_data="admin_servers")],
-            [InlineKeyboardButton("📝 Логи действий", callback_data="admin_logs")]
-        ]
+        if context.args and context.args[0] == "export":
+            # Экспорт в формате Prometheus
+            document = io.BytesIO(self.pterodactyl_api.metrics.render_prometheus().encode())
+            await update.message.reply_document(document=document, filename="pterodactyl_metrics.prom")
+            return
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        await update.message.reply_text(self.format_api_metrics(), parse_mode='HTML')
+    
+    async def handle_admin_panel(self, update: Update, context: RequestContext):
+        """Панель администратора"""
+        if not update or not update.effective_user or not update.message:
+            return
+            
+        if not self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Доступ запрещен", parse_mode='HTML')
+            return
         
         await update.message.reply_text(
-            "🔧 <b>Панель администратора</b>\n\n"
-            "Выберите действие:",
-            reply_markup=reply_markup,
+            ADMIN_PANEL_TEXT,
+            reply_markup=ADMIN_PANEL_KEYBOARD,
             parse_mode='HTML'
         )
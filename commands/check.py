@@ -1,8 +1,12 @@
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram import Update
 from db.database import Database
 from subscription_checker import SubscriptionChecker
+from utils.request_context import RequestContext
+from views import (
+    Html, BANNED, CHECK_STATUS, CHECK_READY_TITLE, CHECK_WAITING_TITLE, CHECK_READY_FOOTER,
+    CHECK_WAITING_FOOTER, CHECK_READY_KEYBOARD, subscribe_keyboard
+)
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +15,7 @@ class CheckCommand:
         self.db = db
         self.subscription_checker = subscription_checker
     
-    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle(self, update: Update, context: RequestContext):
         """Обработчик команды /check"""
         user = update.effective_user
         
@@ -19,74 +23,37 @@ class CheckCommand:
             return
         
         # Проверяем, не заблокирован ли пользователь
-        user_data = self.db.get_user(user.id)
+        user_data = context.get_user(self.db, user.id)
         if user_data and user_data.get('is_banned'):
             ban_reason = user_data.get('ban_reason', 'Причина не указана')
             if update.message:
-                await update.message.reply_text(
-                    f"🚫 <b>Вы заблокированы!</b>\n\n"
-                    f"Причина: {ban_reason}\n\n"
-                    "Обратитесь к администратору для разблокировки.",
-                    parse_mode='HTML'
-                )
+                await update.message.reply_text(BANNED.render(reason=ban_reason), parse_mode='HTML')
             return
         
         # Проверяем подписку
-        subscription_info = await self.subscription_checker.check_subscription(user.id)
+        subscription_info = await context.check_subscription(self.subscription_checker, user.id)
         
         # Обновляем время проверки подписки
         self.db.update_subscription_check(user.id)
         
-        # Создаем клавиатуру
-        keyboard = []
-        
         if subscription_info['is_subscribed'] and subscription_info['meets_time_requirement']:
-            keyboard.append([InlineKeyboardButton("🖥️ Получить сервер", callback_data="get_server")])
+            reply_markup = CHECK_READY_KEYBOARD
         else:
-            keyboard.append([InlineKeyboardButton("📢 Подписаться на канал", 
-                                               url=f"https://t.me/{self.subscription_checker.channel_username}")])
-        
-        keyboard.extend([
-            [InlineKeyboardButton("📧 Указать email", callback_data="set_email")],
-            [InlineKeyboardButton("📊 Мой сервер", callback_data="my_servers")],
-            [InlineKeyboardButton("🔄 Проверить снова", callback_data="check_subscription")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-        ])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+            # Кнопка на каждый канал без подписки (все каналы, если проверка не удалась)
+            missing = subscription_info['missing'] or ([] if subscription_info['is_subscribed'] else
+                                                       [rule.username for rule in self.subscription_checker.rules])
+            reply_markup = subscribe_keyboard(tuple(missing))
         
         # Формируем сообщение о статусе
         if subscription_info['is_subscribed']:
-            if subscription_info['meets_time_requirement']:
-                status_text = (
-                    "✅ <b>Подписка активна!</b>\n\n"
-                    f"Статус: {subscription_info['status']}\n"
-                )
-                if subscription_info['subscription_duration']:
-                    status_text += f"Время подписки: {subscription_info['subscription_duration']}\n"
-                status_text += "\nВы можете получить сервер!"
-            else:
-                duration = subscription_info['subscription_duration']
-                if duration:
-                    remaining = self.subscription_checker.min_subscription_time - duration
-                    status_text = (
-                        "⏳ <b>Подписка активна, но недостаточно времени!</b>\n\n"
-                        f"Вы подписаны на: {duration}\n"
-                        f"Необходимо подписаться минимум на: {self.subscription_checker.min_subscription_time}\n"
-                        f"Осталось ждать: {remaining}"
-                    )
-                else:
-                    status_text = (
-                        "⏳ <b>Подписка активна, но недостаточно времени!</b>\n\n"
-                        f"Необходимо подписаться минимум на: {self.subscription_checker.min_subscription_time}\n"
-                        "Попробуйте позже."
-                    )
-        else:
-            status_text = (
-                "❌ <b>Вы не подписаны на наш канал!</b>\n\n"
-                "Для получения сервера необходимо подписаться на канал:\n"
-                f"<a href='https://t.me/{self.subscription_checker.channel_username}'>@{self.subscription_checker.channel_username}</a>"
+            ready = subscription_info['meets_time_requirement']
+            status_text = CHECK_STATUS.render(
+                title=CHECK_READY_TITLE if ready else CHECK_WAITING_TITLE,
+                channels=self._channels_text(subscription_info),
+                footer=CHECK_READY_FOOTER if ready else CHECK_WAITING_FOOTER
             )
+        else:
+            status_text = await self.subscription_checker.get_subscription_message(user.id, subscription_info)
         
         if update.message:
             await update.message.reply_text(
@@ -94,3 +61,15 @@ class CheckCommand:
                 reply_markup=reply_markup,
                 parse_mode='HTML'
             )
+    
+    def _channels_text(self, subscription_info) -> Html:
+        """Статус подписки по каждому каналу"""
+        lines = []
+        for result, rule in zip(subscription_info['channels'], self.subscription_checker.rules):
+            line = f"{rule.link}: {result['status']}"
+            if result['subscription_duration']:
+                line += f", подписка {result['subscription_duration']}"
+            if result['remaining']:
+                line += f", нужно минимум {rule.min_subscription_time}, осталось {result['remaining']}"
+            lines.append(line)
+        return Html("\n".join(lines) + "\n")
@@ -1,9 +1,9 @@
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram import Update
 from db.database import Database
 from subscription_checker import SubscriptionChecker
-import os
+from utils.request_context import RequestContext
+from views import Html, WELCOME, WELCOME_KEYBOARD
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +12,7 @@ class StartCommand:
         self.db = db
         self.subscription_checker = subscription_checker
     
-    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle(self, update: Update, context: RequestContext):
         """Обработчик команды /start"""
         user = update.effective_user
         
@@ -26,31 +26,17 @@ class StartCommand:
             first_name=user.first_name,
             last_name=user.last_name
         )
+        context.invalidate(('user', user.id))
         
         # Проверяем подписку
-        subscription_message = await self.subscription_checker.get_subscription_message(user.id)
+        subscription_info = await context.check_subscription(self.subscription_checker, user.id)
+        subscription_message = await self.subscription_checker.get_subscription_message(user.id, subscription_info)
         
-        # Создаем клавиатуру
-        keyboard = [
-            [InlineKeyboardButton("📧 Указать email", callback_data="set_email")],
-            [InlineKeyboardButton("🖥️ Получить сервер", callback_data="get_server")],
-            [InlineKeyboardButton("📊 Мой сервер", callback_data="my_servers")],
-            [InlineKeyboardButton("ℹ️ Помощь", callback_data="help")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        welcome_text = (
-            f"👋 <b>Привет, {user.first_name}!</b>\n\n"
-            "Добро пожаловать в бот для получения игровых серверов.\n\n"
-            f"{subscription_message}\n\n"
-            "Выберите действие:"
-        )
+        welcome_text = WELCOME.render(first_name=user.first_name, subscription=Html(subscription_message))
         
         if update.message:
             await update.message.reply_text(
                 welcome_text,
-                reply_markup=reply_markup,
+                reply_markup=WELCOME_KEYBOARD,
                 parse_mode='HTML'
             )
@@ -1,14 +1,16 @@
 import sqlite3
 import asyncio
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Set, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 class Database:
-    def __init__(self, db_path: str = "db/users.db"):
+    def __init__(self, db_path: str = "db/users.db", default_channel: Optional[str] = None):
         self.db_path = db_path
+        # Канал (ключ правила), к которому относятся записи подписок версий с одним каналом
+        self.default_channel = default_channel
         self.init_database()
     
     def init_database(self):
@@ -58,13 +60,180 @@ class Database:
                 )
             ''')
             
+            # Таблица заявок на создание серверов
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS provisioning_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    telegram_id INTEGER NOT NULL,
+                    chat_id INTEGER,
+                    message_id INTEGER,
+                    requested_by INTEGER,
+                    status TEXT DEFAULT 'queued',
+                    step TEXT DEFAULT 'new',
+                    attempts INTEGER DEFAULT 0,
+                    username TEXT,
+                    password TEXT,
+                    email TEXT,
+                    panel_user_id INTEGER,
+                    allocation_id INTEGER,
+                    server_identifier TEXT,
+                    server_name TEXT,
+                    profile TEXT,
+                    error_code TEXT,
+                    error_message TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Дополнительные сообщения, в которых показывается ход заявки (повторные нажатия)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS provisioning_job_messages (
+                    job_id INTEGER NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (job_id, chat_id, message_id)
+                )
+            ''')
+            
+            # Пул заранее созданных серверов
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS warm_pool (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    profile TEXT NOT NULL,
+                    external_id TEXT UNIQUE NOT NULL,
+                    panel_server_id INTEGER,
+                    pterodactyl_id TEXT,
+                    status TEXT DEFAULT 'creating',
+                    claimed_by INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Серверы, приостановленные и удаленные за простой
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS reclaimed_servers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    pterodactyl_id TEXT NOT NULL,
+                    telegram_id INTEGER,
+                    action TEXT NOT NULL,
+                    memory INTEGER DEFAULT 0,
+                    disk INTEGER DEFAULT 0,
+                    cpu INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Подписки на каналы по событиям chat_member (joined_at NULL - подписан до начала учета).
+            # Таблица версий с одним каналом (без колонки channel) переименовывается и переносится
+            # в новую с каналом default_channel; без него перенос ждет запуска, где канал известен
+            cursor.execute("PRAGMA table_info(subscriptions)")
+            columns = {column[1] for column in cursor.fetchall()}
+            if columns and 'channel' not in columns:
+                cursor.execute('ALTER TABLE subscriptions RENAME TO subscriptions_legacy')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS subscriptions (
+                    channel TEXT NOT NULL,
+                    telegram_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    is_member BOOLEAN NOT NULL,
+                    joined_at TIMESTAMP,
+                    left_at TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (channel, telegram_id)
+                )
+            ''')
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'subscriptions_legacy'")
+            if self.default_channel and cursor.fetchone():
+                cursor.execute('''
+                    INSERT OR IGNORE INTO subscriptions
+                        (channel, telegram_id, status, is_member, joined_at, left_at, updated_at)
+                    SELECT ?, telegram_id, status, is_member, joined_at, left_at, updated_at
+                    FROM subscriptions_legacy
+                ''', (self.default_channel,))
+                cursor.execute('DROP TABLE subscriptions_legacy')
+                logger.info(f"Подписки перенесены в таблицу с каналами (канал {self.default_channel})")
+            
+            # Проходы проверки подписки владельцев серверов (cursor - последний проверенный telegram_id)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS subscription_sweeps (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cursor INTEGER DEFAULT 0,
+                    checked INTEGER DEFAULT 0,
+                    unsubscribed INTEGER DEFAULT 0,
+                    warned INTEGER DEFAULT 0,
+                    suspended INTEGER DEFAULT 0,
+                    deleted INTEGER DEFAULT 0,
+                    restored INTEGER DEFAULT 0,
+                    failed INTEGER DEFAULT 0,
+                    elapsed REAL DEFAULT 0,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            ''')
+            
+            # Колонки, добавленные после создания таблиц
+            self._ensure_columns(cursor, 'servers', {
+                'username': 'TEXT', 'password': 'TEXT', 'email': 'TEXT', 'profile': 'TEXT',
+                'last_active_at': 'TIMESTAMP', 'idle_stage': 'TEXT', 'idle_stage_at': 'TIMESTAMP',
+                'panel_server_id': 'INTEGER'
+            })
+            # owner и lease_until - экземпляр бота, выполняющий заявку, и срок его аренды
+            self._ensure_columns(cursor, 'provisioning_jobs', {
+                'profile': 'TEXT', 'panel_server_id': 'INTEGER', 'owner': 'TEXT', 'lease_until': 'TIMESTAMP'
+            })
+            self._ensure_columns(cursor, 'users', {'unsubscribed_at': 'TIMESTAMP', 'unsubscribed_stage': 'TEXT'})
+            
             # Индексы для оптимизации
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_servers_user_id ON servers(user_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_servers_status ON servers(status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_provisioning_jobs_status ON provisioning_jobs(status, id)')
+            # Не больше одной активной заявки на пользователя, в том числе при нескольких экземплярах бота.
+            # Дубликаты, оставшиеся от версий без этого ограничения, закрываются, остается самая ранняя
+            cursor.execute('''
+                UPDATE provisioning_jobs
+                SET status = 'failed', error_code = 'DUPLICATE', error_message = 'Повторная заявка пользователя'
+                WHERE status IN ('queued', 'running') AND id > (
+                    SELECT MIN(id) FROM provisioning_jobs AS earliest
+                    WHERE earliest.telegram_id = provisioning_jobs.telegram_id
+                        AND earliest.status IN ('queued', 'running')
+                )
+            ''')
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_provisioning_jobs_active ON provisioning_jobs(telegram_id)
+                WHERE status IN ('queued', 'running')
+            ''')
+            # Allocation резервируется за одной активной заявкой: параллельные воркеры не выбирают один порт.
+            # У более поздних заявок с тем же allocation резерв снимается, порт будет выбран заново
+            cursor.execute('''
+                UPDATE provisioning_jobs
+                SET allocation_id = NULL, step = CASE WHEN step = 'allocation' THEN 'panel_user' ELSE step END
+                WHERE status IN ('queued', 'running') AND allocation_id IS NOT NULL AND id > (
+                    SELECT MIN(id) FROM provisioning_jobs AS earliest
+                    WHERE earliest.allocation_id = provisioning_jobs.allocation_id
+                        AND earliest.status IN ('queued', 'running')
+                )
+            ''')
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_provisioning_jobs_allocation ON provisioning_jobs(allocation_id)
+                WHERE status IN ('queued', 'running') AND allocation_id IS NOT NULL
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_warm_pool_status ON warm_pool(profile, status, id)')
             
             conn.commit()
     
+    @staticmethod
+    def _ensure_columns(cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]) -> None:
+        """Добавить в таблицу недостающие колонки"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {column[1] for column in cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+    
     def get_user(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """Получить пользователя по Telegram ID"""
         with sqlite3.connect(self.db_path) as conn:
@@ -125,6 +294,49 @@ class Database:
             logger.error(f"Ошибка обновления проверки подписки: {e}")
             return False
     
+    def get_subscription(self, channel: str, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Получить отслеживаемую подписку пользователя на канал"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM subscriptions WHERE channel = ? AND telegram_id = ?',
+                           (channel, telegram_id))
+            row = cursor.fetchone()
+            if row:
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, row))
+            return None
+    
+    def record_subscription(self, channel: str, telegram_id: int, status: str, is_member: bool,
+                            changed_at: Optional[datetime] = None) -> bool:
+        """Записать вступление в канал или выход из него
+        
+        changed_at None - подписка обнаружена запросом к API, время вступления неизвестно.
+        Время вступления сохраняется при смене статуса внутри канала (member -> administrator).
+        """
+        changed_at = changed_at.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S') if changed_at else None
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO subscriptions (channel, telegram_id, status, is_member, joined_at, left_at)
+                    VALUES (?, ?, ?, ?, CASE WHEN ? THEN ? END, CASE WHEN ? THEN NULL ELSE ? END)
+                    ON CONFLICT(channel, telegram_id) DO UPDATE SET
+                        status = excluded.status,
+                        is_member = excluded.is_member,
+                        joined_at = CASE
+                            WHEN NOT excluded.is_member THEN subscriptions.joined_at
+                            WHEN subscriptions.is_member THEN subscriptions.joined_at
+                            ELSE excluded.joined_at
+                        END,
+                        left_at = CASE WHEN excluded.is_member THEN subscriptions.left_at ELSE excluded.left_at END,
+                        updated_at = CURRENT_TIMESTAMP
+                ''', (channel, telegram_id, status, is_member, is_member, changed_at, is_member, changed_at))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка записи подписки пользователя {telegram_id} на @{channel}: {e}")
+            return False
+    
     def ban_user(self, telegram_id: int, reason: str) -> bool:
         """Заблокировать пользователя
         
@@ -189,6 +401,25 @@ class Database:
                 return dict(zip(columns, row))
             return None
     
+    def get_server_with_owner(self, pterodactyl_id: str) -> Optional[Dict[str, Any]]:
+        """Получить сервер вместе с владельцем одним запросом
+        
+        Поля владельца возвращаются с префиксом owner_.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.*, u.telegram_id AS owner_telegram_id, u.username AS owner_username,
+                       u.first_name AS owner_first_name
+                FROM servers s LEFT JOIN users u ON u.id = s.user_id
+                WHERE s.pterodactyl_id = ?
+            ''', (pterodactyl_id,))
+            row = cursor.fetchone()
+            if row:
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, row))
+            return None
+    
     def create_server(self, telegram_id: int, pterodactyl_id: str, server_name: str) -> bool:
         """Создать запись о сервере"""
         try:
@@ -286,6 +517,40 @@ class Database:
             columns = [description[0] for description in cursor.description]
             return [dict(zip(columns, row)) for row in rows]
     
+    def get_server_statuses(self) -> Dict[str, str]:
+        """Получить статусы всех серверов: pterodactyl_id -> status"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT pterodactyl_id, status FROM servers WHERE pterodactyl_id IS NOT NULL')
+            return dict(cursor.fetchall())
+    
+    def update_server_statuses(self, statuses: Dict[str, str],
+                               expected: Optional[Dict[str, str]] = None) -> bool:
+        """Обновить статусы серверов одной транзакцией
+
+        expected - статусы, от которых отталкивалось изменение: сервер, статус
+        которого с тех пор изменился, не обновляется.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                if expected is None:
+                    cursor.executemany(
+                        'UPDATE servers SET status = ? WHERE pterodactyl_id = ?',
+                        [(status, pterodactyl_id) for pterodactyl_id, status in statuses.items()]
+                    )
+                else:
+                    cursor.executemany(
+                        'UPDATE servers SET status = ? WHERE pterodactyl_id = ? AND status IS ?',
+                        [(status, pterodactyl_id, expected.get(pterodactyl_id))
+                         for pterodactyl_id, status in statuses.items()]
+                    )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка обновления статусов серверов: {e}")
+            return False
+    
     def get_users_created_after(self, date: datetime) -> List[Dict[str, Any]]:
         """Получить пользователей, созданных после указанной даты"""
         with sqlite3.connect(self.db_path) as conn:
@@ -323,8 +588,9 @@ class Database:
             return [dict(zip(columns, row)) for row in rows]
     
     def create_server_with_credentials(self, telegram_id: int, pterodactyl_id: str, 
-                                     server_name: str, credentials: Dict[str, str]) -> bool:
-        """Создать запись о сервере с учетными данными"""
+                                     server_name: str, credentials: Dict[str, str],
+                                     profile: Optional[str] = None, panel_server_id: Optional[int] = None) -> bool:
+        """Создать запись о сервере с учетными данными (panel_server_id - числовой ID в панели)"""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
@@ -342,10 +608,11 @@ class Database:
                     cursor.execute('ALTER TABLE servers ADD COLUMN email TEXT')
                 
                 cursor.execute('''
-                    INSERT INTO servers (user_id, pterodactyl_id, server_name, username, password, email)
-                    SELECT id, ?, ?, ?, ?, ? FROM users WHERE telegram_id = ?
+                    INSERT INTO servers (user_id, pterodactyl_id, server_name, username, password, email, profile,
+                                         panel_server_id)
+                    SELECT id, ?, ?, ?, ?, ?, ?, ? FROM users WHERE telegram_id = ?
                 ''', (pterodactyl_id, server_name, credentials['username'], 
-                      credentials['password'], credentials['email'], telegram_id))
+                      credentials['password'], credentials['email'], profile, panel_server_id, telegram_id))
                 conn.commit()
                 return cursor.rowcount > 0
         except Exception as e:
@@ -384,4 +651,513 @@ class Database:
             if row:
                 columns = [description[0] for description in cursor.description]
                 return dict(zip(columns, row))
-            return None 
\ No newline at end of file
+            return None
+    
+    # Поля заявки, которые воркеры могут обновлять
+    PROVISIONING_JOB_FIELDS = {
+        'chat_id', 'message_id', 'status', 'step', 'attempts', 'username', 'password', 'email',
+        'panel_user_id', 'allocation_id', 'server_identifier', 'panel_server_id', 'server_name',
+        'error_code', 'error_message'
+    }
+    
+    def create_provisioning_job(self, telegram_id: int, chat_id: Optional[int] = None,
+                                message_id: Optional[int] = None, requested_by: Optional[int] = None,
+                                profile: Optional[str] = None) -> Optional[int]:
+        """Создать заявку на создание сервера, вернуть ее ID
+        
+        None - если у пользователя уже есть активная заявка (см. get_active_provisioning_job) или при ошибке.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO provisioning_jobs (telegram_id, chat_id, message_id, requested_by, profile)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (telegram_id, chat_id, message_id, requested_by, profile))
+                conn.commit()
+                return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            logger.info(f"У пользователя {telegram_id} уже есть активная заявка на сервер")
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка создания заявки на сервер: {e}")
+            return None
+    
+    def claim_provisioning_job(self, owner: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Атомарно забрать первую заявку из очереди в аренду экземпляру owner на lease_seconds"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE provisioning_jobs
+                    SET status = 'running', attempts = attempts + 1, owner = ?,
+                        lease_until = strftime('%Y-%m-%d %H:%M:%f', 'now', ?), updated_at = CURRENT_TIMESTAMP
+                    WHERE id = (
+                        SELECT id FROM provisioning_jobs WHERE status = 'queued' ORDER BY id LIMIT 1
+                    )
+                    RETURNING *
+                ''', (owner, f'+{lease_seconds} seconds'))
+                row = cursor.fetchone()
+                columns = [description[0] for description in cursor.description]
+                conn.commit()
+                return dict(zip(columns, row)) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка получения заявки из очереди: {e}")
+            return None
+    
+    def update_provisioning_job(self, job_id: int, owner: Optional[str] = None, **fields: Any) -> bool:
+        """Обновить поля заявки
+        
+        owner - обновить, только если заявка выполняется и арендована этим экземпляром;
+        False означает, что аренда потеряна и заявку выполняет другой экземпляр.
+        """
+        unknown = set(fields) - self.PROVISIONING_JOB_FIELDS
+        if unknown:
+            raise ValueError(f"Неизвестные поля заявки: {', '.join(sorted(unknown))}")
+        if not fields:
+            return False
+        
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        condition, params = 'id = ?', [job_id]
+        if owner is not None:
+            condition += " AND owner = ? AND status = 'running'"
+            params.append(owner)
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'UPDATE provisioning_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE {condition}',
+                    (*fields.values(), *params)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка обновления заявки {job_id}: {e}")
+            return False
+    
+    def get_provisioning_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Получить заявку по ID"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM provisioning_jobs WHERE id = ?', (job_id,))
+            row = cursor.fetchone()
+            if row:
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, row))
+            return None
+    
+    def get_active_provisioning_job(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Получить заявку пользователя, которая ждет в очереди или выполняется"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM provisioning_jobs WHERE telegram_id = ? AND status IN ('queued', 'running')",
+                (telegram_id,)
+            )
+            row = cursor.fetchone()
+            if row:
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, row))
+            return None
+    
+    def count_queued_provisioning_jobs(self, before_id: Optional[int] = None) -> int:
+        """Количество заявок, ожидающих в очереди (до заявки before_id, если указана)"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            if before_id is None:
+                cursor.execute("SELECT COUNT(*) FROM provisioning_jobs WHERE status = 'queued'")
+            else:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM provisioning_jobs WHERE status = 'queued' AND id < ?", (before_id,)
+                )
+            return cursor.fetchone()[0]
+    
+    def get_reserved_allocations(self) -> Set[int]:
+        """Allocation, зарезервированные активными заявками"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT allocation_id FROM provisioning_jobs "
+                "WHERE status IN ('queued', 'running') AND allocation_id IS NOT NULL"
+            )
+            return {row[0] for row in cursor.fetchall()}
+    
+    def reserve_provisioning_allocation(self, job_id: int, allocation_id: int, owner: Optional[str] = None) -> bool:
+        """Закрепить allocation за заявкой, False - если его уже зарезервировала другая заявка
+        
+        owner - закрепить, только если заявка выполняется и арендована этим экземпляром.
+        """
+        condition, params = 'id = ?', [job_id]
+        if owner is not None:
+            condition += " AND owner = ? AND status = 'running'"
+            params.append(owner)
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'UPDATE provisioning_jobs SET allocation_id = ?, updated_at = CURRENT_TIMESTAMP WHERE {condition}',
+                    (allocation_id, *params)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+        except sqlite3.IntegrityError:
+            return False
+        except Exception as e:
+            logger.error(f"Ошибка резервирования allocation {allocation_id} для заявки {job_id}: {e}")
+            return False
+    
+    def add_provisioning_job_message(self, job_id: int, chat_id: int, message_id: int) -> bool:
+        """Показывать ход заявки еще и в сообщении (chat_id, message_id)"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'INSERT OR IGNORE INTO provisioning_job_messages (job_id, chat_id, message_id) VALUES (?, ?, ?)',
+                    (job_id, chat_id, message_id)
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка добавления сообщения к заявке {job_id}: {e}")
+            return False
+    
+    def get_provisioning_job_messages(self, job_id: int) -> List[Tuple[int, int]]:
+        """Дополнительные сообщения заявки (chat_id, message_id)"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT chat_id, message_id FROM provisioning_job_messages WHERE job_id = ? ORDER BY created_at',
+                (job_id,)
+            )
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+    
+    def renew_provisioning_lease(self, job_id: int, owner: str, lease_seconds: float) -> bool:
+        """Продлить аренду выполняемой заявки, False - если заявка уже не принадлежит owner"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE provisioning_jobs SET lease_until = strftime('%Y-%m-%d %H:%M:%f', 'now', ?)
+                    WHERE id = ? AND owner = ? AND status = 'running'
+                ''', (f'+{lease_seconds} seconds', job_id, owner))
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка продления аренды заявки {job_id}: {e}")
+            return False
+    
+    def requeue_expired_provisioning_jobs(self, owner: Optional[str] = None) -> int:
+        """Вернуть в очередь выполняемые заявки с истекшей арендой
+        
+        Аренду продлевает живой экземпляр, поэтому истекает она только у заявок
+        остановленного или упавшего. owner - вернуть также все заявки этого
+        экземпляра (при его штатной остановке).
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE provisioning_jobs
+                    SET status = 'queued', owner = NULL, lease_until = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE status = 'running'
+                        AND (owner IS ? OR lease_until IS NULL OR lease_until < strftime('%Y-%m-%d %H:%M:%f', 'now'))
+                ''', (owner,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Ошибка восстановления заявок: {e}")
+            return 0
+    
+    WARM_POOL_FIELDS = {'panel_server_id', 'pterodactyl_id', 'status', 'claimed_by'}
+    
+    def create_warm_server(self, profile: str, external_id: str) -> Optional[int]:
+        """Добавить в пул запись о создаваемом сервере"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'INSERT INTO warm_pool (profile, external_id) VALUES (?, ?)',
+                    (profile, external_id)
+                )
+                conn.commit()
+                return cursor.lastrowid
+        except Exception as e:
+            logger.error(f"Ошибка добавления сервера в пул: {e}")
+            return None
+    
+    def update_warm_server(self, pool_id: int, **fields: Any) -> bool:
+        """Обновить поля записи пула"""
+        unknown = set(fields) - self.WARM_POOL_FIELDS
+        if unknown:
+            raise ValueError(f"Неизвестные поля пула: {', '.join(sorted(unknown))}")
+        if not fields:
+            return False
+        
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'UPDATE warm_pool SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                    (*fields.values(), pool_id)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка обновления записи пула {pool_id}: {e}")
+            return False
+    
+    def get_warm_servers(self, profile: str, status: str) -> List[Dict[str, Any]]:
+        """Записи пула профиля с указанным статусом"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT * FROM warm_pool WHERE profile = ? AND status = ? ORDER BY id',
+                (profile, status)
+            )
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def count_warm_servers(self) -> Dict[str, Dict[str, int]]:
+        """Количество серверов пула по профилям и статусам"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT profile, status, COUNT(*) FROM warm_pool GROUP BY profile, status')
+            counts: Dict[str, Dict[str, int]] = {}
+            for profile, status, count in cursor.fetchall():
+                counts.setdefault(profile, {})[status] = count
+            return counts
+    
+    def claim_warm_server(self, profile: str, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Атомарно закрепить за пользователем готовый сервер пула
+        
+        Если у пользователя уже есть незавершенное закрепление (повтор после
+        сбоя), возвращается оно.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT * FROM warm_pool WHERE claimed_by = ? AND status = 'claimed' ORDER BY id LIMIT 1",
+                    (telegram_id,)
+                )
+                row = cursor.fetchone()
+                if not row:
+                    cursor.execute('''
+                        UPDATE warm_pool
+                        SET status = 'claimed', claimed_by = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = (
+                            SELECT id FROM warm_pool WHERE profile = ? AND status = 'ready' ORDER BY id LIMIT 1
+                        )
+                        RETURNING *
+                    ''', (telegram_id, profile))
+                    row = cursor.fetchone()
+                columns = [description[0] for description in cursor.description]
+                conn.commit()
+                return dict(zip(columns, row)) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка выдачи сервера из пула: {e}")
+            return None
+    
+    def assign_warm_server(self, pterodactyl_id: str, telegram_id: int) -> bool:
+        """Отметить сервер пула выданным пользователю"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE warm_pool SET status = 'assigned', claimed_by = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE pterodactyl_id = ?
+                ''', (telegram_id, pterodactyl_id))
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка отметки сервера пула {pterodactyl_id}: {e}")
+            return False
+    
+    def release_warm_servers(self, telegram_id: int) -> int:
+        """Вернуть в пул незавершенные закрепления пользователя"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE warm_pool SET status = 'ready', claimed_by = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE claimed_by = ? AND status = 'claimed'
+                ''', (telegram_id,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Ошибка возврата серверов в пул: {e}")
+            return 0
+    
+    def get_reclaim_candidates(self) -> List[Dict[str, Any]]:
+        """Серверы для проверки простоя вместе с Telegram ID владельца"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.pterodactyl_id, s.server_name, s.status, s.created_at, s.last_active_at,
+                       s.idle_stage, s.idle_stage_at, u.telegram_id
+                FROM servers s LEFT JOIN users u ON u.id = s.user_id
+                WHERE s.status != 'missing'
+            ''')
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def mark_servers_active(self, pterodactyl_ids: List[str]) -> bool:
+        """Отметить серверы работающими и сбросить стадию простоя"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    UPDATE servers SET last_active_at = CURRENT_TIMESTAMP, idle_stage = NULL, idle_stage_at = NULL
+                    WHERE pterodactyl_id = ?
+                ''', [(pterodactyl_id,) for pterodactyl_id in pterodactyl_ids])
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка отметки активных серверов: {e}")
+            return False
+    
+    def set_server_idle_stage(self, pterodactyl_id: str, stage: str, status: Optional[str] = None,
+                              stage_at: Optional[datetime] = None) -> bool:
+        """Перевести сервер на стадию простоя (warned, suspended), stage_at - время перехода (по умолчанию сейчас)"""
+        stage_at = stage_at.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S') if stage_at else None
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE servers SET idle_stage = ?, idle_stage_at = COALESCE(?, CURRENT_TIMESTAMP),
+                        status = COALESCE(?, status)
+                    WHERE pterodactyl_id = ?
+                ''', (stage, stage_at, status, pterodactyl_id))
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка обновления стадии простоя сервера {pterodactyl_id}: {e}")
+            return False
+    
+    def record_reclaimed_server(self, pterodactyl_id: str, telegram_id: Optional[int], action: str,
+                                limits: Dict[str, Any]) -> bool:
+        """Записать освобожденные сервером ресурсы"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO reclaimed_servers (pterodactyl_id, telegram_id, action, memory, disk, cpu)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (pterodactyl_id, telegram_id, action, limits.get('memory') or 0,
+                      limits.get('disk') or 0, limits.get('cpu') or 0))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка записи освобожденного сервера {pterodactyl_id}: {e}")
+            return False
+    
+    def get_reclaim_stats(self) -> Dict[str, Dict[str, int]]:
+        """Итоги освобождения ресурсов по действиям (suspend, delete)"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT action, COUNT(*), COALESCE(SUM(memory), 0), COALESCE(SUM(disk), 0), COALESCE(SUM(cpu), 0)
+                FROM reclaimed_servers GROUP BY action
+            ''')
+            return {
+                action: {'servers': count, 'memory': memory, 'disk': disk, 'cpu': cpu}
+                for action, count, memory, disk, cpu in cursor.fetchall()
+            }
+    
+    def get_server_owners_after(self, telegram_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Следующая страница владельцев серверов по telegram_id (keyset-пагинация)"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT u.telegram_id, u.unsubscribed_at, u.unsubscribed_stage
+                FROM users u
+                WHERE u.telegram_id > ?
+                  AND EXISTS (SELECT 1 FROM servers s WHERE s.user_id = u.id AND s.status != 'missing')
+                ORDER BY u.telegram_id
+                LIMIT ?
+            ''', (telegram_id, limit))
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def set_unsubscribed_stage(self, telegram_id: int, stage: Optional[str]) -> bool:
+        """Перевести владельца на стадию после отписки (warned, suspended) или сбросить ее (None)
+        
+        Время отписки фиксируется при первом предупреждении.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE users SET
+                        unsubscribed_stage = ?,
+                        unsubscribed_at = CASE
+                            WHEN ? IS NULL THEN NULL
+                            ELSE COALESCE(unsubscribed_at, CURRENT_TIMESTAMP)
+                        END
+                    WHERE telegram_id = ?
+                ''', (stage, stage, telegram_id))
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка обновления стадии отписки пользователя {telegram_id}: {e}")
+            return False
+    
+    def start_subscription_sweep(self) -> Optional[Dict[str, Any]]:
+        """Продолжить незавершенный проход проверки подписок или начать новый"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT * FROM subscription_sweeps WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1
+                ''')
+                row = cursor.fetchone()
+                if not row:
+                    cursor.execute('INSERT INTO subscription_sweeps DEFAULT VALUES RETURNING *')
+                    row = cursor.fetchone()
+                    conn.commit()
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, row))
+        except Exception as e:
+            logger.error(f"Ошибка начала прохода проверки подписок: {e}")
+            return None
+    
+    SWEEP_FIELDS = {'cursor', 'checked', 'unsubscribed', 'warned', 'suspended', 'deleted', 'restored',
+                    'failed', 'elapsed'}
+    
+    def update_subscription_sweep(self, sweep_id: int, finished: bool = False, **fields: Any) -> bool:
+        """Сохранить курсор и счетчики прохода (finished - отметить проход завершенным)"""
+        unknown = set(fields) - self.SWEEP_FIELDS
+        if unknown:
+            raise ValueError(f"Неизвестные поля прохода: {', '.join(sorted(unknown))}")
+        
+        assignments = [f"{name} = ?" for name in fields]
+        if finished:
+            assignments.append("finished_at = CURRENT_TIMESTAMP")
+        if not assignments:
+            return False
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'UPDATE subscription_sweeps SET {", ".join(assignments)} WHERE id = ?',
+                    (*fields.values(), sweep_id)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка сохранения прохода проверки подписок {sweep_id}: {e}")
+            return False
+    
+    def get_last_subscription_sweep(self) -> Optional[Dict[str, Any]]:
+        """Последний завершенный проход проверки подписок"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM subscription_sweeps WHERE finished_at IS NOT NULL ORDER BY id DESC LIMIT 1
+            ''')
+            row = cursor.fetchone()
+            if row:
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, row))
+            return None
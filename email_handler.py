@@ -1,16 +1,22 @@
 import logging
 import re
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram import Update
 from db.database import Database
+from utils.request_context import RequestContext
+from views import (
+    BACK_KEYBOARD, GET_SERVER_KEYBOARD, INVALID_EMAIL_TEXT, EMAIL_TAKEN, EMAIL_ERROR_TEXT, EMAIL_SAVED,
+    EMAIL_SAVE_FAILED_TEXT, USER_NOT_FOUND_TEXT, EMAIL_SET, EMAIL_NOT_SET_TEXT
+)
 
 logger = logging.getLogger(__name__)
 
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 class EmailHandler:
     def __init__(self, db: Database):
         self.db = db
     
-    async def handle_email_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def handle_email_message(self, update: Update, context: RequestContext) -> None:
         """Обработчик сообщений с email"""
         if not update.message or not update.effective_user or not update.message.text:
             return
@@ -19,20 +25,8 @@ class EmailHandler:
         user_id = update.effective_user.id
         
         # Проверяем формат email
-        email_pattern = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
-        if not email_pattern.match(email):
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                "❌ <b>Неверный формат email!</b>\n\n"
-                "Пожалуйста, укажите корректный email адрес.\n"
-                "Пример: user@example.com",
-                reply_markup=reply_markup,
-                parse_mode='HTML'
-            )
+        if not EMAIL_PATTERN.match(email):
+            await update.message.reply_text(INVALID_EMAIL_TEXT, reply_markup=BACK_KEYBOARD, parse_mode='HTML')
             return
         
         # Проверяем уникальность email
@@ -40,71 +34,35 @@ class EmailHandler:
             # Блокируем пользователя
             ban_reason = f"Попытка использования неуникального email: {email}"
             if self.db.ban_user(user_id, ban_reason):
-                keyboard = [
-                    [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
+                context.invalidate(('user', user_id))
                 await update.message.reply_text(
-                    "🚫 <b>Вы заблокированы!</b>\n\n"
-                    "Причина: Попытка использования email, который уже зарегистрирован.\n"
-                    f"Email: {email}\n\n"
-                    "Для разблокировки обратитесь к администратору.",
-                    reply_markup=reply_markup,
+                    EMAIL_TAKEN.render(email=email),
+                    reply_markup=BACK_KEYBOARD,
                     parse_mode='HTML'
                 )
             else:
-                await update.message.reply_text(
-                    "❌ <b>Ошибка!</b>\n\n"
-                    "Произошла ошибка при обработке вашего запроса.\n"
-                    "Пожалуйста, обратитесь к администратору.",
-                    parse_mode='HTML'
-                )
+                await update.message.reply_text(EMAIL_ERROR_TEXT, parse_mode='HTML')
             return
         
         # Сохраняем email
         if self.db.update_user_email(user_id, email):
-            keyboard = [
-                [InlineKeyboardButton("🖥️ Получить сервер", callback_data="get_server")],
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
+            context.invalidate(('user', user_id))
             await update.message.reply_text(
-                "✅ <b>Email успешно сохранен!</b>\n\n"
-                f"Ваш email: {email}\n\n"
-                "Теперь вы можете получить сервер.",
-                reply_markup=reply_markup,
+                EMAIL_SAVED.render(email=email),
+                reply_markup=GET_SERVER_KEYBOARD,
                 parse_mode='HTML'
             )
         else:
-            keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data="back_to_start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                "❌ <b>Ошибка сохранения email!</b>\n\n"
-                "Пожалуйста, попробуйте позже или обратитесь к администратору.",
-                reply_markup=reply_markup,
-                parse_mode='HTML'
-            )
+            await update.message.reply_text(EMAIL_SAVE_FAILED_TEXT, reply_markup=BACK_KEYBOARD, parse_mode='HTML')
     
     def get_email_status_message(self, user_id: int) -> str:
         """Получить сообщение о статусе email"""
         user_data = self.db.get_user(user_id)
         
         if not user_data:
-            return "❌ <b>Пользователь не найден!</b>"
+            return USER_NOT_FOUND_TEXT
         
         if user_data.get('email'):
-            return (
-                f"✅ <b>Email указан:</b> {user_data['email']}\n\n"
-                "Вы можете получить сервер!"
-            )
+            return EMAIL_SET.render(email=user_data['email'])
         else:
-            return (
-                "📧 <b>Email не указан!</b>\n\n"
-                "Для получения сервера необходимо указать email.\n"
-                "Отправьте ваш email в следующем сообщении."
-            ) 
\ No newline at end of file
+            return EMAIL_NOT_SET_TEXT
\ No newline at end of file
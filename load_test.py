@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест создания серверов на имитации панели Pterodactyl
+
+Запуск: python load_test.py --flows 200 --workers 10 --latency 0.05 --jitter 0.05
+
+Созданные серверы затем удаляются по сохраненному числовому ID, как это
+делает /deleteserver. Тест завершается с кодом 1, если панель вернула
+ошибку, которая не была внедрена, а без внедренных сбоев - и если хотя бы
+одна заявка не выполнена.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+from db.database import Database
+from mock_panel import MockPanel
+from provisioning import ProvisioningQueue
+from pterodactyl_api import PterodactylAPI
+
+
+# Ожидаемые ответы обработчиков: поиск по external_id до создания объекта
+EXPECTED_ERRORS = {
+    ('GET /api/application/users/external/{external_id}', 404),
+    ('GET /api/application/servers/external/{external_id}', 404),
+}
+
+
+class LoadBot:
+    """Заглушка Telegram бота: сообщения заявок не отправляются"""
+
+    async def edit_message_text(self, text, **kwargs):
+        pass
+
+    async def send_message(self, chat_id, text, **kwargs):
+        pass
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """Провести N заявок через очередь и вернуть сводку задержек"""
+    panel = MockPanel(
+        allocations_per_node=args.flows + 10,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed
+    )
+    url = await panel.start()
+    try:
+        db = Database(os.path.join(tempfile.mkdtemp(), "load_test.db"))
+        api = PterodactylAPI(url, panel.token, timeout=args.timeout)
+        queue = ProvisioningQueue(db, api, workers=args.workers, max_attempts=args.max_attempts,
+                                  poll_interval=0.05)
+
+        telegram_ids = range(100000, 100000 + args.flows)
+        for telegram_id in telegram_ids:
+            db.create_user(telegram_id, f"load_{telegram_id}", "Load", "Test")
+
+        await queue.start(LoadBot())
+        started_at = time.monotonic()
+        pending = {}
+        for telegram_id in telegram_ids:
+            job_id = queue.enqueue(telegram_id, chat_id=None, message_id=None)
+            pending[job_id] = time.monotonic()
+
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+        deadline = started_at + args.deadline
+        while pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+            for job_id in list(pending):
+                job = db.get_provisioning_job(job_id)
+                if job['status'] == 'done':
+                    latencies.append(time.monotonic() - pending.pop(job_id))
+                elif job['status'] == 'failed':
+                    pending.pop(job_id)
+                    errors[job['error_code']] = errors.get(job['error_code'], 0) + 1
+        elapsed = time.monotonic() - started_at
+        await queue.stop()
+
+        servers = len(panel.servers)
+        # Удаление по числовому ID: идентификатор вместо него дал бы 404 от панели
+        deleted = 0
+        for telegram_id in telegram_ids:
+            for server in db.get_user_servers(telegram_id):
+                if server['panel_server_id'] and await api.delete_server(server['panel_server_id'],
+                                                                         server['pterodactyl_id']):
+                    deleted += 1
+    finally:
+        await panel.stop()
+
+    return {
+        'flows': args.flows,
+        'done': len(latencies),
+        'failed': sum(errors.values()),
+        'errors': errors,
+        'unfinished': len(pending),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'requests': sum(panel.request_counts.values()),
+        'rate_limited': panel.status_counts.get(429, 0),
+        'servers': servers,
+        'deleted': deleted,
+        'remaining': len(panel.servers),
+        'unexpected': {key: count for key, count in panel.handler_errors.items() if key not in EXPECTED_ERRORS},
+    }
+
+
+def check_report(report: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    """Ошибки, которые нельзя объяснить внедренными сбоями"""
+    problems = [f"{route}: {status} x{count}" for (route, status), count in sorted(report['unexpected'].items())]
+    if not args.error_rate and not args.rate_limit:
+        for code, count in sorted(report['errors'].items()):
+            problems.append(f"заявки завершились ошибкой {code}: {count}")
+        if report['unfinished']:
+            problems.append(f"не завершено заявок: {report['unfinished']}")
+        if report['remaining']:
+            problems.append(f"после удаления в панели осталось серверов: {report['remaining']}")
+    return problems
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест создания серверов")
+    parser.add_argument("--flows", type=int, default=100, help="число заявок на сервер")
+    parser.add_argument("--workers", type=int, default=10, help="воркеров очереди")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа панели, с")
+    parser.add_argument("--jitter", type=float, default=0.02, help="случайная добавка к задержке, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля случайных ошибок 500")
+    parser.add_argument("--rate-limit", type=int, default=None, help="лимит запросов application API в минуту")
+    parser.add_argument("--max-attempts", type=int, default=10, help="попыток на заявку")
+    parser.add_argument("--timeout", type=float, default=10.0, help="таймаут запроса к панели, с")
+    parser.add_argument("--deadline", type=float, default=300.0, help="предельное время теста, с")
+    parser.add_argument("--seed", type=int, default=None, help="seed генератора сбоев")
+    return parser.parse_args()
+
+
+async def main():
+    """Основная функция нагрузочного теста"""
+    args = parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    print(f"🧪 Нагрузочный тест: {args.flows} заявок, {args.workers} воркеров...\n")
+
+    report = await run_load_test(args)
+
+    print("📊 Результаты:")
+    print(f"   Создано серверов: {report['done']}/{report['flows']} "
+          f"(ошибок: {report['failed']}, не завершено: {report['unfinished']})")
+    print(f"   Время: {report['elapsed']:.2f} с, пропускная способность: {report['throughput']:.1f} серв/с")
+    print(f"   Задержка p50: {report['p50'] * 1000:.0f} мс")
+    print(f"   Задержка p95: {report['p95'] * 1000:.0f} мс")
+    print(f"   Задержка p99: {report['p99'] * 1000:.0f} мс")
+    print(f"   Запросов к панели: {report['requests']} (429: {report['rate_limited']}), "
+          f"серверов в панели: {report['servers']}")
+    print(f"   Удалено серверов: {report['deleted']}, осталось в панели: {report['remaining']}")
+    for code, count in sorted(report['errors'].items()):
+        print(f"   ❌ {code}: {count}")
+
+    problems = check_report(report, args)
+    if problems:
+        print("\n⚠️ Ошибки, не вызванные внедренными сбоями:")
+        for problem in problems:
+            print(f"   {problem}")
+        sys.exit(1)
+    print("\n🎉 Непредвиденных ошибок нет")
+
+if __name__ == "__main__":
+    asyncio.run(main())
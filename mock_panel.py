@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+Локальная имитация Pterodactyl API для тестов без обращения к реальной панели
+"""
+
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any, Callable, List, Tuple
+from aiohttp import web
+
+
+POWER_SIGNALS = {'start': 'running', 'stop': 'offline', 'restart': 'running', 'kill': 'offline'}
+
+
+class MockPanel:
+    """Имитация панели Pterodactyl с внедрением сбоев
+
+    latency и jitter задают задержку каждого ответа в секундах, error_rate -
+    долю случайных ответов 500. rate_limit и client_rate_limit - число запросов
+    к application и client API за rate_window секунд (None - без ограничения;
+    в панели по умолчанию 240 и 720 в минуту).
+    """
+
+    def __init__(self, token: str = "test-token", nodes: int = 1, allocations_per_node: int = 100,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: Optional[int] = None, client_rate_limit: Optional[int] = None,
+                 rate_window: float = 60.0, max_per_page: Optional[int] = None, seed: Optional[int] = None,
+                 client_token: Optional[str] = None):
+        self.token = token
+        # Ключ client API; None - принимается ключ приложения
+        self.client_token = client_token
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.servers: Dict[int, Dict[str, Any]] = {}
+        self.allocations: Dict[int, Dict[str, Any]] = {}
+        self.nodes: Dict[int, Dict[str, Any]] = {}
+        self.request_counts: Dict[str, int] = {}
+        self.status_counts: Dict[int, int] = {}
+        # Ошибки, которые вернули обработчики, а не внедренные сбои: (маршрут, код) -> число
+        self.handler_errors: Dict[Tuple[str, int], int] = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_per_page = max_per_page
+        self.rate_window = rate_window
+        # API -> [лимит, начало окна, запросов в окне]
+        self._rate_limits: Dict[str, List[Any]] = {
+            'application': [rate_limit, 0.0, 0],
+            'client': [client_rate_limit, 0.0, 0],
+        }
+        # Сбои по маршруту "METHOD /шаблон/пути"
+        self._faults: Dict[str, List[Dict[str, Any]]] = {}
+        # Постоянная дополнительная задержка маршрута
+        self._route_latency: Dict[str, float] = {}
+        self._random = random.Random(seed)
+        self._next_id = {'users': 1, 'servers': 1}
+        self._runner: Optional[web.AppRunner] = None
+
+        allocation_id = 1
+        for node in range(1, nodes + 1):
+            self.nodes[node] = {
+                'id': node, 'uuid': str(uuid.uuid4()), 'public': True,
+                'name': f"node-{node}", 'location_id': 1, 'fqdn': f"node{node}.example.com",
+                'memory': 65536, 'memory_overallocate': 0, 'disk': 1048576, 'disk_overallocate': 0,
+                'maintenance_mode': False,
+            }
+            for port in range(25565, 25565 + allocations_per_node):
+                self.allocations[allocation_id] = {
+                    'id': allocation_id, 'node': node, 'ip': '127.0.0.1',
+                    'port': port, 'assigned': False
+                }
+                allocation_id += 1
+
+    # --- Управление имитацией ---
+
+    def inject_timeout(self, method: str, route: str, count: int = 1,
+                       after_commit: bool = True, hang: float = 30.0) -> None:
+        """Зависнуть на следующих count запросах маршрута
+
+        after_commit=True имитирует худший случай: панель выполнила запрос,
+        но ответ до клиента не дошел.
+        """
+        self._faults.setdefault(f"{method} {route}", []).extend(
+            {'kind': 'timeout', 'after_commit': after_commit, 'hang': hang} for _ in range(count)
+        )
+
+    def inject_error(self, method: str, route: str, status: int = 500, count: int = 1) -> None:
+        """Вернуть ошибку на следующих count запросах маршрута"""
+        self._faults.setdefault(f"{method} {route}", []).extend(
+            {'kind': 'error', 'status': status} for _ in range(count)
+        )
+
+    def inject_latency(self, method: str, route: str, delay: float) -> None:
+        """Добавлять delay секунд к каждому ответу маршрута (0 - убрать)"""
+        self._route_latency[f"{method} {route}"] = delay
+
+    def set_resources(self, server_id: str, **resources: Any) -> None:
+        """Задать показатели ресурсов сервера для client API"""
+        server = self._find_client_server(server_id)
+        if server:
+            server['resources'].update(resources)
+
+    def build_app(self) -> web.Application:
+        """Собрать aiohttp-приложение панели"""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get('/api/application/users', self.list_users)
+        app.router.add_post('/api/application/users', self.create_user)
+        app.router.add_get('/api/application/users/external/{external_id}', self.get_user_external)
+        app.router.add_get('/api/application/users/{user_id}', self.get_user)
+        app.router.add_patch('/api/application/users/{user_id}', self.update_user)
+        app.router.add_get('/api/application/servers', self.list_servers)
+        app.router.add_post('/api/application/servers', self.create_server)
+        app.router.add_get('/api/application/servers/external/{external_id}', self.get_server_external)
+        app.router.add_get('/api/application/servers/{server_id}', self.get_server)
+        app.router.add_delete('/api/application/servers/{server_id}', self.delete_server)
+        app.router.add_patch('/api/application/servers/{server_id}/details', self.update_server_details)
+        app.router.add_post('/api/application/servers/{server_id}/suspend', self.suspend_server)
+        app.router.add_post('/api/application/servers/{server_id}/unsuspend', self.unsuspend_server)
+        app.router.add_get('/api/application/nests', self.list_nests)
+        app.router.add_get('/api/application/nests/{nest_id}/eggs', self.list_eggs)
+        app.router.add_get('/api/application/nests/{nest_id}/eggs/{egg_id}', self.get_egg)
+        app.router.add_get('/api/application/nodes', self.list_nodes)
+        app.router.add_get('/api/application/nodes/{node_id}', self.get_node)
+        app.router.add_get('/api/application/nodes/{node_id}/allocations', self.list_allocations)
+        app.router.add_get('/api/client/servers/{server_id}', self.client_get_server)
+        app.router.add_get('/api/client/servers/{server_id}/resources', self.client_resources)
+        app.router.add_post('/api/client/servers/{server_id}/power', self.client_power)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запустить панель, вернуть ее URL"""
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self) -> None:
+        """Остановить панель"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        """Подсчет запросов и ответов"""
+        response = await self._dispatch(request, handler)
+        self.status_counts[response.status] = self.status_counts.get(response.status, 0) + 1
+        return response
+
+    async def _dispatch(self, request: web.Request, handler) -> web.StreamResponse:
+        """Авторизация, ограничение частоты, задержки и внедрение сбоев"""
+        api = 'client' if request.path.startswith('/api/client') else 'application'
+        token = self.client_token if api == 'client' and self.client_token else self.token
+        if request.headers.get('Authorization') != f"Bearer {token}":
+            return self._error(401, "Unauthenticated.")
+        if request.match_info.route.resource is None:
+            return self._error(404, "Route not found.")
+
+        route = f"{request.method} {request.match_info.route.resource.canonical}"
+        self.request_counts[route] = self.request_counts.get(route, 0) + 1
+
+        limit, remaining, retry_after = self._take_rate_limit(api)
+        if remaining < 0:
+            response = self._error(429, "Too Many Attempts.")
+            response.headers['Retry-After'] = str(retry_after)
+            response.headers['X-RateLimit-Limit'] = str(limit)
+            response.headers['X-RateLimit-Remaining'] = '0'
+            return response
+
+        delay = self.latency + self._route_latency.get(route, 0.0)
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        faults = self._faults.get(route)
+        fault = faults.pop(0) if faults else None
+        if fault and fault['kind'] == 'error':
+            return self._error(fault['status'], "Injected error.")
+        if fault and fault['kind'] == 'timeout':
+            if fault['after_commit']:
+                await handler(request)
+            await asyncio.sleep(fault['hang'])
+            return self._error(504, "Injected timeout.")
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self._error(500, "Random injected error.")
+
+        response = await handler(request)
+        if response.status >= 400:
+            key = (route, response.status)
+            self.handler_errors[key] = self.handler_errors.get(key, 0) + 1
+        if limit is not None:
+            response.headers['X-RateLimit-Limit'] = str(limit)
+            response.headers['X-RateLimit-Remaining'] = str(remaining)
+        return response
+
+    def _take_rate_limit(self, api: str):
+        """Учесть запрос в окне ограничения: (лимит, остаток, секунд до сброса)
+
+        Отрицательный остаток означает, что лимит исчерпан.
+        """
+        state = self._rate_limits[api]
+        limit = state[0]
+        if limit is None:
+            return None, 0, 0
+        now = time.monotonic()
+        if now - state[1] >= self.rate_window:
+            state[1], state[2] = now, 0
+        retry_after = max(1, int(state[1] + self.rate_window - now + 0.999))
+        if state[2] >= limit:
+            return limit, -1, retry_after
+        state[2] += 1
+        return limit, limit - state[2], retry_after
+
+    # --- Сериализация ---
+
+    @staticmethod
+    def _error(status: int, detail: str) -> web.Response:
+        return web.json_response(
+            {'errors': [{'code': 'MockPanelException', 'status': str(status), 'detail': detail}]},
+            status=status
+        )
+
+    @staticmethod
+    def _object(kind: str, attributes: Dict[str, Any]) -> Dict[str, Any]:
+        return {'object': kind, 'attributes': attributes}
+
+    def _list(self, request: web.Request, kind: str, items: List[Dict[str, Any]],
+              serialize: Callable[[Dict[str, Any]], Dict[str, Any]] = dict) -> web.Response:
+        """Постраничный список в формате панели (serialize применяется только к странице)"""
+        per_page = max(1, int(request.query.get('per_page', 50)))
+        if self.max_per_page:
+            per_page = min(per_page, self.max_per_page)
+        page = max(1, int(request.query.get('page', 1)))
+        total_pages = max(1, -(-len(items) // per_page))
+        chunk = items[(page - 1) * per_page:page * per_page]
+        links = {}
+        base_url = str(request.url.with_query(None))
+        if page > 1:
+            links['previous'] = f"{base_url}?page={page - 1}&per_page={per_page}"
+        if page < total_pages:
+            links['next'] = f"{base_url}?page={page + 1}&per_page={per_page}"
+        return web.json_response({
+            'object': 'list',
+            'data': [self._object(kind, serialize(item)) for item in chunk],
+            'meta': {'pagination': {
+                'total': len(items), 'count': len(chunk), 'per_page': per_page,
+                'current_page': page, 'total_pages': total_pages, 'links': links
+            }}
+        })
+
+    @staticmethod
+    def _public_user(user: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in user.items() if key != 'password'}
+
+    def _new_id(self, kind: str) -> int:
+        value = self._next_id[kind]
+        self._next_id[kind] += 1
+        return value
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat()
+
+    # --- Пользователи ---
+
+    async def list_users(self, request: web.Request) -> web.Response:
+        users = list(self.users.values())
+        for field in ('email', 'username', 'uuid', 'external_id'):
+            value = request.query.get(f'filter[{field}]')
+            if value is not None:
+                users = [user for user in users if user.get(field) == value]
+        return self._list(request, 'user', users, self._public_user)
+
+    async def create_user(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        for field in ('email', 'username', 'external_id'):
+            if data.get(field) and any(user.get(field) == data[field] for user in self.users.values()):
+                return self._error(422, f"The {field} has already been taken.")
+
+        user_id = self._new_id('users')
+        user = {
+            'id': user_id,
+            'external_id': data.get('external_id'),
+            'uuid': str(uuid.uuid4()),
+            'username': data['username'],
+            'email': data['email'],
+            'first_name': data.get('first_name'),
+            'last_name': data.get('last_name'),
+            'language': data.get('language', 'en'),
+            'root_admin': bool(data.get('root_admin')),
+            '2fa': False,
+            'password': data.get('password'),
+            'created_at': self._now(),
+            'updated_at': self._now(),
+        }
+        self.users[user_id] = user
+        return web.json_response(self._object('user', self._public_user(user)), status=201)
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        user = self.users.get(int(request.match_info['user_id']))
+        if not user:
+            return self._error(404, "User not found.")
+        return web.json_response(self._object('user', self._public_user(user)))
+
+    async def get_user_external(self, request: web.Request) -> web.Response:
+        external_id = request.match_info['external_id']
+        for user in self.users.values():
+            if user.get('external_id') == external_id:
+                return web.json_response(self._object('user', self._public_user(user)))
+        return self._error(404, "User not found.")
+
+    async def update_user(self, request: web.Request) -> web.Response:
+        user = self.users.get(int(request.match_info['user_id']))
+        if not user:
+            return self._error(404, "User not found.")
+        data = await request.json()
+        for field in ('email', 'username', 'external_id'):
+            if data.get(field) and any(other.get(field) == data[field] and other is not user
+                                       for other in self.users.values()):
+                return self._error(422, f"The {field} has already been taken.")
+        for field in ('email', 'username', 'first_name', 'last_name', 'language', 'password', 'external_id'):
+            if field in data:
+                user[field] = data[field]
+        user['updated_at'] = self._now()
+        return web.json_response(self._object('user', self._public_user(user)))
+
+    # --- Серверы ---
+
+    def _find_server(self, server_id: str) -> Optional[Dict[str, Any]]:
+        """Найти сервер по внутреннему ID (application API, как в панели - только число)"""
+        if server_id.isdigit():
+            return self.servers.get(int(server_id))
+        return None
+
+    def _find_client_server(self, identifier: str) -> Optional[Dict[str, Any]]:
+        """Найти сервер по короткому идентификатору или UUID (client API)"""
+        for server in self.servers.values():
+            if identifier in (server['identifier'], server['uuid']):
+                return server
+        return None
+
+    @staticmethod
+    def _public_server(server: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in server.items() if key not in ('power_state', 'resources')}
+
+    async def list_servers(self, request: web.Request) -> web.Response:
+        servers = list(self.servers.values())
+        # Фильтры панели ищут вхождение подстроки (LIKE %value%)
+        for name, field in (('uuidShort', 'identifier'), ('uuid', 'uuid'),
+                            ('external_id', 'external_id'), ('name', 'name')):
+            value = request.query.get(f'filter[{name}]')
+            if value is not None:
+                servers = [server for server in servers if value in (server.get(field) or '')]
+        return self._list(request, 'server', servers, self._public_server)
+
+    async def create_server(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        if data.get('user') not in self.users:
+            return self._error(422, "The selected user is invalid.")
+        if data.get('external_id') and any(server.get('external_id') == data['external_id']
+                                           for server in self.servers.values()):
+            return self._error(422, "The external id has already been taken.")
+        allocation = self.allocations.get(data.get('allocation', {}).get('default'))
+        if not allocation or allocation['assigned']:
+            return self._error(422, "The requested allocation is not available.")
+
+        allocation['assigned'] = True
+        server_id = self._new_id('servers')
+        server_uuid = str(uuid.uuid4())
+        server = {
+            'id': server_id,
+            'external_id': data.get('external_id'),
+            'uuid': server_uuid,
+            'identifier': server_uuid[:8],
+            'name': data['name'],
+            'description': data.get('description', ''),
+            'status': None,
+            'suspended': False,
+            'limits': data.get('limits', {}),
+            'feature_limits': data.get('feature_limits', {}),
+            'user': data['user'],
+            'node': allocation['node'],
+            'allocation': allocation['id'],
+            'nest': data.get('nest'),
+            'egg': data.get('egg'),
+            'container': {
+                'startup_command': data.get('startup'),
+                'image': data.get('docker_image'),
+                'installed': 1,
+                'environment': data.get('environment', {}),
+            },
+            'created_at': self._now(),
+            'updated_at': self._now(),
+            'power_state': 'offline',
+            'resources': {},
+        }
+        self.servers[server_id] = server
+        return web.json_response(self._object('server', self._public_server(server)), status=201)
+
+    async def get_server(self, request: web.Request) -> web.Response:
+        server = self._find_server(request.match_info['server_id'])
+        if not server:
+            return self._error(404, "Server not found.")
+        return web.json_response(self._object('server', self._public_server(server)))
+
+    async def get_server_external(self, request: web.Request) -> web.Response:
+        external_id = request.match_info['external_id']
+        for server in self.servers.values():
+            if server.get('external_id') == external_id:
+                return web.json_response(self._object('server', self._public_server(server)))
+        return self._error(404, "Server not found.")
+
+    async def delete_server(self, request: web.Request) -> web.Response:
+        server = self._find_server(request.match_info['server_id'])
+        if not server:
+            return self._error(404, "Server not found.")
+        self.allocations[server['allocation']]['assigned'] = False
+        del self.servers[server['id']]
+        return web.Response(status=204)
+
+    async def update_server_details(self, request: web.Request) -> web.Response:
+        server = self._find_server(request.match_info['server_id'])
+        if not server:
+            return self._error(404, "Server not found.")
+        data = await request.json()
+        if 'user' in data and data['user'] not in self.users:
+            return self._error(422, "The selected user is invalid.")
+        if data.get('external_id') and any(other.get('external_id') == data['external_id'] and other is not server
+                                           for other in self.servers.values()):
+            return self._error(422, "The external id has already been taken.")
+        for field in ('name', 'user', 'external_id', 'description'):
+            if field in data:
+                server[field] = data[field]
+        server['updated_at'] = self._now()
+        return web.json_response(self._object('server', self._public_server(server)))
+
+    async def suspend_server(self, request: web.Request) -> web.Response:
+        server = self._find_server(request.match_info['server_id'])
+        if not server:
+            return self._error(404, "Server not found.")
+        server['suspended'] = True
+        server['power_state'] = 'offline'
+        return web.Response(status=204)
+
+    async def unsuspend_server(self, request: web.Request) -> web.Response:
+        server = self._find_server(request.match_info['server_id'])
+        if not server:
+            return self._error(404, "Server not found.")
+        server['suspended'] = False
+        return web.Response(status=204)
+
+    # --- Гнезда, яйца и ноды ---
+
+    async def list_nests(self, request: web.Request) -> web.Response:
+        nest = {'id': 1, 'uuid': '00000000-0000-0000-0000-000000000001', 'author': 'support@pterodactyl.io',
+                'name': 'Minecraft', 'description': 'Minecraft - the classic game from Mojang.'}
+        return self._list(request, 'nest', [nest])
+
+    async def list_eggs(self, request: web.Request) -> web.Response:
+        nest_id = int(request.match_info['nest_id'])
+        include_variables = 'variables' in request.query.get('include', '').split(',')
+        return self._list(request, 'egg', [self._egg(nest_id, 3, include_variables)])
+
+    async def get_egg(self, request: web.Request) -> web.Response:
+        include_variables = 'variables' in request.query.get('include', '').split(',')
+        egg = self._egg(int(request.match_info['nest_id']), int(request.match_info['egg_id']), include_variables)
+        return web.json_response(self._object('egg', egg))
+
+    def _egg(self, nest_id: int, egg_id: int, include_variables: bool) -> Dict[str, Any]:
+        egg = {
+            'id': egg_id,
+            'nest': nest_id,
+            'name': 'Paper',
+            'docker_image': 'ghcr.io/pterodactyl/yolks:java_21',
+            'docker_images': {'Java 21': 'ghcr.io/pterodactyl/yolks:java_21'},
+            'startup': 'java -Xms128M -XX:MaxRAMPercentage=95.0 -jar {{SERVER_JARFILE}}',
+        }
+        if include_variables:
+            variables = [
+                ('SERVER_JARFILE', 'server.jar', 'required|regex:/^([\\w\\d._-]+)(\\.jar)$/'),
+                ('MINECRAFT_VERSION', 'latest', 'nullable|string|max:20'),
+                ('BUILD_NUMBER', 'latest', 'required|string|max:20'),
+            ]
+            egg['relationships'] = {'variables': {'object': 'list', 'data': [
+                self._object('egg_variable', {'env_variable': name, 'default_value': default, 'rules': rules})
+                for name, default, rules in variables
+            ]}}
+        return egg
+
+    async def list_nodes(self, request: web.Request) -> web.Response:
+        return self._list(request, 'node', list(self.nodes.values()))
+
+    async def get_node(self, request: web.Request) -> web.Response:
+        node = self.nodes.get(int(request.match_info['node_id']))
+        if not node:
+            return self._error(404, "Node not found.")
+        return web.json_response(self._object('node', node))
+
+    async def list_allocations(self, request: web.Request) -> web.Response:
+        node = int(request.match_info['node_id'])
+        allocations = [allocation for allocation in self.allocations.values() if allocation['node'] == node]
+        return self._list(request, 'allocation', allocations)
+
+    # --- Client API ---
+
+    async def client_get_server(self, request: web.Request) -> web.Response:
+        server = self._find_client_server(request.match_info['server_id'])
+        if not server:
+            return self._error(404, "Server not found.")
+        allocation = self.allocations[server['allocation']]
+        return web.json_response(self._object('server', {
+            'server_owner': True,
+            'identifier': server['identifier'],
+            'internal_id': server['id'],
+            'uuid': server['uuid'],
+            'name': server['name'],
+            'node': self.nodes[server['node']]['name'],
+            'description': server['description'],
+            'limits': server['limits'],
+            'feature_limits': server['feature_limits'],
+            'is_suspended': server['suspended'],
+            'is_installing': server['status'] == 'installing',
+            'relationships': {'allocations': {'object': 'list', 'data': [self._object('allocation', {
+                'id': allocation['id'], 'ip': allocation['ip'], 'port': allocation['port'], 'is_default': True
+            })]}},
+        }))
+
+    async def client_resources(self, request: web.Request) -> web.Response:
+        server = self._find_client_server(request.match_info['server_id'])
+        if not server:
+            return self._error(404, "Server not found.")
+        running = server['power_state'] == 'running'
+        resources = {
+            'memory_bytes': 512 * 1024 * 1024 if running else 0,
+            'cpu_absolute': 5.0 if running else 0.0,
+            'disk_bytes': 100 * 1024 * 1024,
+            'network_rx_bytes': 0,
+            'network_tx_bytes': 0,
+            'uptime': 60000 if running else 0,
+        }
+        resources.update(server['resources'])
+        return web.json_response({'object': 'stats', 'attributes': {
+            'current_state': server['power_state'],
+            'is_suspended': server['suspended'],
+            'resources': resources,
+        }})
+
+    async def client_power(self, request: web.Request) -> web.Response:
+        server = self._find_client_server(request.match_info['server_id'])
+        if not server:
+            return self._error(404, "Server not found.")
+        data = await request.json()
+        if data.get('signal') not in POWER_SIGNALS:
+            return self._error(422, "The selected signal is invalid.")
+        if server['suspended']:
+            return self._error(409, "This server is currently suspended and the functionality requested is unavailable.")
+        server['power_state'] = POWER_SIGNALS[data['signal']]
+        return web.Response(status=204)
+
+
+async def main():
+    """Запустить имитацию панели вручную"""
+    panel = MockPanel()
+    url = await panel.start(port=8080)
+    print(f"🧪 Имитация панели запущена: {url} (токен: {panel.token})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await panel.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
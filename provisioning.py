@@ -0,0 +1,538 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Optional, Dict, Any, List, Tuple
+from telegram import Bot, InlineKeyboardMarkup
+from db.database import Database
+from pterodactyl_api import AllocationUnavailable, PterodactylAPI, PterodactylError
+from server_profiles import ServerProfile, ServerProfileRegistry
+from utils.credentials import CredentialGenerator
+from utils.locks import KeyedLock
+from utils.message_editor import MessageEditor
+from views import (
+    ACTIVE_JOB, JOB_QUEUED, JOB_PROGRESS, JOB_FAILED, SERVER_CREDENTIALS, SERVER_CREATED, SERVER_GRANTED,
+    SERVER_GIVEN, BACK_KEYBOARD, MY_SERVER_KEYBOARD, RETRY_EMAIL_KEYBOARD, Html
+)
+from warm_pool import WarmPool
+
+logger = logging.getLogger(__name__)
+
+# Этапы создания сервера: заявка продолжается с последнего завершенного этапа
+STEP_NEW = 'new'
+STEP_CREDENTIALS = 'credentials'
+STEP_PANEL_USER = 'panel_user'
+STEP_ALLOCATION = 'allocation'
+STEP_SERVER = 'server'
+STEP_SAVED = 'saved'
+
+STEP_TITLES = {
+    STEP_NEW: "Проверка данных",
+    STEP_CREDENTIALS: "Создание пользователя в панели",
+    STEP_PANEL_USER: "Выделение порта",
+    STEP_ALLOCATION: "Создание сервера",
+    STEP_SERVER: "Сохранение данных",
+}
+STEP_ORDER = list(STEP_TITLES)
+
+# Сколько раз выбирать allocation заново, если его успела зарезервировать другая заявка
+ALLOCATION_RESERVE_TRIES = 5
+
+
+class ProvisioningError(Exception):
+    """Ошибка этапа создания сервера
+
+    counted=False - повтор не расходует попытку (конфликт за общий ресурс, а не сбой).
+    """
+
+    def __init__(self, code: str, message: str, retryable: bool = True, counted: bool = True):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.retryable = retryable
+        self.counted = counted
+
+
+class LeaseLost(Exception):
+    """Аренда заявки истекла, и ее выполняет другой экземпляр: выполнение прекращается"""
+
+
+class ProvisioningQueue:
+    """Персистентная очередь создания серверов с пулом асинхронных воркеров"""
+
+    def __init__(self, db: Database, pterodactyl_api: PterodactylAPI, workers: int = 2,
+                 max_attempts: int = 3, poll_interval: float = 5.0,
+                 profiles: Optional[ServerProfileRegistry] = None, warm_pool: Optional[WarmPool] = None,
+                 message_editor: Optional[MessageEditor] = None, lease_seconds: float = 60.0):
+        self.db = db
+        self.pterodactyl_api = pterodactyl_api
+        self.profiles = profiles or ServerProfileRegistry()
+        self.warm_pool = warm_pool
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        # Заявка берется в аренду экземпляром и продлевается, пока выполняется. Заявку с истекшей
+        # арендой (экземпляр упал) вернет в очередь любой экземпляр, живые заявки не трогаются
+        self.instance_id = uuid.uuid4().hex
+        self.lease_seconds = lease_seconds
+        self.bot: Optional[Bot] = None
+        # Правки сообщений заявок: без повторов одного текста, ход - не чаще раза в интервал
+        self.message_editor = message_editor or MessageEditor()
+        # Проверка "нет сервера и заявки" и постановка заявки выполняются под блокировкой пользователя
+        self.user_locks = KeyedLock()
+        # Выбор и резервирование allocation на ноде идут по очереди
+        self.allocation_locks = KeyedLock()
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, bot: Bot) -> None:
+        """Запустить воркеры и восстановить прерванные заявки"""
+        self.bot = bot
+        self._requeue_expired()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"Очередь создания серверов запущена, воркеров: {self.workers}")
+
+    async def stop(self) -> None:
+        """Остановить воркеры и вернуть незавершенные заявки в очередь"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = self.db.requeue_expired_provisioning_jobs(owner=self.instance_id)
+        if released:
+            logger.info(f"Возвращено в очередь незавершенных заявок: {released}")
+
+    def _requeue_expired(self) -> None:
+        """Вернуть в очередь заявки экземпляров, которые перестали продлевать аренду"""
+        resumed = self.db.requeue_expired_provisioning_jobs()
+        if resumed:
+            logger.info(f"Возобновлено прерванных заявок на сервер: {resumed}")
+            self._wakeup.set()
+
+    def enqueue(self, telegram_id: int, chat_id: Optional[int], message_id: Optional[int],
+                requested_by: Optional[int] = None, profile: Optional[str] = None) -> Optional[int]:
+        """Поставить заявку в очередь, вернуть ее ID"""
+        job_id = self.db.create_provisioning_job(telegram_id, chat_id, message_id, requested_by,
+                                                 profile or self.profiles.default_name)
+        if job_id:
+            self._wakeup.set()
+        return job_id
+
+    def request(self, telegram_id: int, chat_id: Optional[int], message_id: Optional[int],
+                requested_by: Optional[int] = None,
+                profile: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Поставить заявку или присоединиться к активной заявке пользователя
+        
+        Возвращает заявку и признак того, что она создана этим вызовом. У активной
+        заявки сообщение (chat_id, message_id) не меняется - ход показывается в нем.
+        Уникальный индекс по активным заявкам не даст создать вторую, даже если
+        ее одновременно ставит другой экземпляр бота.
+        """
+        active = self.db.get_active_provisioning_job(telegram_id)
+        if active:
+            return active, False
+        job_id = self.enqueue(telegram_id, chat_id, message_id, requested_by, profile)
+        if job_id:
+            return self.db.get_provisioning_job(job_id), True
+        return self.db.get_active_provisioning_job(telegram_id), False
+    
+    def progress_text(self, job: Dict[str, Any]) -> Html:
+        """Текущее состояние заявки"""
+        if job['status'] == 'queued':
+            return JOB_QUEUED.render(position=self.db.count_queued_provisioning_jobs(before_id=job['id']) + 1)
+        number = STEP_ORDER.index(job['step']) + 1 if job['step'] in STEP_TITLES else len(STEP_ORDER)
+        return JOB_PROGRESS.render(attempt=job['attempts'], number=number, total=len(STEP_ORDER),
+                                   title=STEP_TITLES.get(job['step'], STEP_TITLES[STEP_SERVER]))
+    
+    async def watch(self, job_id: int, chat_id: int, message_id: int) -> None:
+        """Показывать ход заявки еще и в сообщении (chat_id, message_id)
+        
+        Сообщение регистрируется за заявкой, и воркеры любого экземпляра бота
+        обновляют его вместе с исходным, включая итог.
+        """
+        self.db.add_provisioning_job_message(job_id, chat_id, message_id)
+        job = self.db.get_provisioning_job(job_id)
+        if not job:
+            return
+        await self._show(job, chat_id, message_id)
+        finished = self.db.get_provisioning_job(job_id)
+        if finished and finished['status'] != job['status'] and finished['status'] in ('done', 'failed'):
+            # Итог пришел, пока показывался прежний этап, и мог быть им затерт
+            await self._show(finished, chat_id, message_id)
+
+    async def _show(self, job: Dict[str, Any], chat_id: int, message_id: int) -> None:
+        """Показать текущее состояние заявки в дополнительном сообщении"""
+        if job['status'] in ('done', 'failed'):
+            text, keyboard = self._result(job)
+        else:
+            text, keyboard = ACTIVE_JOB.render(progress=self.progress_text(job)), None
+        await self._edit_message(job, chat_id, message_id, text, keyboard)
+
+    def next_position(self) -> int:
+        """Позиция, которую займет новая заявка в очереди"""
+        return self.db.count_queued_provisioning_jobs() + 1
+
+    async def _worker(self, number: int) -> None:
+        """Цикл воркера: забирает заявки из очереди и выполняет их"""
+        checked_at = time.monotonic()
+        while True:
+            # Сбрасываем событие до выборки, чтобы не потерять сигнал о новой заявке
+            self._wakeup.clear()
+            if time.monotonic() - checked_at >= self.lease_seconds:
+                checked_at = time.monotonic()
+                self._requeue_expired()
+            job = self.db.claim_provisioning_job(self.instance_id, self.lease_seconds)
+            if not job:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.info(f"Воркер {number} взял заявку {job['id']} (этап {job['step']}, попытка {job['attempts']})")
+            await self._process(job)
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        """Выполнить заявку, продлевая ее аренду; при потере аренды выполнение прерывается"""
+        run = asyncio.create_task(self._run_job(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job['id']))
+        try:
+            await asyncio.wait((run, heartbeat), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Завершившийся heartbeat означает потерю аренды; при остановке воркера отменяются оба
+            run.cancel()
+            heartbeat.cancel()
+            results = await asyncio.gather(run, heartbeat, return_exceptions=True)
+        lease_expired = not heartbeat.cancelled() and heartbeat.exception() is None
+        if lease_expired or isinstance(results[0], LeaseLost):
+            logger.warning(f"Аренда заявки {job['id']} потеряна: заявку выполняет другой экземпляр, "
+                           f"выполнение остановлено на этапе {job['step']}")
+        elif isinstance(results[0], Exception):
+            logger.error(f"Ошибка выполнения заявки {job['id']}: {results[0]}")
+
+    async def _heartbeat(self, job_id: int) -> None:
+        """Продлевать аренду заявки, пока она выполняется; завершается, когда аренда потеряна"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not self.db.renew_provisioning_lease(job_id, self.instance_id, self.lease_seconds):
+                return
+
+    def _update(self, job: Dict[str, Any], **fields: Any) -> None:
+        """Записать поля заявки, пока она арендована этим экземпляром, иначе выбросить LeaseLost"""
+        if not self.db.update_provisioning_job(job['id'], owner=self.instance_id, **fields):
+            raise LeaseLost(job['id'])
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        """Выполнить этапы заявки, начиная с последнего завершенного"""
+        try:
+            while job['step'] != STEP_SAVED:
+                await self._report_progress(job)
+                changes = await self._run_step(job)
+                job.update(changes)
+                self._update(job, **changes)
+        except LeaseLost:
+            raise
+        except ProvisioningError as e:
+            error = e
+        except Exception as e:
+            error = ProvisioningError("UNKNOWN", str(e))
+        else:
+            self._update(job, status='done', error_code=None, error_message=None)
+            job['status'] = 'done'
+            await self._notify_success(job)
+            return
+
+        logger.error(f"Заявка {job['id']}: этап {job['step']} не выполнен - {error.code}: {error.message}")
+        job.update(error_code=error.code, error_message=error.message)
+        if error.retryable and not error.counted:
+            # Попытка не засчитывается: следующий захват заявки снова увеличит счетчик
+            job.update(status='queued', attempts=job['attempts'] - 1)
+            self._update(job, status='queued', step=job['step'], attempts=job['attempts'],
+                         error_code=error.code, error_message=error.message)
+            self._wakeup.set()
+            return
+        if error.retryable and job['attempts'] < self.max_attempts:
+            # Повтор продолжится с того же этапа
+            self._update(job, status='queued', step=job['step'], error_code=error.code, error_message=error.message)
+            job['status'] = 'queued'
+            self._wakeup.set()
+            return
+
+        self._update(job, status='failed', error_code=error.code, error_message=error.message)
+        job['status'] = 'failed'
+        if self.warm_pool:
+            self.warm_pool.release(job['telegram_id'])
+        await self._notify_failure(job)
+
+    async def _run_step(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Выполнить один этап и вернуть измененные поля заявки"""
+        step = job['step']
+        if step == STEP_NEW:
+            return await self._step_credentials(job)
+        if step == STEP_CREDENTIALS:
+            return await self._step_panel_user(job)
+        if step == STEP_PANEL_USER:
+            return await self._step_allocation(job)
+        if step == STEP_ALLOCATION:
+            return await self._step_server(job)
+        if step == STEP_SERVER:
+            return self._step_save(job)
+        raise ProvisioningError("BAD_STEP", f"Неизвестный этап: {step}", retryable=False)
+
+    async def _step_credentials(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Проверить пользователя и сгенерировать уникальные учетные данные"""
+        user_data = self.db.get_user(job['telegram_id'])
+        if not user_data:
+            raise ProvisioningError("USER_NOT_FOUND", "Пользователь не найден.", retryable=False)
+        if self.db.get_user_servers(job['telegram_id']):
+            raise ProvisioningError("SERVER_EXISTS", "У пользователя уже есть сервер.", retryable=False)
+
+        # Email пользователя проверяем только для самостоятельных заявок
+        if not job['requested_by'] and user_data.get('email'):
+            if await self.pterodactyl_api.check_user_exists(email=user_data['email']):
+                raise ProvisioningError(
+                    "EMAIL_EXISTS", "Email уже используется в панели. Пожалуйста, укажите другой email.",
+                    retryable=False
+                )
+
+        for _ in range(3):
+            credentials = CredentialGenerator.generate_credentials(job['telegram_id'], user_data.get('first_name'))
+            exists = await self.pterodactyl_api.check_user_exists(
+                email=credentials['email'],
+                username=credentials['username']
+            )
+            if not exists:
+                return {
+                    'step': STEP_CREDENTIALS,
+                    'username': credentials['username'],
+                    'password': credentials['password'],
+                    'email': credentials['email'],
+                }
+        raise ProvisioningError("PT_USER_EXISTS", "Не удалось сгенерировать уникальные данные для панели.")
+
+    async def _step_panel_user(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Создать пользователя в панели (или продолжить с уже созданным)"""
+        external_id = CredentialGenerator.generate_external_id(job['telegram_id'])
+        try:
+            # Пользователь мог быть создан попыткой, завершившейся таймаутом
+            existing_user = await self.pterodactyl_api.get_user_by_external_id(external_id)
+        except PterodactylError as e:
+            raise ProvisioningError("PT_LOOKUP", f"Панель недоступна: {e}")
+
+        if existing_user:
+            logger.info(f"Заявка {job['id']}: пользователь {external_id} уже есть в панели, обновляем данные")
+            user_result = await self.pterodactyl_api.update_user(
+                existing_user.get('attributes', {}).get('id'),
+                email=job['email'],
+                username=job['username'],
+                first_name=job['username'],
+                password=job['password']
+            )
+        else:
+            user_result = await self.pterodactyl_api.create_user(
+                email=job['email'],
+                username=job['username'],
+                first_name=job['username'],
+                password=job['password'],
+                external_id=external_id
+            )
+        panel_user_id = user_result.get('attributes', {}).get('id') if user_result else None
+        if not panel_user_id:
+            raise ProvisioningError("PT_USER_CREATE", "Не удалось создать пользователя в панели.")
+        return {'step': STEP_PANEL_USER, 'panel_user_id': panel_user_id}
+
+    def _profile(self, job: Dict[str, Any]) -> ServerProfile:
+        """Профиль сервера заявки (из кэша, без обращения к панели)"""
+        profile = self.profiles.get(job['profile'])
+        if not profile:
+            raise ProvisioningError("PROFILE_UNAVAILABLE", f"Профиль сервера {job['profile']} недоступен.",
+                                    retryable=False)
+        return profile
+
+    async def _step_allocation(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Найти и зарезервировать свободный allocation на ноде профиля"""
+        profile = self._profile(job)
+        if self.warm_pool and self.warm_pool.available(profile.name):
+            # Сервер будет выдан из пула, allocation у него уже есть
+            return {'step': STEP_ALLOCATION, 'allocation_id': None}
+        return {'step': STEP_ALLOCATION, 'allocation_id': await self._reserve_allocation(job, profile)}
+
+    async def _reserve_allocation(self, job: Dict[str, Any], profile: ServerProfile) -> int:
+        """Выбрать свободный allocation, не занятый другими активными заявками, и закрепить его за заявкой
+
+        Уникальный индекс по allocation активных заявок не даст закрепить один
+        allocation дважды, в том числе за заявками разных экземпляров бота.
+        """
+        async with self.allocation_locks(profile.node):
+            for _ in range(ALLOCATION_RESERVE_TRIES):
+                allocation_id = await self.pterodactyl_api.get_available_allocation(
+                    profile.node, exclude=self.db.get_reserved_allocations()
+                )
+                if not allocation_id:
+                    raise ProvisioningError("PT_NO_ALLOCATION", "Нет свободных портов на ноде.")
+                if self.db.reserve_provisioning_allocation(job['id'], allocation_id, owner=self.instance_id):
+                    return allocation_id
+                logger.info(f"Заявка {job['id']}: allocation {allocation_id} уже зарезервирован, выбираем другой")
+        raise ProvisioningError("PT_ALLOCATION_BUSY", "Свободный порт заняли другие заявки.", counted=False)
+
+    async def _step_server(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Создать сервер в панели (или продолжить с уже созданным)"""
+        external_id = CredentialGenerator.generate_external_id(job['telegram_id'])
+        try:
+            # Сервер мог быть создан попыткой, завершившейся таймаутом
+            server_result = await self.pterodactyl_api.get_server_by_external_id(external_id)
+        except PterodactylError as e:
+            raise ProvisioningError("PT_LOOKUP", f"Панель недоступна: {e}")
+
+        try:
+            if server_result:
+                logger.info(f"Заявка {job['id']}: сервер {external_id} уже есть в панели, продолжаем с ним")
+                if self.warm_pool and server_result.get('attributes', {}).get('suspended'):
+                    # Сервер пула, переданный попыткой, которая не успела снять приостановку
+                    server_result = await self.warm_pool.activate(job['telegram_id'], server_result)
+            elif self.warm_pool and not job['allocation_id']:
+                server_result = await self.warm_pool.claim(
+                    job['telegram_id'], job['profile'], job['panel_user_id'],
+                    f"server_{job['username']}", external_id
+                )
+        except PterodactylError as e:
+            raise ProvisioningError("PT_WARM_POOL", f"Не удалось выдать сервер из пула: {e}")
+
+        if not server_result:
+            # Пул пуст или не используется - создаем сервер
+            if not job['allocation_id']:
+                job['allocation_id'] = await self._reserve_allocation(job, self._profile(job))
+            try:
+                server_result = await self.pterodactyl_api.create_server(
+                    job['panel_user_id'], f"server_{job['username']}", job['allocation_id'],
+                    external_id=external_id, profile=self._profile(job)
+                )
+            except AllocationUnavailable as e:
+                # Allocation занят сервером, созданным не этой очередью: выбираем другой, попытка не расходуется
+                job.update(step=STEP_PANEL_USER, allocation_id=None)
+                self._update(job, step=STEP_PANEL_USER, allocation_id=None)
+                raise ProvisioningError("PT_ALLOCATION_TAKEN", f"Порт уже занят: {e}", counted=False)
+        if not server_result:
+            # Резерв снимается: при повторе allocation выбирается заново
+            job.update(step=STEP_PANEL_USER, allocation_id=None)
+            self._update(job, step=STEP_PANEL_USER, allocation_id=None)
+            raise ProvisioningError("PT_SERVER_CREATE", "Ошибка при создании сервера.")
+
+        attributes = server_result.get('attributes', {})
+        if not attributes.get('identifier') or not attributes.get('name'):
+            raise ProvisioningError("PT_SERVER_ATTRS", "Панель не вернула данные сервера.", retryable=False)
+        return {
+            'step': STEP_SERVER,
+            'server_identifier': attributes['identifier'],
+            'panel_server_id': attributes.get('id'),
+            'server_name': attributes['name'],
+        }
+
+    def _step_save(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Сохранить сервер в базу данных"""
+        credentials = {'username': job['username'], 'password': job['password'], 'email': job['email']}
+        if not self.db.create_server_with_credentials(job['telegram_id'], job['server_identifier'],
+                                                      job['server_name'], credentials, job['profile'],
+                                                      job.get('panel_server_id')):
+            raise ProvisioningError("DB_SERVER_SAVE", "Ошибка при сохранении сервера.")
+        if job['requested_by']:
+            self.db.log_admin_action(
+                job['requested_by'],
+                "give_server",
+                job['telegram_id'],
+                f"Server ID: {job['server_identifier']}, Username: {job['username']}, Профиль: {job['profile']}"
+            )
+        return {'step': STEP_SAVED}
+
+    async def _edit_status(self, job: Dict[str, Any], text: str,
+                           reply_markup: Optional[InlineKeyboardMarkup] = None, progress: bool = False,
+                           watchers: bool = True) -> None:
+        """Обновить сообщения, в которых отображается ход заявки
+        
+        watchers=False - только исходное сообщение, без добавленных повторными нажатиями.
+        """
+        messages = []
+        if job['chat_id'] and job['message_id']:
+            messages.append((job['chat_id'], job['message_id']))
+        if watchers:
+            messages.extend(self.db.get_provisioning_job_messages(job['id']))
+        for chat_id, message_id in messages:
+            await self._edit_message(job, chat_id, message_id, text, reply_markup, progress)
+
+    async def _edit_watchers(self, job: Dict[str, Any], text: str,
+                             reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        """Обновить сообщения, добавленные к заявке повторными нажатиями"""
+        for chat_id, message_id in self.db.get_provisioning_job_messages(job['id']):
+            await self._edit_message(job, chat_id, message_id, text, reply_markup)
+
+    async def _edit_message(self, job: Dict[str, Any], chat_id: int, message_id: int, text: str,
+                            reply_markup: Optional[InlineKeyboardMarkup] = None, progress: bool = False) -> None:
+        if not self.bot:
+            return
+        try:
+            await self.message_editor.edit_text(
+                self.bot,
+                chat_id,
+                message_id,
+                text,
+                reply_markup=reply_markup,
+                parse_mode='HTML',
+                progress=progress
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось обновить сообщение заявки {job['id']}: {e}")
+
+    async def _report_progress(self, job: Dict[str, Any]) -> None:
+        """Показать текущий этап заявки (частые этапы объединяются)"""
+        await self._edit_status(job, self.progress_text(job), progress=True)
+
+    @staticmethod
+    def _credentials(job: Dict[str, Any]) -> Html:
+        return SERVER_CREDENTIALS.render(server_id=job['server_identifier'], username=job['username'],
+                                         password=job['password'], email=job['email'])
+
+    def _result(self, job: Dict[str, Any]) -> Tuple[Html, Optional[InlineKeyboardMarkup]]:
+        """Итог заявки для пользователя: текст и клавиатура"""
+        if job['status'] == 'done':
+            return SERVER_CREATED.render(credentials=self._credentials(job)), MY_SERVER_KEYBOARD
+        keyboard = RETRY_EMAIL_KEYBOARD if job['error_code'] == "EMAIL_EXISTS" else BACK_KEYBOARD
+        text = JOB_FAILED.render(code=job['error_code'] or 'UNKNOWN', message=job['error_message'] or '')
+        return text, keyboard
+
+    async def _notify_success(self, job: Dict[str, Any]) -> None:
+        """Сообщить о созданном сервере"""
+        text, keyboard = self._result(job)
+        if not job['requested_by']:
+            await self._edit_status(job, text, keyboard)
+            return
+
+        # Сервер выдан администратором: отправляем данные пользователю и отчет админу
+        try:
+            if self.bot:
+                await self.bot.send_message(
+                    chat_id=job['telegram_id'],
+                    text=SERVER_GRANTED.render(credentials=self._credentials(job)),
+                    parse_mode='HTML'
+                )
+        except Exception as e:
+            logger.error(f"Ошибка отправки данных пользователю: {e}")
+
+        user_data = self.db.get_user(job['telegram_id']) or {}
+        await self._edit_status(
+            job,
+            SERVER_GIVEN.render(first_name=user_data.get('first_name'), username=user_data.get('username'),
+                                server_id=job['server_identifier'], panel_username=job['username'],
+                                email=job['email']),
+            watchers=False
+        )
+        # Сообщения, в которых ход заявки смотрел сам пользователь
+        await self._edit_watchers(job, text, keyboard)
+
+    async def _notify_failure(self, job: Dict[str, Any]) -> None:
+        """Сообщить об ошибке создания сервера"""
+        text, keyboard = self._result(job)
+        if not job['requested_by']:
+            await self._edit_status(job, text, keyboard)
+            return
+        await self._edit_status(job, text, watchers=False)
+        await self._edit_watchers(job, text, keyboard)
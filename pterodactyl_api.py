@@ -1,31 +1,116 @@
 import aiohttp
 import asyncio
 import logging
-from typing import Optional, Dict, Any
+from contextlib import aclosing
+from typing import Optional, Dict, Any, AsyncIterator, Callable, Collection, NamedTuple, TypeVar
 import os
+from utils.cache import TTLCache
+from utils.metrics import ApiMetrics
+from utils.rate_limit import AsyncTokenBucket
+from utils.credentials import CredentialGenerator
+from server_profiles import ServerProfile, DEFAULT_PROFILE_NAME, DEFAULT_PROFILE_CONFIG
 
 logger = logging.getLogger(__name__)
 
+class PterodactylError(Exception):
+    """Панель недоступна или вернула ошибку (результат запроса неизвестен)"""
+
+
+class AllocationUnavailable(Exception):
+    """Allocation уже занят другим сервером: сервер не создан, нужен другой allocation"""
+
+
+T = TypeVar('T')
+
+
+# Проекции элементов списков панели: только нужные поля вместо полного дерева attributes
+
+class PanelUser(NamedTuple):
+    id: int
+    external_id: Optional[str]
+    username: str
+    email: str
+
+    @classmethod
+    def from_attributes(cls, attributes: Dict[str, Any]) -> 'PanelUser':
+        return cls(attributes.get('id'), attributes.get('external_id'),
+                   attributes.get('username'), attributes.get('email'))
+
+
+class PanelServer(NamedTuple):
+    id: int
+    identifier: str
+    external_id: Optional[str]
+    user: int
+    node: int
+    status: Optional[str]
+    suspended: bool
+
+    @classmethod
+    def from_attributes(cls, attributes: Dict[str, Any]) -> 'PanelServer':
+        return cls(attributes.get('id'), attributes.get('identifier'), attributes.get('external_id'),
+                   attributes.get('user'), attributes.get('node'), attributes.get('status'),
+                   bool(attributes.get('suspended')))
+
+
+class PanelAllocation(NamedTuple):
+    id: int
+    assigned: bool
+
+    @classmethod
+    def from_attributes(cls, attributes: Dict[str, Any]) -> 'PanelAllocation':
+        return cls(attributes.get('id'), bool(attributes.get('assigned')))
+
+
 class PterodactylAPI:
-    def __init__(self, api_url: str, api_token: str):
+    def __init__(self, api_url: str, api_token: str, cache_ttl: float = 15.0, cache_stale_ttl: float = 0.0,
+                 timeout: float = 30.0, client_token: Optional[str] = None, usage_ttl: float = 10.0,
+                 client_rate_limit: float = 720.0):
         self.api_url = api_url.rstrip('/')
         self.api_token = api_token
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.headers = {
             'Authorization': f'Bearer {api_token}',
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
+        # Client API (питание, ресурсы) требует клиентский ключ; без него используется ключ приложения
+        self.client_headers = dict(self.headers, Authorization=f'Bearer {client_token or api_token}')
+        # Лимит запросов к client API в минуту (в панели по умолчанию 720)
+        self.client_rate_limiter = AsyncTokenBucket(client_rate_limit / 60.0)
+        # Кэш ответов get_server_info по короткому идентификатору сервера
+        self.server_info_cache = TTLCache(ttl=cache_ttl, stale_ttl=cache_stale_ttl)
+        # Кэш снимков потребления ресурсов: повторные просмотры не нагружают Wings
+        self.usage_cache = TTLCache(ttl=usage_ttl)
+        # Задержки, коды ответов и размеры данных по эндпоинтам
+        self.metrics = ApiMetrics()
+        self._trace_configs = [self.metrics.trace_config()]
+        # Профиль для вызовов без явного профиля
+        self.default_profile = ServerProfile(DEFAULT_PROFILE_NAME, DEFAULT_PROFILE_CONFIG)
+    
+    def _session(self) -> aiohttp.ClientSession:
+        """Сессия с таймаутом и сбором метрик"""
+        return aiohttp.ClientSession(timeout=self.timeout, trace_configs=self._trace_configs)
     
-    async def delete_server(self, server_id: str) -> bool:
-        """Удалить сервер"""
+    async def delete_server(self, server_id: int, identifier: Optional[str] = None) -> bool:
+        """Удалить сервер по числовому ID (404 считается успешным удалением)
+        
+        identifier - короткий идентификатор сервера, чтобы сбросить кэш get_server_info.
+        """
         try:
-            async with aiohttp.ClientSession() as session:
+            async with self._session() as session:
                 async with session.delete(
                     f"{self.api_url}/api/application/servers/{server_id}",
                     headers=self.headers
                 ) as response:
                     if response.status == 204:
                         logger.info(f"Сервер {server_id} удален")
+                        self.server_info_cache.invalidate(identifier)
+                        return True
+                    elif response.status == 404:
+                        # Сервера с этим ID уже нет в панели - результат тот же, что и после удаления
+                        logger.info(f"Сервер {server_id} уже удален из панели")
+                        self.server_info_cache.invalidate(identifier)
                         return True
                     else:
                         error_text = await response.text()
@@ -37,67 +122,115 @@ class PterodactylAPI:
             return False
     
     async def get_server_info(self, server_id: str) -> Optional[Dict[str, Any]]:
-        """Получить информацию о сервере"""
+        """Получить информацию о сервере (с кэшированием)"""
+        return await self.server_info_cache.get_or_load(
+            server_id, lambda: self._fetch_server_info(server_id)
+        )
+    
+    async def get_server_resources(self, server_id: str) -> Optional[Dict[str, Any]]:
+        """Получить текущее потребление ресурсов сервера (с кэшированием)"""
+        return await self.usage_cache.get_or_load(
+            server_id, lambda: self._fetch_server_resources(server_id)
+        )
+    
+    async def _fetch_server_resources(self, server_id: str) -> Optional[Dict[str, Any]]:
+        """Запросить потребление ресурсов через client API"""
         try:
-            async with aiohttp.ClientSession() as session:
+            await self.client_rate_limiter.acquire()
+            async with self._session() as session:
                 async with session.get(
-                    f"{self.api_url}/api/application/servers/{server_id}",
-                    headers=self.headers
+                    f"{self.api_url}/api/client/servers/{server_id}/resources",
+                    headers=self.client_headers
                 ) as response:
                     if response.status == 200:
-                        return await response.json()
+                        result = await response.json()
+                        return result.get('attributes')
                     else:
                         error_text = await response.text()
-                        logger.error(f"Ошибка получения информации о сервере: {response.status} - {error_text}")
+                        logger.error(f"Ошибка получения ресурсов сервера: {response.status} - {error_text}")
                         return None
                         
         except Exception as e:
+            logger.error(f"Ошибка получения ресурсов сервера: {e}")
+            return None
+    
+    async def _fetch_server_info(self, server_id: str) -> Optional[Dict[str, Any]]:
+        """Запросить информацию о сервере из панели"""
+        try:
+            attributes = await self.find_server(server_id)
+        except PterodactylError as e:
             logger.error(f"Ошибка получения информации о сервере: {e}")
             return None
+        if not attributes:
+            logger.error(f"Сервер {server_id} не найден в панели")
+            return None
+        return {'object': 'server', 'attributes': attributes}
+    
+    async def find_server(self, identifier: str) -> Optional[Dict[str, Any]]:
+        """Найти сервер по короткому идентификатору, вернуть его attributes
+        
+        Application API принимает только числовой ID, поэтому сервер ищется
+        в списке с фильтром (фильтр панели ищет подстроку - идентификатор
+        сверяется точно). Возвращает None, если сервера нет; если панель
+        не ответила, выбрасывает PterodactylError.
+        """
+        params = {"filter[uuidShort]": identifier}
+        async with aclosing(self.iter_list("/api/application/servers", dict, params=params)) as servers:
+            async for attributes in servers:
+                if attributes.get('identifier') == identifier:
+                    return attributes
+        return None
+    
+    async def get_server_id(self, identifier: str) -> Optional[int]:
+        """Числовой ID сервера по короткому идентификатору (см. find_server)"""
+        attributes = await self.find_server(identifier)
+        return attributes.get('id') if attributes else None
     
     async def start_server(self, server_id: str) -> bool:
         """Запустить сервер"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_url}/api/client/servers/{server_id}/power",
-                    headers=self.headers,
-                    json={"signal": "start"}
-                ) as response:
-                    if response.status == 204:
-                        logger.info(f"Сервер {server_id} запущен")
-                        return True
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка запуска сервера: {response.status} - {error_text}")
-                        return False
-                        
-        except Exception as e:
-            logger.error(f"Ошибка запуска сервера: {e}")
-            return False
+        return await self.send_power_signal(server_id, "start")
     
     async def stop_server(self, server_id: str) -> bool:
         """Остановить сервер"""
+        return await self.send_power_signal(server_id, "stop")
+    
+    async def send_power_signal(self, server_id: str, signal: str, retries: int = 3) -> bool:
+        """Отправить серверу сигнал питания: start, stop, restart или kill
+        
+        Запросы проходят через ограничитель частоты client API; на 429 запрос
+        повторяется после Retry-After.
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_url}/api/client/servers/{server_id}/power",
-                    headers=self.headers,
-                    json={"signal": "stop"}
-                ) as response:
-                    if response.status == 204:
-                        logger.info(f"Сервер {server_id} остановлен")
-                        return True
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка остановки сервера: {response.status} - {error_text}")
-                        return False
+            async with self._session() as session:
+                for attempt in range(retries + 1):
+                    await self.client_rate_limiter.acquire()
+                    async with session.post(
+                        f"{self.api_url}/api/client/servers/{server_id}/power",
+                        headers=self.client_headers,
+                        json={"signal": signal}
+                    ) as response:
+                        if response.status == 204:
+                            logger.info(f"Сервер {server_id}: сигнал {signal} отправлен")
+                            self.server_info_cache.invalidate(server_id)
+                            self.usage_cache.invalidate(server_id)
+                            return True
+                        elif response.status == 429 and attempt < retries:
+                            retry_after = float(response.headers.get('Retry-After', 1))
+                            logger.warning(f"Лимит запросов панели, повтор через {retry_after} с")
+                            await asyncio.sleep(min(retry_after, 60.0))
+                        else:
+                            error_text = await response.text()
+                            logger.error(f"Ошибка сигнала {signal} для сервера {server_id}: "
+                                         f"{response.status} - {error_text}")
+                            return False
+                return False
                         
         except Exception as e:
-            logger.error(f"Ошибка остановки сервера: {e}")
+            logger.error(f"Ошибка сигнала {signal} для сервера {server_id}: {e}")
             return False
     
-    async def create_user(self, email: str, username: str, first_name: str, password: str) -> Optional[Dict[str, Any]]:
+    async def create_user(self, email: str, username: str, first_name: str, password: str,
+                          external_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Создать пользователя в Pterodactyl"""
         try:
             user_data = {
@@ -109,8 +242,10 @@ class PterodactylAPI:
                 "root_admin": False,
                 "language": "ru"
             }
+            if external_id:
+                user_data["external_id"] = external_id
             
-            async with aiohttp.ClientSession() as session:
+            async with self._session() as session:
                 async with session.post(
                     f"{self.api_url}/api/application/users",
                     headers=self.headers,
@@ -118,7 +253,7 @@ class PterodactylAPI:
                 ) as response:
                     if response.status == 201:
                         result = await response.json()
-                        logger.info(f"Пользователь создан: {result}")
+                        logger.info(f"Пользователь создан: {result.get('attributes', {}).get('id')}")
                         return result
                     else:
                         error_text = await response.text()
@@ -129,56 +264,137 @@ class PterodactylAPI:
             logger.error(f"Ошибка создания пользователя: {e}")
             return None
 
-    async def check_user_exists(self, email: Optional[str] = None, username: Optional[str] = None) -> bool:
-        """Проверить существование пользователя по email или username"""
-        if not email and not username:
-            return False
-            
+    async def update_user(self, user_id: int, email: str, username: str, first_name: str,
+                          password: str) -> Optional[Dict[str, Any]]:
+        """Обновить данные пользователя в Pterodactyl"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # Получаем список всех пользователей
-                async with session.get(
-                    f"{self.api_url}/api/application/users",
-                    headers=self.headers
+            user_data = {
+                "email": email,
+                "username": username,
+                "first_name": first_name,
+                "last_name": "TelegramUser",
+                "password": password,
+                "language": "ru"
+            }
+            
+            async with self._session() as session:
+                async with session.patch(
+                    f"{self.api_url}/api/application/users/{user_id}",
+                    headers=self.headers,
+                    json=user_data
                 ) as response:
                     if response.status == 200:
-                        users = await response.json()
-                        for user in users.get('data', []):
-                            user_attrs = user.get('attributes', {})
-                            if email and user_attrs.get('email') == email:
-                                return True
-                            if username and user_attrs.get('username') == username:
-                                return True
-                        return False
+                        logger.info(f"Пользователь {user_id} обновлен")
+                        return await response.json()
                     else:
                         error_text = await response.text()
-                        logger.error(f"Ошибка проверки пользователя: {response.status} - {error_text}")
-                        return False
+                        logger.error(f"Ошибка обновления пользователя: {response.status} - {error_text}")
+                        return None
                         
         except Exception as e:
+            logger.error(f"Ошибка обновления пользователя: {e}")
+            return None
+    
+    async def get_user_by_external_id(self, external_id: str) -> Optional[Dict[str, Any]]:
+        """Найти пользователя по external_id
+        
+        Возвращает None, если пользователя нет. Если панель не ответила,
+        выбрасывает PterodactylError: считать пользователя отсутствующим нельзя.
+        """
+        return await self._get_by_external_id("users", external_id)
+    
+    async def get_server_by_external_id(self, external_id: str) -> Optional[Dict[str, Any]]:
+        """Найти сервер по external_id (см. get_user_by_external_id)"""
+        return await self._get_by_external_id("servers", external_id)
+    
+    async def _get_by_external_id(self, resource: str, external_id: str) -> Optional[Dict[str, Any]]:
+        """Запросить объект панели по external_id"""
+        try:
+            async with self._session() as session:
+                async with session.get(
+                    f"{self.api_url}/api/application/{resource}/external/{external_id}",
+                    headers=self.headers
+                ) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    if response.status == 404:
+                        return None
+                    error_text = await response.text()
+                    raise PterodactylError(f"Ошибка поиска {resource} по external_id: {response.status} - {error_text}")
+        except PterodactylError:
+            raise
+        except Exception as e:
+            raise PterodactylError(f"Ошибка поиска {resource} по external_id: {e!r}") from e
+
+    async def check_user_exists(self, email: Optional[str] = None, username: Optional[str] = None) -> bool:
+        """Проверить существование пользователя по email или username"""
+        if not email and not username:
+            return False
+            
+        try:
+            # Фильтры панели объединяются через И, поэтому email и username проверяем отдельно
+            for field, value in (('email', email), ('username', username)):
+                if not value:
+                    continue
+                async with aclosing(self.iter_users(**{field: value})) as users:
+                    async for user in users:
+                        if getattr(user, field) == value:
+                            return True
+            return False
+                        
+        except PterodactylError as e:
             logger.error(f"Ошибка проверки пользователя: {e}")
             return False
 
-    async def create_server_with_credentials(self, credentials: Dict[str, str]) -> Optional[Dict[str, Any]]:
-        """Создать сервер с автоматически сгенерированными учетными данными"""
+    async def create_server_with_credentials(self, credentials: Dict[str, str],
+                                             profile: Optional[ServerProfile] = None) -> Optional[Dict[str, Any]]:
+        """Создать сервер с автоматически сгенерированными учетными данными
+        
+        Пользователь и сервер помечаются external_id от Telegram ID, поэтому
+        повторный вызов после таймаута не создает дубликатов.
+        """
         try:
-            # Проверяем, существует ли пользователь
-            user_exists = await self.check_user_exists(
-                email=credentials.get('email'),
-                username=credentials.get('username')
-            )
+            external_id = None
+            existing_user = None
+            if credentials.get('telegram_id'):
+                external_id = CredentialGenerator.generate_external_id(int(credentials['telegram_id']))
+                
+                # Сервер мог быть создан предыдущей попыткой
+                existing_server = await self.get_server_by_external_id(external_id)
+                if existing_server:
+                    logger.info(f"Сервер с external_id {external_id} уже создан, используем его")
+                    return existing_server
+                existing_user = await self.get_user_by_external_id(external_id)
             
-            if user_exists:
-                logger.error("Пользователь с таким email или username уже существует в Pterodactyl")
-                return None
-            
-            # Создаем пользователя
-            user_result = await self.create_user(
-                email=credentials['email'],
-                username=credentials['username'],
-                first_name=credentials['username'],
-                password=credentials['password']
-            )
+            if existing_user:
+                # Пользователь уже создан - приводим его данные к новым учетным данным
+                user_id = existing_user.get('attributes', {}).get('id')
+                user_result = await self.update_user(
+                    user_id,
+                    email=credentials['email'],
+                    username=credentials['username'],
+                    first_name=credentials['username'],
+                    password=credentials['password']
+                )
+            else:
+                # Проверяем, существует ли пользователь
+                user_exists = await self.check_user_exists(
+                    email=credentials.get('email'),
+                    username=credentials.get('username')
+                )
+                
+                if user_exists:
+                    logger.error("Пользователь с таким email или username уже существует в Pterodactyl")
+                    return None
+                
+                # Создаем пользователя
+                user_result = await self.create_user(
+                    email=credentials['email'],
+                    username=credentials['username'],
+                    first_name=credentials['username'],
+                    password=credentials['password'],
+                    external_id=external_id
+                )
             
             if not user_result:
                 logger.error("Не удалось создать пользователя в Pterodactyl")
@@ -193,41 +409,31 @@ class PterodactylAPI:
             server_name = f"server_{credentials['username']}"
             
             # Получаем доступные allocation
-            available_allocation = await self.get_available_allocation()
+            profile = profile or self.default_profile
+            available_allocation = await self.get_available_allocation(profile.node)
             if not available_allocation:
                 logger.error("Не найдены доступные allocation")
                 return None
             
-            # Данные для создания сервера
-            server_data = {
-                "name": server_name,
-                "user": user_id,  # Используем ID созданного пользователя
-                "nest": 1,  # ID гнезда (nest)
-                "egg": 3,   # ID яйца (egg)
-                "docker_image": "ghcr.io/pterodactyl/yolks:java_21",
-                "startup": "java -Xms128M -XX:MaxRAMPercentage=95.0 -Dterminal.jline=false -Dterminal.ansi=true -jar {{SERVER_JARFILE}}",
-                "environment": {
-                    "SERVER_JARFILE": "server.jar",
-                    "MINECRAFT_VERSION": "latest",
-                    "BUILD_NUMBER": "latest"
-                },
-                "limits": {
-                    "memory": 2048,
-                    "swap": 0,
-                    "disk": 1000,
-                    "io": 500,
-                    "cpu": 100
-                },
-                "feature_limits": {
-                    "databases": 0,
-                    "backups": 0
-                },
-                "allocation": {
-                    "default": available_allocation
-                }
-            }
+            return await self.create_server(user_id, server_name, available_allocation,
+                                            external_id=external_id, profile=profile)
+                        
+        except Exception as e:
+            logger.error(f"Ошибка создания сервера с учетными данными: {e}")
+            return None
+    
+    async def create_server(self, user_id: int, server_name: str, allocation_id: int,
+                            external_id: Optional[str] = None,
+                            profile: Optional[ServerProfile] = None) -> Optional[Dict[str, Any]]:
+        """Создать сервер для существующего пользователя панели по профилю
+        
+        Если allocation уже занят, выбрасывает AllocationUnavailable.
+        """
+        try:
+            profile = profile or self.default_profile
+            server_data = profile.build_server_data(user_id, server_name, allocation_id, external_id)
             
-            async with aiohttp.ClientSession() as session:
+            async with self._session() as session:
                 async with session.post(
                     f"{self.api_url}/api/application/servers",
                     headers=self.headers,
@@ -235,58 +441,156 @@ class PterodactylAPI:
                 ) as response:
                     if response.status == 201:
                         result = await response.json()
-                        logger.info(f"Сервер создан с учетными данными: {result}")
+                        logger.info(f"Сервер создан: {result.get('attributes', {}).get('identifier')}")
                         return result
                     else:
                         error_text = await response.text()
+                        if response.status == 422 and 'allocation' in error_text.lower():
+                            raise AllocationUnavailable(f"Allocation {allocation_id} занят: {error_text}")
                         logger.error(f"Ошибка создания сервера с учетными данными: {response.status} - {error_text}")
                         return None
                         
+        except AllocationUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Ошибка создания сервера с учетными данными: {e}")
             return None
     
-    async def get_available_allocation(self) -> Optional[int]:
-        """Получить доступный allocation ID"""
+    async def update_server_details(self, server_id: int, name: str, user_id: int,
+                                    external_id: Optional[str] = None,
+                                    description: str = "") -> Optional[Dict[str, Any]]:
+        """Изменить название, владельца и external_id сервера"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.api_url}/api/application/nests/1/eggs/3",
-                    headers=self.headers
+            async with self._session() as session:
+                async with session.patch(
+                    f"{self.api_url}/api/application/servers/{server_id}/details",
+                    headers=self.headers,
+                    json={"name": name, "user": user_id, "external_id": external_id, "description": description}
                 ) as response:
                     if response.status == 200:
-                        egg_data = await response.json()
-                        logger.info(f"Получены данные яйца: {egg_data}")
-                        
-                        # Получаем allocation из настроек яйца или используем первый доступный
-                        allocations = egg_data.get('attributes', {}).get('relationships', {}).get('allocations', {}).get('data', [])
+                        result = await response.json()
+                        self.server_info_cache.invalidate(result.get('attributes', {}).get('identifier'))
+                        return result
+                    else:
+                        error_text = await response.text()
+                        logger.error(f"Ошибка изменения сервера {server_id}: {response.status} - {error_text}")
+                        return None
                         
-                        if allocations:
-                            return allocations[0].get('attributes', {}).get('id')
-                        else:
-                            # Если нет allocation в яйце, получаем первый доступный
-                            async with session.get(
-                                f"{self.api_url}/api/application/nodes/1/allocations",
-                                headers=self.headers
-                            ) as alloc_response:
-                                if alloc_response.status == 200:
-                                    alloc_data = await alloc_response.json()
-                                    available_allocations = [
-                                        alloc.get('attributes', {}).get('id')
-                                        for alloc in alloc_data.get('data', [])
-                                        if not alloc.get('attributes', {}).get('assigned')
-                                    ]
-                                    
-                                    if available_allocations:
-                                        return available_allocations[0]
+        except Exception as e:
+            logger.error(f"Ошибка изменения сервера {server_id}: {e}")
+            return None
+    
+    async def suspend_server(self, server_id: int) -> bool:
+        """Приостановить сервер"""
+        return await self._set_suspended(server_id, True)
+    
+    async def unsuspend_server(self, server_id: int) -> bool:
+        """Снять приостановку сервера"""
+        return await self._set_suspended(server_id, False)
+    
+    async def _set_suspended(self, server_id: int, suspended: bool) -> bool:
+        action = "suspend" if suspended else "unsuspend"
+        try:
+            async with self._session() as session:
+                async with session.post(
+                    f"{self.api_url}/api/application/servers/{server_id}/{action}",
+                    headers=self.headers
+                ) as response:
+                    if response.status == 204:
+                        logger.info(f"Сервер {server_id}: {action}")
+                        return True
+                    else:
+                        error_text = await response.text()
+                        logger.error(f"Ошибка {action} сервера {server_id}: {response.status} - {error_text}")
+                        return False
                         
-                        logger.error("Не найдены доступные allocation")
-                        return None
+        except Exception as e:
+            logger.error(f"Ошибка {action} сервера {server_id}: {e}")
+            return False
+    
+    async def iter_list(self, path: str, project: Callable[[Dict[str, Any]], T], per_page: int = 100,
+                        params: Optional[Dict[str, str]] = None) -> AsyncIterator[T]:
+        """Постранично обойти список панели, отдавая проекции элементов
+
+        В памяти держится только текущая страница: ее элементы сразу сводятся
+        к компактным проекциям. Если страница не загрузилась, выбрасывает
+        PterodactylError - по неполному списку нельзя делать выводов.
+        При досрочном выходе оборачивайте генератор в contextlib.aclosing.
+        """
+        query = dict(params or {})
+        query['per_page'] = str(per_page)
+        page = 1
+        async with self._session() as session:
+            while True:
+                query['page'] = str(page)
+                try:
+                    async with session.get(f"{self.api_url}{path}", headers=self.headers, params=query) as response:
+                        if response.status != 200:
+                            error_text = await response.text()
+                            raise PterodactylError(f"Ошибка получения {path}: {response.status} - {error_text}")
+                        data = await response.json()
+                except PterodactylError:
+                    raise
+                except Exception as e:
+                    raise PterodactylError(f"Ошибка получения {path}: {e!r}") from e
+
+                items = [project(item.get('attributes', {})) for item in data.get('data', [])]
+                total_pages = data.get('meta', {}).get('pagination', {}).get('total_pages', 1)
+                del data
+                for item in items:
+                    yield item
+                if page >= total_pages:
+                    return
+                page += 1
+
+    def iter_users(self, per_page: int = 100, **filters: str) -> AsyncIterator[PanelUser]:
+        """Все пользователи панели (фильтры: email, username, uuid, external_id)"""
+        params = {f"filter[{field}]": value for field, value in filters.items()}
+        return self.iter_list("/api/application/users", PanelUser.from_attributes, per_page, params)
+
+    def iter_servers(self, per_page: int = 100, **filters: str) -> AsyncIterator[PanelServer]:
+        """Все серверы панели (фильтры: uuidShort, uuid, external_id, name - поиск подстроки)"""
+        params = {f"filter[{field}]": value for field, value in filters.items()}
+        return self.iter_list("/api/application/servers", PanelServer.from_attributes, per_page, params)
+
+    def iter_allocations(self, node_id: int, per_page: int = 100) -> AsyncIterator[PanelAllocation]:
+        """Все allocation ноды"""
+        return self.iter_list(f"/api/application/nodes/{node_id}/allocations", PanelAllocation.from_attributes,
+                              per_page)
+    
+    async def get_egg(self, nest_id: int, egg_id: int) -> Optional[Dict[str, Any]]:
+        """Получить яйцо вместе с его переменными"""
+        try:
+            async with self._session() as session:
+                async with session.get(
+                    f"{self.api_url}/api/application/nests/{nest_id}/eggs/{egg_id}",
+                    headers=self.headers,
+                    params={"include": "variables"}
+                ) as response:
+                    if response.status == 200:
+                        return await response.json()
                     else:
                         error_text = await response.text()
-                        logger.error(f"Ошибка получения allocation: {response.status} - {error_text}")
+                        logger.error(f"Ошибка получения яйца {egg_id}: {response.status} - {error_text}")
                         return None
                         
         except Exception as e:
+            logger.error(f"Ошибка получения яйца {egg_id}: {e}")
+            return None
+    
+    async def get_available_allocation(self, node_id: int = 1,
+                                       exclude: Collection[int] = ()) -> Optional[int]:
+        """Получить свободный allocation ID на ноде (кроме exclude - зарезервированных заявками)"""
+        try:
+            # Обход останавливается на первой странице со свободным allocation
+            async with aclosing(self.iter_allocations(node_id)) as allocations:
+                async for allocation in allocations:
+                    if not allocation.assigned and allocation.id not in exclude:
+                        return allocation.id
+                        
+            logger.error("Не найдены доступные allocation")
+            return None
+                        
+        except PterodactylError as e:
             logger.error(f"Ошибка получения allocation: {e}")
-            return None 
\ No newline at end of file
+            return None
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+from telegram import Bot
+from db.database import Database
+from pterodactyl_api import PterodactylAPI
+
+logger = logging.getLogger(__name__)
+
+# Системные действия записываются в action_logs от имени admin_id = 0
+SYSTEM_ADMIN_ID = 0
+
+SECONDS_PER_DAY = 86400
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Разобрать CURRENT_TIMESTAMP SQLite (UTC) в aware datetime"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(str(value))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class IdleReclaimer:
+    """Освобождение мощностей нод от простаивающих серверов
+
+    Состояние серверов опрашивается через client API пачками. Сервер, который
+    не запускался дольше warn_days, получает предупреждение владельцу. Следующие
+    стадии отсчитываются от предыдущей: через suspend_days - warn_days после
+    предупреждения сервер приостанавливается, через delete_days - suspend_days
+    после приостановки удаляется, даже если простой давно превысил delete_days.
+    Запуск сервера в любой момент сбрасывает отсчет.
+    """
+
+    def __init__(self, db: Database, pterodactyl_api: PterodactylAPI, interval: float = 3600.0,
+                 warn_days: float = 7, suspend_days: float = 10, delete_days: float = 14,
+                 batch_size: int = 20):
+        self.db = db
+        self.pterodactyl_api = pterodactyl_api
+        self.interval = interval
+        self.warn_days = warn_days
+        self.suspend_days = suspend_days
+        self.delete_days = delete_days
+        self.batch_size = batch_size
+        self.bot: Optional[Bot] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, bot: Bot) -> None:
+        """Запустить периодическую проверку простоя"""
+        self.bot = bot
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Освобождение простаивающих серверов запущено: "
+                    f"{self.warn_days}/{self.suspend_days}/{self.delete_days} дн.")
+
+    async def stop(self) -> None:
+        """Остановить проверку простоя"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        """Цикл проверки простоя"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка проверки простаивающих серверов: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sample(self, servers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Опросить состояние серверов пачками и отметить запущенные
+
+        Возвращает серверы, которые сейчас выключены. Серверы, по которым
+        панель не ответила, пропускаются: простой по ним не засчитывается.
+        """
+        idle = []
+        for start in range(0, len(servers), self.batch_size):
+            batch = servers[start:start + self.batch_size]
+            results = await asyncio.gather(
+                *(self.pterodactyl_api.get_server_resources(server['pterodactyl_id']) for server in batch)
+            )
+            running = []
+            for server, resources in zip(batch, results):
+                if not resources:
+                    continue
+                if resources.get('current_state', 'offline') != 'offline':
+                    running.append(server['pterodactyl_id'])
+                else:
+                    idle.append(server)
+            if running:
+                self.db.mark_servers_active(running)
+        return idle
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Выполнить одну проверку и перевести простаивающие серверы на следующую стадию"""
+        now = now or datetime.now(timezone.utc)
+        candidates = self.db.get_reclaim_candidates()
+        # Приостановленные серверы не запускаются, их опрос ничего не даст
+        sampled = [server for server in candidates if server['status'] != 'suspended']
+        # Сервер, с которого администратор снял приостановку, начинает отсчет заново
+        restored = [server['pterodactyl_id'] for server in sampled if server['idle_stage'] == 'suspended']
+        if restored:
+            self.db.mark_servers_active(restored)
+        idle = [server for server in await self.sample(sampled) if server['pterodactyl_id'] not in restored]
+        idle += [server for server in candidates
+                 if server['status'] == 'suspended' and server['idle_stage'] == 'suspended']
+
+        report = {'checked': len(sampled), 'warned': 0, 'suspended': 0, 'deleted': 0, 'failed': 0}
+        for server in idle:
+            since = parse_timestamp(server['last_active_at']) or parse_timestamp(server['created_at'])
+            if not since:
+                continue
+            idle_days = (now - since).total_seconds() / SECONDS_PER_DAY
+            stage = server['idle_stage']
+            # Срок, обещанный в уведомлении, отсчитывается от предыдущей стадии, а не от начала простоя
+            stage_since = parse_timestamp(server['idle_stage_at']) or since
+            stage_days = (now - stage_since).total_seconds() / SECONDS_PER_DAY
+            try:
+                if stage == 'suspended' and stage_days >= self.delete_days - self.suspend_days:
+                    action = 'deleted' if await self._delete(server) else 'failed'
+                elif stage == 'warned' and stage_days >= self.suspend_days - self.warn_days:
+                    action = 'suspended' if await self._suspend(server, now) else 'failed'
+                elif stage is None and idle_days >= self.warn_days:
+                    action = 'warned' if await self._warn(server, idle_days, now) else 'failed'
+                else:
+                    continue
+            except Exception as e:
+                logger.error(f"Ошибка освобождения сервера {server['pterodactyl_id']}: {e}")
+                action = 'failed'
+            report[action] += 1
+
+        self.last_report = report
+        if report['warned'] or report['suspended'] or report['deleted']:
+            logger.info(f"Простаивающие серверы: предупреждено {report['warned']}, "
+                        f"приостановлено {report['suspended']}, удалено {report['deleted']}")
+        return report
+
+    async def _warn(self, server: Dict[str, Any], idle_days: float, now: datetime) -> bool:
+        """Предупредить владельца о скорой приостановке"""
+        days_left = max(1, round(self.suspend_days - self.warn_days))
+        await self._notify_owner(
+            server,
+            f"💤 <b>Сервер простаивает</b>\n\n"
+            f"Сервер <code>{server['server_name']}</code> не запускался {int(idle_days)} дн.\n"
+            f"Через {days_left} дн. он будет приостановлен, а еще через "
+            f"{round(self.delete_days - self.suspend_days)} дн. - удален.\n\n"
+            f"Чтобы сохранить сервер, просто запустите его в панели."
+        )
+        return self.db.set_server_idle_stage(server['pterodactyl_id'], 'warned', stage_at=now)
+
+    async def _suspend(self, server: Dict[str, Any], now: datetime) -> bool:
+        """Приостановить простаивающий сервер"""
+        attributes = await self._panel_attributes(server)
+        if not attributes:
+            logger.warning(f"Сервер {server['pterodactyl_id']} не найден в панели, приостановка пропущена")
+            return False
+        if not await self.pterodactyl_api.suspend_server(attributes['id']):
+            return False
+        self.db.set_server_idle_stage(server['pterodactyl_id'], 'suspended', status='suspended', stage_at=now)
+        self.db.record_reclaimed_server(server['pterodactyl_id'], server['telegram_id'], 'suspend',
+                                        attributes.get('limits', {}))
+        self.db.log_admin_action(SYSTEM_ADMIN_ID, "reclaim_suspend", server['telegram_id'],
+                                 f"Сервер {server['pterodactyl_id']} приостановлен за простой")
+        await self._notify_owner(
+            server,
+            f"⏸ <b>Сервер приостановлен</b>\n\n"
+            f"Сервер <code>{server['server_name']}</code> приостановлен из-за простоя.\n"
+            f"Через {round(self.delete_days - self.suspend_days)} дн. он будет удален. "
+            f"Чтобы сохранить его, обратитесь к администрации."
+        )
+        return True
+
+    async def _delete(self, server: Dict[str, Any]) -> bool:
+        """Удалить приостановленный сервер и освободить ресурсы"""
+        attributes = await self._panel_attributes(server)
+        if not attributes:
+            # Сервер уже удален из панели - остается убрать запись
+            logger.info(f"Сервера {server['pterodactyl_id']} уже нет в панели")
+            return self.db.delete_server(server['pterodactyl_id'])
+        if not await self.pterodactyl_api.delete_server(attributes['id'], server['pterodactyl_id']):
+            return False
+        self.db.delete_server(server['pterodactyl_id'])
+        self.db.record_reclaimed_server(server['pterodactyl_id'], server['telegram_id'], 'delete',
+                                        attributes.get('limits', {}))
+        self.db.log_admin_action(SYSTEM_ADMIN_ID, "reclaim_delete", server['telegram_id'],
+                                 f"Сервер {server['pterodactyl_id']} удален за простой")
+        await self._notify_owner(
+            server,
+            f"🗑 <b>Сервер удален</b>\n\n"
+            f"Сервер <code>{server['server_name']}</code> удален после {int(self.delete_days)} дн. простоя.\n"
+            f"Вы можете создать новый сервер через /start."
+        )
+        return True
+
+    async def _panel_attributes(self, server: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Числовой ID и лимиты сервера из панели
+
+        Application API не принимает короткий идентификатор, поэтому сервер
+        ищется по нему в списке. None - сервера нет в панели; если панель не
+        ответила, выбрасывает PterodactylError (сервер считается неудачным).
+        """
+        return await self.pterodactyl_api.find_server(server['pterodactyl_id'])
+
+    async def _notify_owner(self, server: Dict[str, Any], text: str) -> None:
+        """Отправить уведомление владельцу сервера"""
+        if not self.bot or not server['telegram_id']:
+            return
+        try:
+            await self.bot.send_message(chat_id=server['telegram_id'], text=text, parse_mode='HTML')
+        except Exception as e:
+            logger.error(f"Ошибка отправки уведомления о простое пользователю {server['telegram_id']}: {e}")
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import Optional, Dict, Any, List
+from telegram import Bot
+from db.database import Database
+from pterodactyl_api import PterodactylAPI, PterodactylError, PanelServer
+
+logger = logging.getLogger(__name__)
+
+# Переходы, которые являются нормальным ходом событий, а не расхождением
+EXPECTED_TRANSITIONS = {
+    ('creating', 'installing'),
+    ('creating', 'active'),
+    ('installing', 'active'),
+}
+
+
+def panel_status(server: PanelServer) -> str:
+    """Статус сервера в терминах таблицы servers по данным панели"""
+    if server.suspended:
+        return 'suspended'
+    # status в панели: null, installing, install_failed, suspended, restoring_backup
+    return server.status or 'active'
+
+
+class StatusReconciler:
+    """Периодическая сверка статусов таблицы servers с панелью"""
+
+    def __init__(self, db: Database, pterodactyl_api: PterodactylAPI, admin_ids: List[int],
+                 interval: float = 300.0, per_page: int = 500):
+        self.db = db
+        self.pterodactyl_api = pterodactyl_api
+        self.admin_ids = admin_ids
+        self.interval = interval
+        self.per_page = per_page
+        self.bot: Optional[Bot] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, bot: Bot) -> None:
+        """Запустить периодическую сверку"""
+        self.bot = bot
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Остановить сверку"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        """Цикл сверки"""
+        while True:
+            try:
+                report = await self.run_once()
+                if report and report['drift']:
+                    await self._notify_admins(report)
+            except Exception as e:
+                logger.error(f"Ошибка сверки статусов серверов: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def fetch_panel_statuses(self) -> Optional[Dict[str, str]]:
+        """Загрузить статусы всех серверов панели постранично
+
+        Возвращает None, если хотя бы одна страница не загрузилась: по неполным
+        данным нельзя помечать серверы отсутствующими.
+        """
+        statuses: Dict[str, str] = {}
+        try:
+            async for server in self.pterodactyl_api.iter_servers(self.per_page):
+                if server.identifier:
+                    statuses[server.identifier] = panel_status(server)
+        except PterodactylError as e:
+            logger.error(f"Ошибка загрузки списка серверов: {e}")
+            return None
+        return statuses
+
+    async def run_once(self) -> Optional[Dict[str, Any]]:
+        """Выполнить одну сверку и применить изменения"""
+        # Снимок базы берется до загрузки списка: сервер, сохраненный во время обхода
+        # панели, в снимок не попадет и не будет ошибочно помечен отсутствующим
+        local_statuses = self.db.get_server_statuses()
+        panel_statuses = await self.fetch_panel_statuses()
+        if panel_statuses is None:
+            logger.warning("Сверка статусов пропущена: панель вернула неполный список серверов")
+            return None
+
+        changes: Dict[str, str] = {}
+        counts: Dict[str, int] = {}
+        drift = 0
+        for pterodactyl_id, local_status in local_statuses.items():
+            new_status = panel_statuses.get(pterodactyl_id, 'missing')
+            if new_status == local_status:
+                continue
+            changes[pterodactyl_id] = new_status
+            counts[new_status] = counts.get(new_status, 0) + 1
+            if (local_status, new_status) not in EXPECTED_TRANSITIONS:
+                drift += 1
+
+        # Статус, измененный в базе во время сверки, не перезаписывается
+        if changes and not self.db.update_server_statuses(changes, expected=local_statuses):
+            return None
+
+        report = {
+            'panel_servers': len(panel_statuses),
+            'local_servers': len(local_statuses),
+            'changed': len(changes),
+            'drift': drift,
+            'by_status': counts,
+            # Серверы панели, о которых не знает база бота
+            'untracked': len(panel_statuses.keys() - local_statuses.keys()),
+        }
+        self.last_report = report
+        logger.info(f"Сверка статусов: изменено {len(changes)}, расхождений {drift}")
+        return report
+
+    async def _notify_admins(self, report: Dict[str, Any]) -> None:
+        """Отправить администраторам отчет о расхождениях"""
+        if not self.bot:
+            return
+        lines = "\n".join(f"• {status}: {count}" for status, count in sorted(report['by_status'].items()))
+        text = (
+            "🔄 <b>Сверка серверов с панелью</b>\n\n"
+            f"Серверов в панели: {report['panel_servers']}\n"
+            f"Серверов в базе: {report['local_servers']}\n"
+            f"Нет в базе бота: {report['untracked']}\n"
+            f"Расхождений: {report['drift']}\n\n"
+            f"<b>Новые статусы:</b>\n{lines}"
+        )
+        for admin_id in self.admin_ids:
+            try:
+                await self.bot.send_message(chat_id=admin_id, text=text, parse_mode='HTML')
+            except Exception as e:
+                logger.error(f"Ошибка отправки отчета сверки администратору {admin_id}: {e}")
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Профиль по умолчанию, если файл профилей не найден
+DEFAULT_PROFILE_NAME = "minecraft"
+DEFAULT_PROFILE_CONFIG = {
+    "description": "Minecraft (Java 21)",
+    "nest": 1,
+    "egg": 3,
+    "node": 1,
+    "docker_image": "ghcr.io/pterodactyl/yolks:java_21",
+    "startup": "java -Xms128M -XX:MaxRAMPercentage=95.0 -Dterminal.jline=false -Dterminal.ansi=true -jar {{SERVER_JARFILE}}",
+    "environment": {
+        "SERVER_JARFILE": "server.jar",
+        "MINECRAFT_VERSION": "latest",
+        "BUILD_NUMBER": "latest"
+    },
+    "limits": {
+        "memory": 2048,
+        "swap": 0,
+        "disk": 1000,
+        "io": 500,
+        "cpu": 100
+    },
+    "feature_limits": {
+        "databases": 0,
+        "backups": 0
+    }
+}
+
+
+class ServerProfile:
+    """Профиль создаваемого сервера: яйцо, образ, переменные и лимиты"""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.description = config.get("description", name)
+        self.nest = int(config["nest"])
+        self.egg = int(config["egg"])
+        self.node = int(config.get("node", 1))
+        self.docker_image = config["docker_image"]
+        self.startup = config["startup"]
+        # Переменные из конфигурации; environment дополняется значениями по умолчанию из яйца
+        self.base_environment: Dict[str, Any] = dict(config.get("environment", {}))
+        self.environment: Dict[str, Any] = dict(self.base_environment)
+        self.limits: Dict[str, Any] = dict(config["limits"])
+        self.feature_limits: Dict[str, Any] = dict(config.get("feature_limits", {"databases": 0, "backups": 0}))
+        # Результат проверки по данным яйца
+        self.validated = False
+        self.errors: List[str] = []
+
+    def build_server_data(self, user_id: int, server_name: str, allocation_id: int,
+                          external_id: Optional[str] = None) -> Dict[str, Any]:
+        """Данные для POST /api/application/servers"""
+        server_data = {
+            "name": server_name,
+            "user": user_id,
+            "nest": self.nest,
+            "egg": self.egg,
+            "docker_image": self.docker_image,
+            "startup": self.startup,
+            "environment": dict(self.environment),
+            "limits": dict(self.limits),
+            "feature_limits": dict(self.feature_limits),
+            "allocation": {
+                "default": allocation_id
+            }
+        }
+        if external_id:
+            server_data["external_id"] = external_id
+        return server_data
+
+    def apply_egg(self, egg: Dict[str, Any]) -> List[str]:
+        """Проверить профиль по данным яйца и дополнить переменные значениями по умолчанию
+
+        Возвращает список ошибок; пустой список - профиль корректен.
+        """
+        attributes = egg.get("attributes", {})
+        errors = []
+
+        docker_images = list(attributes.get("docker_images", {}).values())
+        if docker_images and self.docker_image not in docker_images:
+            errors.append(f"образ {self.docker_image} не разрешен яйцом ({', '.join(docker_images)})")
+
+        environment = dict(self.base_environment)
+        variables = attributes.get("relationships", {}).get("variables", {}).get("data", [])
+        for variable in variables:
+            variable_attrs = variable.get("attributes", {})
+            env_name = variable_attrs.get("env_variable")
+            if not env_name or env_name in environment:
+                continue
+            default_value = variable_attrs.get("default_value")
+            if default_value not in (None, ""):
+                environment[env_name] = default_value
+            elif "required" in str(variable_attrs.get("rules", "")).split("|"):
+                errors.append(f"не задана обязательная переменная {env_name}")
+
+        self.environment = environment
+        self.errors = errors
+        self.validated = not errors
+        return errors
+
+
+class ServerProfileRegistry:
+    """Профили серверов из файла конфигурации с кэшем метаданных яиц"""
+
+    def __init__(self, path: str = "server_profiles.json", refresh_interval: float = 3600.0):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.default_name = DEFAULT_PROFILE_NAME
+        self.profiles: Dict[str, ServerProfile] = {}
+        # (nest, egg) -> (время загрузки, данные яйца)
+        self.egg_cache: Dict[Tuple[int, int], Tuple[float, Dict[str, Any]]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.load()
+
+    def load(self) -> None:
+        """Загрузить профили из файла"""
+        if not os.path.exists(self.path):
+            logger.info(f"Файл профилей {self.path} не найден, используется профиль по умолчанию")
+            self.profiles = {DEFAULT_PROFILE_NAME: ServerProfile(DEFAULT_PROFILE_NAME, DEFAULT_PROFILE_CONFIG)}
+            self.default_name = DEFAULT_PROFILE_NAME
+            return
+
+        with open(self.path, encoding="utf-8") as config_file:
+            config = json.load(config_file)
+
+        profiles = {name: ServerProfile(name, data) for name, data in config.get("profiles", {}).items()}
+        if not profiles:
+            raise ValueError(f"В файле {self.path} нет ни одного профиля")
+        default_name = config.get("default", next(iter(profiles)))
+        if default_name not in profiles:
+            raise ValueError(f"Профиль по умолчанию {default_name} не описан в {self.path}")
+
+        self.profiles = profiles
+        self.default_name = default_name
+        logger.info(f"Загружено профилей серверов: {len(profiles)} (по умолчанию: {default_name})")
+
+    def get(self, name: Optional[str] = None) -> Optional[ServerProfile]:
+        """Получить профиль по имени (без обращения к панели)
+
+        Профили, не прошедшие проверку по яйцу, недоступны.
+        """
+        profile = self.profiles.get(name or self.default_name)
+        if profile and profile.errors:
+            return None
+        return profile
+
+    def names(self) -> List[str]:
+        """Имена доступных профилей"""
+        return [name for name, profile in self.profiles.items() if not profile.errors]
+
+    async def start(self, pterodactyl_api) -> None:
+        """Проверить профили и запустить периодическое обновление метаданных яиц"""
+        await self.refresh(pterodactyl_api)
+        self._refresh_task = asyncio.create_task(self._refresh_loop(pterodactyl_api))
+
+    async def stop(self) -> None:
+        """Остановить обновление"""
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+    async def refresh(self, pterodactyl_api) -> None:
+        """Загрузить метаданные яиц и проверить по ним профили"""
+        for key in {(profile.nest, profile.egg) for profile in self.profiles.values()}:
+            egg = await pterodactyl_api.get_egg(*key)
+            if egg:
+                self.egg_cache[key] = (time.monotonic(), egg)
+            else:
+                logger.warning(f"Не удалось загрузить яйцо {key[1]} (гнездо {key[0]}), используются прежние данные")
+
+        for name, profile in self.profiles.items():
+            cached = self.egg_cache.get((profile.nest, profile.egg))
+            if not cached:
+                continue
+            errors = profile.apply_egg(cached[1])
+            if errors:
+                logger.error(f"Профиль {name} некорректен и недоступен: {'; '.join(errors)}")
+
+    async def _refresh_loop(self, pterodactyl_api) -> None:
+        """Периодическое обновление метаданных яиц"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh(pterodactyl_api)
+            except Exception as e:
+                logger.error(f"Ошибка обновления профилей серверов: {e}")
@@ -1,127 +1,296 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from telegram import Bot
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Union
+from telegram import Bot, Chat, ChatMember, ChatMemberUpdated
 from telegram.error import TelegramError
+from db.database import Database
+from utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Статусы участника канала, которые считаются подпиской
+SUBSCRIBED_STATUSES = ('member', 'administrator', 'creator')
+
+
+# Минимальное время подписки по умолчанию, минуты
+DEFAULT_MIN_MINUTES = 10
+
+
+class ChannelRule:
+    """Требование подписки на канал: username и минимальное время подписки"""
+
+    def __init__(self, username: str, min_minutes: float = DEFAULT_MIN_MINUTES):
+        self.username = username.strip().lstrip('@')
+        self.key = self.username.lower()
+        self.min_subscription_time = timedelta(minutes=min_minutes)
+
+    @property
+    def link(self) -> str:
+        return f"<a href='https://t.me/{self.username}'>@{self.username}</a>"
+
+
+def parse_channel_rules(value: str) -> List[ChannelRule]:
+    """Разобрать список каналов вида "@main:10,@partner:60" (минуты можно не указывать)"""
+    rules = []
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        username, _, minutes = item.partition(':')
+        rules.append(ChannelRule(username, float(minutes) if minutes.strip() else DEFAULT_MIN_MINUTES))
+    return rules
+
+
+def is_subscribed_member(chat_member: ChatMember) -> bool:
+    """Является ли участник подписчиком (ограниченный участник тоже, если состоит в канале)"""
+    if chat_member.status in SUBSCRIBED_STATUSES:
+        return True
+    return chat_member.status == ChatMember.RESTRICTED and getattr(chat_member, 'is_member', False)
+
+
 class SubscriptionChecker:
-    def __init__(self, bot_token: str, channel_username: str):
-        self.bot = Bot(token=bot_token)
-        self.channel_username = channel_username.lstrip('@')
-        self.min_subscription_time = timedelta(minutes=10)  # Минимум 10 минут подписки
+    """Проверка подписки на каналы из списка правил
+
+    Каналы проверяются параллельно, так что задержка проверки близка к одному
+    запросу независимо от числа каналов. У каждого канала свой кэш статусов.
+    Запросы идут через бота приложения: лимиты и паузы flood control у них
+    общие с остальными исходящими запросами.
+    """
+
+    def __init__(self, bot: Bot, channels: Union[str, List[ChannelRule]], db: Optional[Database] = None,
+                 member_ttl: float = 300.0, negative_ttl: float = 15.0, channel_ttl: float = 3600.0):
+        self.bot = bot
+        self.rules = parse_channel_rules(channels) if isinstance(channels, str) else list(channels)
+        if not self.rules:
+            raise ValueError("Не задан ни один канал для проверки подписки")
+        self._rules_by_key = {rule.key: rule for rule in self.rules}
+        # Подписки, записанные по событиям chat_member; без базы - только запросы к API
+        self.db = db
+        self.local_hits = 0
+        
+        # Каналы запрашиваются редко; при сбое обновления еще channel_ttl отдается прежний
+        self.channel_cache = TTLCache(ttl=channel_ttl, stale_ttl=channel_ttl, max_size=len(self.rules))
+        # Подписка кэшируется по пользователю отдельно для каждого канала: отписка видна
+        # через member_ttl, а только что подписавшемуся ждать не больше negative_ttl
+        self.member_ttl = member_ttl
+        self.negative_ttl = negative_ttl
+        self.member_caches = {rule.key: TTLCache(ttl=member_ttl, max_size=10000) for rule in self.rules}
+    
+    def channel_links(self, usernames: Optional[List[str]] = None) -> str:
+        """Ссылки на каналы (по умолчанию - на все)"""
+        rules = [self._rules_by_key[name.lower()] for name in usernames] if usernames else self.rules
+        return ", ".join(rule.link for rule in rules)
+    
+    async def get_channel(self, rule: ChannelRule) -> Chat:
+        """Получить канал (с кэшированием)"""
+        return await self.channel_cache.get_or_load(rule.key, lambda: self._fetch_channel(rule))
+    
+    async def _fetch_channel(self, rule: ChannelRule) -> Chat:
+        chat = await self.bot.get_chat(f"@{rule.username}")
+        logger.info(f"Канал найден: {chat.title} (@{chat.username})")
+        return chat
+    
+    async def _fetch_member(self, rule: ChannelRule, chat_id: int, user_id: int) -> Dict[str, Any]:
+        """Запросить статус пользователя в канале"""
+        chat_member = await self.bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+        logger.info(f"Проверка подписки пользователя {user_id} на @{rule.username}: статус = {chat_member.status}")
+        is_member = is_subscribed_member(chat_member)
+        if is_member and self.db:
+            # Подписан до начала учета: дальше статус будет обновляться событиями
+            self.db.record_subscription(rule.key, user_id, chat_member.status, True)
+        return {'status': chat_member.status, 'is_member': is_member, 'join_date': None}
+    
+    def _member_ttl(self, member: Dict[str, Any]) -> float:
+        return self.member_ttl if member['is_member'] else self.negative_ttl
+    
+    def _local_member(self, rule: ChannelRule, user_id: int) -> Optional[Dict[str, Any]]:
+        """Статус подписки из таблицы subscriptions, None - пользователь не отслеживается"""
+        if not self.db:
+            return None
+        row = self.db.get_subscription(rule.key, user_id)
+        if not row:
+            return None
+        join_date = None
+        if row['is_member'] and row['joined_at']:
+            join_date = datetime.fromisoformat(row['joined_at']).replace(tzinfo=timezone.utc)
+        return {'status': row['status'], 'is_member': bool(row['is_member']), 'join_date': join_date}
+    
+    def handle_member_update(self, chat_member_updated: ChatMemberUpdated) -> bool:
+        """Записать вступление в канал или выход из него по событию chat_member
+        
+        Возвращает False, если событие относится к чату не из списка каналов.
+        """
+        rule = self._rules_by_key.get((chat_member_updated.chat.username or '').lower())
+        if not rule:
+            return False
+        new_member = chat_member_updated.new_chat_member
+        user_id = new_member.user.id
+        is_member = is_subscribed_member(new_member)
+        if self.db:
+            self.db.record_subscription(rule.key, user_id, new_member.status, is_member, chat_member_updated.date)
+        self.member_caches[rule.key].invalidate(user_id)
+        logger.info(f"Подписка пользователя {user_id} на @{rule.username}: "
+                    f"{chat_member_updated.old_chat_member.status} -> {new_member.status}")
+        return True
+    
+    def invalidate(self, user_id: int) -> None:
+        """Сбросить сохраненный статус подписки пользователя на всех каналах"""
+        for cache in self.member_caches.values():
+            cache.invalidate(user_id)
+    
+    def stats(self) -> Dict[str, int]:
+        """Сколько запросов к Bot API выполнено и сколько сэкономлено кэшем и базой"""
+        channel = self.channel_cache.stats()
+        members = [cache.stats() for cache in self.member_caches.values()]
+        return {
+            'api_calls': channel['misses'] + sum(member['misses'] for member in members),
+            'channel_saved': channel['hits'] + channel['stale_hits'] + channel['coalesced'],
+            'member_saved': sum(member['hits'] + member['coalesced'] for member in members) + self.local_hits,
+            'cached_users': sum(member['size'] for member in members),
+        }
     
     async def check_subscription(self, user_id: int) -> Dict[str, Any]:
-        """Проверить подписку пользователя на канал"""
+        """Проверить подписку пользователя на все каналы
+        
+        Общий результат сохраняет поля проверки одного канала (по самому
+        ограничивающему каналу) и дополнительно содержит результаты по
+        каналам (channels), каналы без подписки (missing) и каналы, где
+        подписка еще слишком короткая (waiting).
+        """
+        results = await asyncio.gather(*(self._check_channel(rule, user_id) for rule in self.rules))
+        
+        errors = [result for result in results if result['status'] in ('error', 'channel_error')]
+        missing = [result for result in results if result not in errors and not result['is_subscribed']]
+        waiting = sorted(
+            (result for result in results if result['is_subscribed'] and not result['meets_time_requirement']),
+            key=lambda result: result['remaining'], reverse=True
+        )
+        # Канал, который определяет общий результат
+        limiting = (errors or missing or waiting or results)[0]
+        
+        combined = {
+            'is_subscribed': all(result['is_subscribed'] for result in results),
+            'subscription_duration': limiting['subscription_duration'],
+            'meets_time_requirement': all(result['meets_time_requirement'] for result in results),
+            'join_date': limiting['join_date'],
+            'status': limiting['status'],
+            'channels': results,
+            'missing': [result['channel'] for result in missing],
+            'waiting': [result['channel'] for result in waiting],
+        }
+        if errors:
+            combined['error'] = "; ".join(f"@{result['channel']}: {result['error']}" for result in errors)
+        return combined
+    
+    async def _check_channel(self, rule: ChannelRule, user_id: int) -> Dict[str, Any]:
+        """Проверить подписку пользователя на один канал
+        
+        Отслеживаемые пользователи проверяются по базе, к API обращаемся
+        только для подписавшихся до начала учета событий.
+        """
         try:
+            member = self._local_member(rule, user_id)
+            if member:
+                self.local_hits += 1
+                return self._subscription_info(rule, member)
+            
             # Сначала проверяем доступность канала
             try:
-                chat = await self.bot.get_chat(f"@{self.channel_username}")
-                logger.info(f"Канал найден: {chat.title} (@{chat.username})")
+                chat = await self.get_channel(rule)
             except Exception as e:
-                logger.error(f"Ошибка доступа к каналу @{self.channel_username}: {e}")
-                return {
-                    'is_subscribed': False,
-                    'subscription_duration': None,
-                    'meets_time_requirement': False,
-                    'join_date': None,
-                    'status': 'channel_error',
-                    'error': f"Канал недоступен: {str(e)}"
-                }
+                logger.error(f"Ошибка доступа к каналу @{rule.username}: {e}")
+                return self._error_info(rule, 'channel_error', f"Канал недоступен: {str(e)}")
             
-            # Получаем информацию о пользователе в канале
-            chat_member = await self.bot.get_chat_member(
-                chat_id=f"@{self.channel_username}",
-                user_id=user_id
+            # Получаем информацию о пользователе в канале (ошибки не кэшируются)
+            member = await self.member_caches[rule.key].get_or_load(
+                user_id, lambda: self._fetch_member(rule, chat.id, user_id), ttl=self._member_ttl
             )
             
-            logger.info(f"Проверка подписки для пользователя {user_id}: статус = {chat_member.status}")
-            
-            # Проверяем статус подписки
-            if chat_member.status in ['member', 'administrator', 'creator']:
-                # Проверяем время подписки (если доступно)
-                join_date = getattr(chat_member, 'joined_date', None)
-                if join_date:
-                    subscription_duration = datetime.now(join_date.tzinfo) - join_date
-                    
-                    return {
-                        'is_subscribed': True,
-                        'subscription_duration': subscription_duration,
-                        'meets_time_requirement': subscription_duration >= self.min_subscription_time,
-                        'join_date': join_date,
-                        'status': chat_member.status
-                    }
-                else:
-                    # Если нет даты присоединения, считаем что подписка есть
-                    return {
-                        'is_subscribed': True,
-                        'subscription_duration': None,
-                        'meets_time_requirement': True,
-                        'join_date': None,
-                        'status': chat_member.status
-                    }
-            else:
-                return {
-                    'is_subscribed': False,
-                    'subscription_duration': None,
-                    'meets_time_requirement': False,
-                    'join_date': None,
-                    'status': chat_member.status
-                }
+            return self._subscription_info(rule, member)
                 
         except TelegramError as e:
             logger.error(f"Ошибка проверки подписки для пользователя {user_id}: {e}")
-            logger.error(f"Канал: @{self.channel_username}")
-            return {
-                'is_subscribed': False,
-                'subscription_duration': None,
-                'meets_time_requirement': False,
-                'join_date': None,
-                'status': 'error',
-                'error': str(e)
-            }
+            logger.error(f"Канал: @{rule.username}")
+            return self._error_info(rule, 'error', str(e))
+    
+    @staticmethod
+    def _error_info(rule: ChannelRule, status: str, error: str) -> Dict[str, Any]:
+        return {
+            'channel': rule.username,
+            'is_subscribed': False,
+            'subscription_duration': None,
+            'meets_time_requirement': False,
+            'join_date': None,
+            'remaining': None,
+            'status': status,
+            'error': error
+        }
+    
+    def _subscription_info(self, rule: ChannelRule, member: Dict[str, Any]) -> Dict[str, Any]:
+        """Результат проверки одного канала по статусу участника"""
+        info = {
+            'channel': rule.username,
+            'is_subscribed': member['is_member'],
+            'subscription_duration': None,
+            'meets_time_requirement': member['is_member'],
+            'join_date': None,
+            'remaining': None,
+            'status': member['status']
+        }
+        # Время вступления известно, если оно записано по событию chat_member;
+        # длительность считается на момент вызова. Если даты нет, считаем что подписка есть
+        join_date = member['join_date']
+        if member['is_member'] and join_date:
+            subscription_duration = datetime.now(join_date.tzinfo) - join_date
+            info['subscription_duration'] = subscription_duration
+            info['join_date'] = join_date
+            info['meets_time_requirement'] = subscription_duration >= rule.min_subscription_time
+            if not info['meets_time_requirement']:
+                info['remaining'] = rule.min_subscription_time - subscription_duration
+        return info
     
-    async def get_subscription_message(self, user_id: int) -> str:
-        """Получить сообщение о статусе подписки"""
-        subscription_info = await self.check_subscription(user_id)
+    async def get_subscription_message(self, user_id: int,
+                                       subscription_info: Optional[Dict[str, Any]] = None) -> str:
+        """Получить сообщение о статусе подписки (по уже полученному результату проверки, если он передан)"""
+        if subscription_info is None:
+            subscription_info = await self.check_subscription(user_id)
         
         if not subscription_info['is_subscribed']:
+            missing = subscription_info['missing'] or [result['channel'] for result in subscription_info['channels']
+                                                        if not result['is_subscribed']]
+            noun = "канал" if len(missing) == 1 else "каналы"
             return (
-                "❌ <b>Вы не подписаны на наш канал!</b>\n\n"
-                "Для получения сервера необходимо подписаться на канал:\n"
-                f"<a href='https://t.me/{self.channel_username}'>@{self.channel_username}</a>\n\n"
+                f"❌ <b>Вы не подписаны на {'наш канал' if len(missing) == 1 else 'наши каналы'}!</b>\n\n"
+                f"Для получения сервера необходимо подписаться на {noun}:\n"
+                f"{self.channel_links(missing)}\n\n"
                 "После подписки попробуйте снова."
             )
         
         if not subscription_info['meets_time_requirement']:
-            duration = subscription_info['subscription_duration']
-            if duration:
-                remaining = self.min_subscription_time - duration
+            lines = []
+            for result in subscription_info['channels']:
+                if result['channel'] not in subscription_info['waiting']:
+                    continue
+                remaining = result['remaining']
                 minutes_remaining = int(remaining.total_seconds() // 60)
                 seconds_remaining = int(remaining.total_seconds() % 60)
-                
-                return (
-                    "⏳ <b>Подписка активна, но недостаточно времени!</b>\n\n"
-                    f"Вы подписаны на: {duration}\n"
-                    f"Необходимо подписаться минимум на: {self.min_subscription_time}\n"
-                    f"Осталось ждать: {minutes_remaining} мин {seconds_remaining} сек\n\n"
-                    "Попробуйте позже."
-                )
-            else:
-                return (
-                    "⏳ <b>Подписка активна, но недостаточно времени!</b>\n\n"
-                    "Необходимо подписаться минимум на 10 минут.\n"
-                    "Попробуйте позже."
+                rule = self._rules_by_key[result['channel'].lower()]
+                lines.append(
+                    f"{rule.link}: подписка {result['subscription_duration']}, "
+                    f"нужно {rule.min_subscription_time}, осталось {minutes_remaining} мин {seconds_remaining} сек"
                 )
+            return (
+                "⏳ <b>Подписка активна, но недостаточно времени!</b>\n\n"
+                + "\n".join(lines) +
+                "\n\nПопробуйте позже."
+            )
         
         duration_text = ""
-        if subscription_info['subscription_duration']:
+        if len(self.rules) == 1 and subscription_info['subscription_duration']:
             duration_text = f"Вы подписаны на: {subscription_info['subscription_duration']}\n"
         
         return (
             "✅ <b>Подписка активна!</b>\n\n"
             f"{duration_text}"
             "Можете получить сервер."
-        ) 
\ No newline at end of file
+        )
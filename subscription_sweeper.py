@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+from telegram import Bot
+from db.database import Database
+from pterodactyl_api import PterodactylAPI
+from reclaimer import SYSTEM_ADMIN_ID, parse_timestamp
+from subscription_checker import SubscriptionChecker
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_HOUR = 3600
+
+# Счетчики прохода, которые сохраняются в subscription_sweeps
+SWEEP_COUNTERS = ('checked', 'unsubscribed', 'warned', 'suspended', 'deleted', 'restored', 'failed')
+
+
+class SubscriptionSweeper:
+    """Периодическая перепроверка подписки владельцев серверов
+
+    Владельцы обходятся пачками по telegram_id, курсор сохраняется после
+    каждой пачки, так что после перезапуска проход продолжается с места
+    остановки. Отписавшийся владелец получает предупреждение, через
+    grace_hours его серверы приостанавливаются, через delete_days после
+    отписки - удаляются. Повторная подписка снимает приостановку.
+    """
+
+    def __init__(self, db: Database, pterodactyl_api: PterodactylAPI,
+                 subscription_checker: SubscriptionChecker, interval: float = 86400.0,
+                 batch_size: int = 100, concurrency: int = 5, grace_hours: float = 24,
+                 delete_days: float = 7):
+        self.db = db
+        self.pterodactyl_api = pterodactyl_api
+        self.subscription_checker = subscription_checker
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.grace_hours = grace_hours
+        self.delete_days = delete_days
+        self.bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, bot: Bot) -> None:
+        """Запустить периодическую перепроверку"""
+        self.bot = bot
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Остановить перепроверку (незавершенный проход продолжится после запуска)"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        """Цикл перепроверки"""
+        while True:
+            try:
+                await self.run_sweep()
+            except Exception as e:
+                logger.error(f"Ошибка перепроверки подписок: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_sweep(self, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """Выполнить (или продолжить) проход по всем владельцам серверов"""
+        sweep = self.db.start_subscription_sweep()
+        if not sweep:
+            return None
+        if sweep['cursor']:
+            logger.info(f"Продолжение перепроверки подписок #{sweep['id']} с пользователя {sweep['cursor']}")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while True:
+            owners = self.db.get_server_owners_after(sweep['cursor'], self.batch_size)
+            if not owners:
+                break
+
+            started_at = time.monotonic()
+            actions = await asyncio.gather(*(self._process(owner, semaphore, now) for owner in owners))
+            for action in actions:
+                sweep['checked'] += 1
+                if action in ('warned', 'suspended', 'deleted'):
+                    sweep['unsubscribed'] += 1
+                if action:
+                    sweep[action] += 1
+            sweep['cursor'] = owners[-1]['telegram_id']
+            sweep['elapsed'] += time.monotonic() - started_at
+            self.db.update_subscription_sweep(
+                sweep['id'], cursor=sweep['cursor'], elapsed=sweep['elapsed'],
+                **{name: sweep[name] for name in SWEEP_COUNTERS}
+            )
+
+        self.db.update_subscription_sweep(sweep['id'], finished=True)
+        sweep['throughput'] = sweep['checked'] / sweep['elapsed'] if sweep['elapsed'] else 0.0
+        logger.info(
+            f"Перепроверка подписок #{sweep['id']}: проверено {sweep['checked']} "
+            f"({sweep['throughput']:.1f}/с), предупреждено {sweep['warned']}, приостановлено "
+            f"{sweep['suspended']}, удалено {sweep['deleted']}, восстановлено {sweep['restored']}"
+        )
+        return sweep
+
+    async def _process(self, owner: Dict[str, Any], semaphore: asyncio.Semaphore,
+                       now: Optional[datetime]) -> Optional[str]:
+        """Проверить одного владельца и применить политику, вернуть счетчик прохода для него"""
+        telegram_id = owner['telegram_id']
+        try:
+            async with semaphore:
+                info = await self.subscription_checker.check_subscription(telegram_id)
+            if info['status'] in ('error', 'channel_error'):
+                # Без ответа Telegram подписку не оцениваем
+                return 'failed'
+            stage = owner['unsubscribed_stage']
+
+            if info['is_subscribed']:
+                if not stage:
+                    return None
+                return 'restored' if await self._restore(telegram_id, stage) else 'failed'
+
+            unsubscribed_at = parse_timestamp(owner['unsubscribed_at'])
+            hours = ((now or datetime.now(timezone.utc)) - unsubscribed_at).total_seconds() / SECONDS_PER_HOUR \
+                if unsubscribed_at else 0.0
+            if not stage:
+                return 'warned' if await self._warn(telegram_id, info['missing']) else 'failed'
+            if stage == 'warned' and hours >= self.grace_hours:
+                return 'suspended' if await self._suspend(telegram_id) else 'failed'
+            if stage == 'suspended' and hours >= self.delete_days * 24:
+                return 'deleted' if await self._delete(telegram_id) else 'failed'
+            # Отписан, но срок следующей стадии еще не наступил
+            return 'unsubscribed'
+        except Exception as e:
+            logger.error(f"Ошибка перепроверки подписки пользователя {telegram_id}: {e}")
+            return 'failed'
+
+    async def _warn(self, telegram_id: int, missing: List[str]) -> bool:
+        """Предупредить отписавшегося владельца"""
+        if not self.db.set_unsubscribed_stage(telegram_id, 'warned'):
+            return False
+        await self._notify(
+            telegram_id,
+            "⚠️ <b>Вы отписались от канала</b>\n\n"
+            f"Сервер выдается только подписчикам {self.subscription_checker.channel_links(missing)}.\n"
+            f"Если не подписаться снова в течение {int(self.grace_hours)} ч., сервер будет приостановлен, "
+            f"а через {int(self.delete_days)} дн. после отписки - удален."
+        )
+        return True
+
+    async def _suspend(self, telegram_id: int) -> bool:
+        """Приостановить серверы владельца"""
+        servers = await self._set_suspended(telegram_id, True)
+        if servers is None:
+            return False
+        self.db.set_unsubscribed_stage(telegram_id, 'suspended')
+        self.db.log_admin_action(SYSTEM_ADMIN_ID, "unsubscribed_suspend", telegram_id,
+                                 f"Приостановлено серверов: {len(servers)}")
+        await self._notify(
+            telegram_id,
+            "⏸ <b>Сервер приостановлен</b>\n\n"
+            "Вы не подписаны на канал. Подпишитесь снова - приостановка будет снята при следующей проверке."
+        )
+        return True
+
+    async def _restore(self, telegram_id: int, stage: str) -> bool:
+        """Снять последствия отписки с владельца, подписавшегося снова"""
+        if stage == 'suspended':
+            servers = await self._set_suspended(telegram_id, False)
+            if servers is None:
+                return False
+            self.db.log_admin_action(SYSTEM_ADMIN_ID, "resubscribed_unsuspend", telegram_id,
+                                     f"Возобновлено серверов: {len(servers)}")
+            await self._notify(telegram_id, "✅ <b>Подписка восстановлена</b>\n\nСервер снова доступен.")
+        return self.db.set_unsubscribed_stage(telegram_id, None)
+
+    async def _delete(self, telegram_id: int) -> bool:
+        """Удалить серверы владельца"""
+        servers = self.db.get_user_servers(telegram_id)
+        for server in servers:
+            panel_id = await self._panel_id(server)
+            # Сервера, которого уже нет в панели, остается только убрать из базы
+            if panel_id and not await self.pterodactyl_api.delete_server(panel_id, server['pterodactyl_id']):
+                return False
+            self.db.delete_server(server['pterodactyl_id'])
+        self.db.set_unsubscribed_stage(telegram_id, None)
+        self.db.log_admin_action(SYSTEM_ADMIN_ID, "unsubscribed_delete", telegram_id,
+                                 f"Удалено серверов: {len(servers)}")
+        await self._notify(
+            telegram_id,
+            "🗑 <b>Сервер удален</b>\n\nВы не подписаны на канал. Чтобы получить новый сервер, "
+            "подпишитесь снова и воспользуйтесь /start."
+        )
+        return True
+
+    async def _set_suspended(self, telegram_id: int, suspended: bool) -> Optional[List[str]]:
+        """Приостановить или возобновить все серверы владельца, None - при ошибке панели"""
+        changed = []
+        for server in self.db.get_user_servers(telegram_id):
+            if server['status'] == 'missing' or (server['status'] == 'suspended') == suspended:
+                continue
+            if not suspended and server.get('idle_stage') == 'suspended':
+                # Приостановлен за простой - подписка его не возвращает
+                continue
+            panel_id = await self._panel_id(server)
+            if not panel_id:
+                # Пропавший сервер отметит сверка с панелью
+                logger.warning(f"Сервер {server['pterodactyl_id']} не найден в панели")
+                continue
+            if suspended:
+                result = await self.pterodactyl_api.suspend_server(panel_id)
+            else:
+                result = await self.pterodactyl_api.unsuspend_server(panel_id)
+            if not result:
+                return None
+            changed.append(server['pterodactyl_id'])
+        if changed:
+            status = 'suspended' if suspended else 'active'
+            self.db.update_server_statuses({pterodactyl_id: status for pterodactyl_id in changed})
+        return changed
+
+    async def _panel_id(self, server: Dict[str, Any]) -> Optional[int]:
+        """Числовой ID сервера в панели
+
+        Берется из базы, для записей без него - поиском по идентификатору.
+        None - сервера нет в панели; если панель не ответила, выбрасывает
+        PterodactylError (владелец засчитывается как неудачный).
+        """
+        return server.get('panel_server_id') or await self.pterodactyl_api.get_server_id(server['pterodactyl_id'])
+
+    async def _notify(self, telegram_id: int, text: str) -> None:
+        """Отправить уведомление владельцу"""
+        if not self.bot:
+            return
+        try:
+            await self.bot.send_message(chat_id=telegram_id, text=text, parse_mode='HTML')
+        except Exception as e:
+            logger.error(f"Ошибка отправки уведомления о подписке пользователю {telegram_id}: {e}")
@@ -7,6 +7,7 @@ import os
 import asyncio
 from dotenv import load_dotenv
 from db.database import Database
+from telegram import Bot
 from subscription_checker import SubscriptionChecker
 
 # Загружаем переменные окружения
@@ -54,7 +55,7 @@ async def test_subscription_checker():
         return False
     
     try:
-        checker = SubscriptionChecker(bot_token, channel_username)
+        checker = SubscriptionChecker(Bot(token=bot_token), channel_username)
         
         # Тест получения информации о канале
         test_user_id = 123456789
@@ -75,32 +76,14 @@ async def test_spam_protection():
     """Тест защиты от спама"""
     print("\n🔍 Тестирование защиты от спама...")
     
-    from datetime import datetime
+    from utils.rate_limit import KeyedRateLimiter
     
-    # Имитируем логику защиты от спама
-    spam_protection = {}
+    # Лимит: 3 действия подряд, дальше 1 в секунду
+    limiter = KeyedRateLimiter(rate=1, burst=3)
     user_id = 123456789
     
     def is_spam(user_id: int) -> bool:
-        current_time = datetime.now()
-        
-        if user_id not in spam_protection:
-            spam_protection[user_id] = []
-        
-        # Удаляем старые запросы (старше 10 секунд)
-        spam_protection[user_id] = [
-            req_time for req_time in spam_protection[user_id]
-            if (current_time - req_time).seconds < 10
-        ]
-        
-        # Добавляем текущий запрос
-        spam_protection[user_id].append(current_time)
-        
-        # Проверяем количество запросов за последние 10 секунд
-        if len(spam_protection[user_id]) > 3:
-            return True
-        
-        return False
+        return not limiter.allow(user_id)
     
     # Тестируем
     print("   Тест 1: Первый запрос")
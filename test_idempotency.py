@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Тест идемпотентного создания серверов: таймауты панели не должны приводить к дубликатам
+"""
+
+import asyncio
+import os
+import tempfile
+from db.database import Database
+from mock_panel import MockPanel
+from provisioning import ProvisioningQueue
+from pterodactyl_api import PterodactylAPI
+from utils.credentials import CredentialGenerator
+
+
+class FakeBot:
+    """Заглушка Telegram бота: запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.messages = []
+        self.shown = {}
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self.messages.append(text)
+        self.shown[(chat_id, message_id)] = text
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append(text)
+
+
+async def run_job(panel: MockPanel, url: str, telegram_id: int) -> dict:
+    """Выполнить одну заявку через очередь и дождаться результата"""
+    db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+    db.create_user(telegram_id, "test_user", "Test", "User")
+
+    api = PterodactylAPI(url, panel.token, timeout=0.5)
+    queue = ProvisioningQueue(db, api, workers=1, max_attempts=5, poll_interval=0.1)
+    await queue.start(FakeBot())
+    job_id = queue.enqueue(telegram_id, chat_id=telegram_id, message_id=1)
+
+    job = db.get_provisioning_job(job_id)
+    for _ in range(100):
+        job = db.get_provisioning_job(job_id)
+        if job['status'] in ('done', 'failed'):
+            break
+        await asyncio.sleep(0.1)
+    await queue.stop()
+
+    job['db_servers'] = db.get_user_servers(telegram_id)
+    return job
+
+
+async def test_user_create_timeout():
+    """Таймаут после создания пользователя в панели"""
+    print("🔍 Таймаут при создании пользователя...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        panel.inject_timeout('POST', '/api/application/users', hang=1.0)
+        job = await run_job(panel, url, 1001)
+
+        external_id = CredentialGenerator.generate_external_id(1001)
+        panel_users = [user for user in panel.users.values() if user['external_id'] == external_id]
+        ok = (
+            job['status'] == 'done'
+            and len(panel.users) == 1
+            and len(panel_users) == 1
+            and len(panel.servers) == 1
+            # Учетные данные из заявки действительны для найденного пользователя
+            and panel_users[0]['password'] == job['password']
+            and panel_users[0]['username'] == job['username']
+        )
+        print(f"   Статус заявки: {job['status']}, пользователей: {len(panel.users)}, серверов: {len(panel.servers)}")
+        print(f"{'✅' if ok else '❌'} Пользователь не продублирован")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_server_create_timeout():
+    """Таймаут после создания сервера в панели"""
+    print("\n🔍 Таймаут при создании сервера...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        panel.inject_timeout('POST', '/api/application/servers', count=2, hang=1.0)
+        job = await run_job(panel, url, 1002)
+
+        assigned = sum(1 for allocation in panel.allocations.values() if allocation['assigned'])
+        ok = (
+            job['status'] == 'done'
+            and len(panel.servers) == 1
+            and assigned == 1
+            and len(job['db_servers']) == 1
+            and job['db_servers'][0]['pterodactyl_id'] == job['server_identifier']
+            # Числовой ID сохранен для application API (удаление, приостановка)
+            and job['db_servers'][0]['panel_server_id'] in panel.servers
+        )
+        print(f"   Статус заявки: {job['status']}, серверов: {len(panel.servers)}, занято allocation: {assigned}")
+        print(f"{'✅' if ok else '❌'} Сервер не продублирован")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_lookup_unavailable():
+    """Панель не отвечает на поиск по external_id - создавать нельзя"""
+    print("\n🔍 Недоступный поиск по external_id...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        panel.inject_error('GET', '/api/application/users/external/{external_id}', status=502, count=2)
+        job = await run_job(panel, url, 1003)
+
+        lookups = panel.request_counts.get('GET /api/application/users/external/{external_id}', 0)
+        ok = job['status'] == 'done' and len(panel.users) == 1 and lookups == 3
+        print(f"   Статус заявки: {job['status']}, поисков: {lookups}, пользователей: {len(panel.users)}")
+        print(f"{'✅' if ok else '❌'} Создание отложено до успешного поиска")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_legacy_create_with_credentials():
+    """Повторный вызов create_server_with_credentials после таймаута"""
+    print("\n🔍 create_server_with_credentials после таймаута...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        api = PterodactylAPI(url, panel.token, timeout=0.5)
+        panel.inject_timeout('POST', '/api/application/servers', hang=1.0)
+
+        first = await api.create_server_with_credentials(CredentialGenerator.generate_credentials(1004, "Test"))
+        second = await api.create_server_with_credentials(CredentialGenerator.generate_credentials(1004, "Test"))
+
+        ok = first is None and second is not None and len(panel.users) == 1 and len(panel.servers) == 1
+        print(f"   Пользователей: {len(panel.users)}, серверов: {len(panel.servers)}")
+        print(f"{'✅' if ok else '❌'} Повтор вернул уже созданный сервер")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_double_request():
+    """Двойное нажатие и второй экземпляр бота присоединяются к активной заявке"""
+    print("\n🔍 Повторная заявка...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db_path = os.path.join(tempfile.mkdtemp(), "test.db")
+        db = Database(db_path)
+        db.create_user(1005, "test_user", "Test", "User")
+        api = PterodactylAPI(url, panel.token, timeout=0.5)
+        queue = ProvisioningQueue(db, api, workers=1, poll_interval=0.1)
+        # Второй экземпляр бота с той же базой
+        other_queue = ProvisioningQueue(Database(db_path), api, workers=1, poll_interval=0.1)
+
+        async def tap(message_id: int):
+            async with queue.user_locks(1005):
+                if db.get_active_provisioning_job(1005) or db.get_user_servers(1005):
+                    return None, False
+                await asyncio.sleep(0.05)
+                return queue.request(1005, chat_id=1005, message_id=message_id)
+
+        first, second = await asyncio.gather(tap(1), tap(2))
+        other_job, other_created = other_queue.request(1005, chat_id=1005, message_id=3)
+
+        bot = FakeBot()
+        await queue.start(bot)
+        # Повторное нажатие в другом сообщении: его тоже обновляют воркеры
+        await queue.watch(other_job['id'], 1005, 3)
+        watched = bot.shown.get((1005, 3), '')
+        for _ in range(100):
+            if db.get_provisioning_job(first[0]['id'])['status'] in ('done', 'failed'):
+                break
+            await asyncio.sleep(0.1)
+        await queue.stop()
+        job = db.get_provisioning_job(first[0]['id'])
+
+        ok = (
+            first[1] and second == (None, False)
+            and not other_created and other_job['id'] == job['id']
+            and job['status'] == 'done' and job['message_id'] == 1
+            and len(panel.servers) == 1 and len(db.get_user_servers(1005)) == 1
+            and db.get_active_provisioning_job(1005) is None
+            and "Заявка уже создана" in watched
+            and bot.shown[(1005, 1)] == bot.shown[(1005, 3)]
+            and bot.shown[(1005, 3)].startswith("✅ <b>Сервер создан успешно!</b>")
+        )
+        print(f"   Заявка {job['id']}: {job['status']}, сообщение {job['message_id']}, серверов: {len(panel.servers)}")
+        print(f"   Повторное сообщение: {bot.shown.get((1005, 3), '').splitlines()[0]}")
+        print(f"{'✅' if ok else '❌'} Второй сервер не создан")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_parallel_allocations():
+    """Параллельные воркеры не выбирают один allocation, конфликт не расходует попытку"""
+    print("\n🔍 Параллельные заявки...")
+
+    panel = MockPanel(allocations_per_node=20)
+    url = await panel.start()
+    try:
+        db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+        api = PterodactylAPI(url, panel.token, timeout=0.5)
+        # Одна попытка на заявку: любой засчитанный сбой провалит заявку
+        queue = ProvisioningQueue(db, api, workers=5, max_attempts=1, poll_interval=0.05)
+        telegram_ids = range(1100, 1110)
+        for telegram_id in telegram_ids:
+            db.create_user(telegram_id, f"user_{telegram_id}", "Test", "User")
+        job_ids = [queue.enqueue(telegram_id, chat_id=None, message_id=None) for telegram_id in telegram_ids]
+
+        # Зарезервированный allocation первой заявки занимает сервер, созданный в обход очереди
+        panel.inject_latency('GET', '/api/application/servers/external/{external_id}', 0.3)
+        await queue.start(FakeBot())
+        for _ in range(50):
+            allocation_id = db.get_provisioning_job(job_ids[0])['allocation_id']
+            if allocation_id:
+                panel.allocations[allocation_id]['assigned'] = True
+                break
+            await asyncio.sleep(0.01)
+
+        for _ in range(100):
+            jobs = [db.get_provisioning_job(job_id) for job_id in job_ids]
+            if all(job['status'] in ('done', 'failed') for job in jobs):
+                break
+            await asyncio.sleep(0.1)
+        await queue.stop()
+
+        statuses = [job['status'] for job in jobs]
+        allocations = {server['allocation'] for server in panel.servers.values()}
+        ok = (
+            statuses == ['done'] * len(job_ids)
+            and len(panel.servers) == len(job_ids) and len(allocations) == len(job_ids)
+            and allocation_id not in allocations
+            and all(job['attempts'] == 1 for job in jobs)
+        )
+        print(f"   Заявки: {statuses.count('done')}/{len(job_ids)}, серверов: {len(panel.servers)}, "
+              f"попыток: {[job['attempts'] for job in jobs]}")
+        print(f"{'✅' if ok else '❌'} Allocation не пересекаются")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_job_lease():
+    """Заявку живого экземпляра не забирают, заявку упавшего - возвращают в очередь"""
+    print("\n🔍 Аренда заявок...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db_path = os.path.join(tempfile.mkdtemp(), "test.db")
+        db = Database(db_path)
+        db.create_user(1200, "test_user", "Test", "User")
+        api = PterodactylAPI(url, panel.token, timeout=5)
+        first = ProvisioningQueue(db, api, workers=1, poll_interval=0.05, lease_seconds=0.6)
+        second = ProvisioningQueue(Database(db_path), api, workers=1, poll_interval=0.05, lease_seconds=0.6)
+        # Создание пользователя в панели занимает дольше аренды - ее продлевает heartbeat
+        panel.inject_latency('POST', '/api/application/users', 1.5)
+
+        job_id = first.enqueue(1200, chat_id=None, message_id=None)
+        await first.start(FakeBot())
+        await asyncio.sleep(0.2)
+        await second.start(FakeBot())
+        await asyncio.sleep(1.0)
+        alive = db.get_provisioning_job(job_id)
+
+        # Первый экземпляр падает без штатной остановки
+        for task in first._tasks:
+            task.cancel()
+        panel.inject_latency('POST', '/api/application/users', 0)
+        for _ in range(50):
+            if db.get_provisioning_job(job_id)['status'] in ('done', 'failed'):
+                break
+            await asyncio.sleep(0.1)
+        await second.stop()
+        job = db.get_provisioning_job(job_id)
+
+        ok = (
+            alive['status'] == 'running' and alive['owner'] == first.instance_id
+            and job['status'] == 'done' and job['owner'] == second.instance_id
+            and len(panel.servers) == 1
+        )
+        print(f"   Во время работы: {alive['status']} (первый экземпляр: {alive['owner'] == first.instance_id}), "
+              f"итог: {job['status']}, попыток: {job['attempts']}")
+        print(f"{'✅' if ok else '❌'} Заявка продолжена после падения экземпляра")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_lease_takeover():
+    """Экземпляр, потерявший аренду, прекращает заявку и ничего в нее не пишет"""
+    print("\n🔍 Перехват истекшей аренды...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db_path = os.path.join(tempfile.mkdtemp(), "test.db")
+        db = Database(db_path)
+        db.create_user(1300, "test_user", "Test", "User")
+        api = PterodactylAPI(url, panel.token, timeout=5)
+        stalled = ProvisioningQueue(Database(db_path), api, workers=1, poll_interval=0.05, lease_seconds=0.6)
+        second = ProvisioningQueue(Database(db_path), api, workers=1, poll_interval=0.05, lease_seconds=0.6)
+        # Экземпляр продолжает работать, но не может продлить аренду (завис, потерял базу)
+        renewals = []
+        stalled.db.renew_provisioning_lease = lambda *args: renewals.append(args) or True
+        panel.inject_latency('POST', '/api/application/users', 1.5)
+
+        job_id = stalled.enqueue(1300, chat_id=1300, message_id=1)
+        stalled_bot = FakeBot()
+        await stalled.start(stalled_bot)
+        await asyncio.sleep(0.2)
+        panel.inject_latency('POST', '/api/application/users', 0)
+        await second.start(FakeBot())
+        for _ in range(60):
+            if db.get_provisioning_job(job_id)['status'] in ('done', 'failed'):
+                break
+            await asyncio.sleep(0.1)
+        # Запрос зависшего экземпляра к панели завершился - он должен остановиться, а не продолжить
+        await asyncio.sleep(1.0)
+        stalled_idle = not stalled._tasks[0].done() and stalled.db.get_active_provisioning_job(1300) is None
+        await stalled.stop()
+        await second.stop()
+        job = db.get_provisioning_job(job_id)
+
+        ok = (
+            renewals
+            and job['status'] == 'done' and job['owner'] == second.instance_id and job['attempts'] == 2
+            and len(panel.servers) == 1 and len(db.get_user_servers(1300)) == 1
+            and not any("Сервер создан" in text for text in stalled_bot.messages)
+            and stalled_idle
+        )
+        print(f"   Итог: {job['status']}, серверов в панели: {len(panel.servers)}, "
+              f"сообщений зависшего экземпляра: {len(stalled_bot.messages)}")
+        print(f"{'✅' if ok else '❌'} Заявку завершил только новый владелец")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование идемпотентного создания серверов...\n")
+
+    results = {
+        "Таймаут пользователя": await test_user_create_timeout(),
+        "Таймаут сервера": await test_server_create_timeout(),
+        "Недоступный поиск": await test_lookup_unavailable(),
+        "create_server_with_credentials": await test_legacy_create_with_credentials(),
+        "Повторная заявка": await test_double_request(),
+        "Параллельные заявки": await test_parallel_allocations(),
+        "Аренда заявок": await test_job_lease(),
+        "Перехват аренды": await test_lease_takeover(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Тест редактирования сообщений: повторные правки не отправляются, ход выполнения объединяется
+"""
+
+import asyncio
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from utils.message_editor import MessageEditor
+
+
+class FakeBot:
+    """Заглушка Telegram бота: запоминает правки, может отвечать с задержкой"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+        self.edits = []
+        self.shown = {}
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, reply_markup=None, parse_mode=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.shown.get((chat_id, message_id)) == (text, reply_markup):
+            raise BadRequest("Message is not modified: specified new message content and reply markup "
+                             "are exactly the same as a current content and reply markup of the message")
+        self.shown[(chat_id, message_id)] = (text, reply_markup)
+        self.edits.append((chat_id, message_id, text))
+
+
+def keyboard(label: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data="back_to_start")]])
+
+
+async def test_skip_unchanged():
+    """Правка с тем же текстом и клавиатурой не отправляется"""
+    print("🔍 Пропуск правок без изменений...")
+    bot = FakeBot()
+    editor = MessageEditor()
+
+    results = [
+        await editor.edit_text(bot, 1, 10, "Меню", keyboard("🔙 Назад"), 'HTML'),
+        await editor.edit_text(bot, 1, 10, "Меню", keyboard("🔙 Назад"), 'HTML'),
+        await editor.edit_text(bot, 1, 10, "Меню", keyboard("🔙 В меню"), 'HTML'),
+        await editor.edit_text(bot, 1, 11, "Меню", keyboard("🔙 В меню"), 'HTML'),
+    ]
+    # Сообщение изменено в обход редактора: ответ "not modified" не считается ошибкой
+    bot.shown[(1, 12)] = ("Справка", None)
+    results.append(await editor.edit_text(bot, 1, 12, "Справка"))
+    results.append(await editor.edit_text(bot, 1, 12, "Справка"))
+
+    ok = results == [True, False, True, True, False, False] and bot.calls == 4 and len(bot.edits) == 3
+    print(f"   Отправлено: {len(bot.edits)}, статистика: {editor.stats()}")
+    print(f"{'✅' if ok else '❌'} Лишние правки пропущены")
+    return ok
+
+
+async def test_stale_fingerprint():
+    """По умолчанию хэш доверяется, пока он в кэше; trust_ttl > 0 - только trust_ttl секунд"""
+    print("\n🔍 Срок доверия хэшу...")
+    bot = FakeBot()
+    editor = MessageEditor()
+    await editor.edit_text(bot, 1, 40, "Меню")
+    await asyncio.sleep(0.15)
+    # Повторное "Назад" спустя время не расходует лимит Telegram
+    trusted = await editor.edit_text(bot, 1, 40, "Меню")
+    trusted_calls = bot.calls
+
+    bot = FakeBot()
+    editor = MessageEditor(trust_ttl=0.1)
+    results = [await editor.edit_text(bot, 1, 40, "Меню")]
+    # Другой экземпляр бота изменил сообщение: пока хэш свежий, правка пропускается
+    bot.shown[(1, 40)] = ("Справка", None)
+    results.append(await editor.edit_text(bot, 1, 40, "Меню"))
+    await asyncio.sleep(0.15)
+    results.append(await editor.edit_text(bot, 1, 40, "Меню"))
+    results.append(await editor.edit_text(bot, 1, 40, "Меню"))
+    await asyncio.sleep(0.15)
+    results.append(await editor.edit_text(bot, 1, 40, "Меню"))
+
+    ok = (
+        trusted is False and trusted_calls == 1
+        and results == [True, False, True, False, False] and bot.calls == 3
+        and bot.shown[(1, 40)][0] == "Меню"
+    )
+    print(f"   Без срока: {trusted_calls} запрос, со сроком: {results}, запросов: {bot.calls}")
+    print(f"{'✅' if ok else '❌'} Хэш перепроверяется только при заданном сроке")
+    return ok
+
+
+async def test_debounce():
+    """Частые правки хода выполнения объединяются, итоговая отправляется сразу"""
+    print("\n🔍 Объединение правок хода выполнения...")
+    bot = FakeBot()
+    editor = MessageEditor(min_interval=0.2)
+
+    for step in range(1, 11):
+        await editor.edit_text(bot, 1, 20, f"⏳ Этап {step}/10", progress=True)
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.3)
+    progress_edits = [text for _, _, text in bot.edits]
+
+    # Итоговая правка отменяет отложенную и не ждет интервала
+    await editor.edit_text(bot, 1, 20, "⏳ Этап 1/2", progress=True)
+    await editor.edit_text(bot, 1, 20, "⏳ Этап 2/2", progress=True)
+    await editor.edit_text(bot, 1, 20, "✅ Готово")
+    await asyncio.sleep(0.3)
+    final_edits = [text for _, _, text in bot.edits[len(progress_edits):]]
+
+    ok = progress_edits == ["⏳ Этап 1/10", "⏳ Этап 10/10"] and final_edits == ["⏳ Этап 1/2", "✅ Готово"]
+    print(f"   Ход: {progress_edits}, итог: {final_edits}")
+    print(f"{'✅' if ok else '❌'} Правки объединены, последняя показана")
+    return ok
+
+
+async def test_close():
+    """При остановке отложенная правка отправляется сразу"""
+    print("\n🔍 Остановка редактора...")
+    bot = FakeBot()
+    editor = MessageEditor(min_interval=10)
+
+    await editor.edit_text(bot, 1, 50, "⏳ Этап 1", progress=True)
+    await editor.edit_text(bot, 1, 50, "⏳ Этап 2", progress=True)
+    await editor.close()
+    await asyncio.sleep(0.05)
+
+    texts = [text for _, _, text in bot.edits]
+    ok = texts == ["⏳ Этап 1", "⏳ Этап 2"] and not editor._pending
+    print(f"   Правки: {texts}")
+    print(f"{'✅' if ok else '❌'} Отложенная правка не потеряна")
+    return ok
+
+
+async def test_order():
+    """Отложенная правка, ушедшая в Telegram, не затирает итоговую"""
+    print("\n🔍 Порядок правок одного сообщения...")
+    bot = FakeBot(delay=0.1)
+    editor = MessageEditor(min_interval=0.05)
+
+    await editor.edit_text(bot, 1, 30, "⏳ Этап 1", progress=True)
+    await editor.edit_text(bot, 1, 30, "⏳ Этап 2", progress=True)
+    # Отложенная правка уже отправляется, итоговая ждет ее завершения
+    await asyncio.sleep(0.08)
+    await editor.edit_text(bot, 1, 30, "✅ Готово")
+    await asyncio.sleep(0.2)
+
+    texts = [text for _, _, text in bot.edits]
+    ok = texts == ["⏳ Этап 1", "⏳ Этап 2", "✅ Готово"] and bot.shown[(1, 30)][0] == "✅ Готово"
+    print(f"   Правки: {texts}")
+    print(f"{'✅' if ok else '❌'} Итоговый текст показан последним")
+    return ok
+
+
+async def test_bounded():
+    """Хэши хранятся только для последних max_size сообщений"""
+    print("\n🔍 Ограничение кэша...")
+    bot = FakeBot()
+    editor = MessageEditor(max_size=100)
+
+    for message_id in range(1000):
+        await editor.edit_text(bot, 1, message_id, "Меню")
+    # Давно измененное сообщение вытеснено, недавнее - нет
+    await editor.edit_text(bot, 1, 999, "Меню")
+    await editor.edit_text(bot, 1, 0, "Меню")
+
+    ok = editor.stats()['tracked'] == 100 and bot.calls == 1001
+    print(f"   Запросов к Telegram: {bot.calls}, статистика: {editor.stats()}")
+    print(f"{'✅' if ok else '❌'} Кэш ограничен")
+    return ok
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование редактирования сообщений...\n")
+
+    results = {
+        "Пропуск без изменений": await test_skip_unchanged(),
+        "Срок доверия хэшу": await test_stale_fingerprint(),
+        "Объединение хода": await test_debounce(),
+        "Порядок правок": await test_order(),
+        "Остановка": await test_close(),
+        "Ограничение кэша": await test_bounded(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
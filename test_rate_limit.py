@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Тест ограничения частоты действий пользователей (GCRA)
+"""
+
+import asyncio
+from utils.rate_limit import KeyedRateLimiter
+
+
+class FakeClock:
+    """Управляемые часы вместо time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_costs():
+    """Дорогие действия расходуют лимит быстрее дешевых"""
+    print("🔍 Стоимость действий...")
+    clock = FakeClock()
+    limiter = KeyedRateLimiter(rate=1, burst=5, clock=clock)
+
+    # 5 единиц запаса: одно создание сервера (3) и четыре справки (0.5)
+    allowed = [limiter.allow(1, 3.0)] + [limiter.allow(1, 0.5) for _ in range(4)]
+    denied = limiter.allow(1, 3.0)
+    wait = limiter.retry_after(1, 3.0)
+    clock.now += wait
+    after_wait = limiter.allow(1, 3.0)
+    other_user = limiter.allow(2, 3.0)
+
+    ok = all(allowed) and not denied and wait == 3.0 and after_wait and other_user
+    print(f"   Ожидание до создания сервера: {wait:.1f} с")
+    print(f"{'✅' if ok else '❌'} Стоимость учитывается")
+    return ok
+
+
+async def test_refill():
+    """Лимит восстанавливается со временем, без перехода через сутки"""
+    print("\n🔍 Восстановление лимита...")
+    clock = FakeClock()
+    limiter = KeyedRateLimiter(rate=1, burst=3, clock=clock)
+
+    burst = [limiter.allow(1) for _ in range(4)]
+    clock.now += 1
+    one_more = [limiter.allow(1) for _ in range(2)]
+    # Прежняя проверка по timedelta.seconds путала запросы с разницей в сутки
+    clock.now += 86400 - 1
+    next_day = [limiter.allow(1) for _ in range(4)]
+
+    ok = burst == [True, True, True, False] and one_more == [True, False] and next_day == [True, True, True, False]
+    print(f"   Подряд: {burst}, через секунду: {one_more}, через сутки: {next_day}")
+    print(f"{'✅' if ok else '❌'} Лимит восстанавливается")
+    return ok
+
+
+async def test_eviction():
+    """Простаивающие пользователи удаляются, активные остаются"""
+    print("\n🔍 Вытеснение простаивающих...")
+    clock = FakeClock()
+    limiter = KeyedRateLimiter(rate=1, burst=5, clock=clock)
+
+    for user_id in range(1000):
+        limiter.allow(user_id)
+    clock.now += 10
+    limiter.allow(5000)
+    limiter.allow(5001, 5.0)
+
+    ok = len(limiter) == 2 and not limiter.allow(5001)
+    print(f"   Ключей после простоя: {len(limiter)}")
+    print(f"{'✅' if ok else '❌'} Простаивающие вытеснены")
+    return ok
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование ограничения частоты...\n")
+
+    results = {
+        "Стоимость": await test_costs(),
+        "Восстановление": await test_refill(),
+        "Вытеснение": await test_eviction(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Тест освобождения простаивающих серверов на имитации панели
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from db.database import Database
+from mock_panel import MockPanel
+from pterodactyl_api import PterodactylAPI
+from reclaimer import IdleReclaimer
+
+
+class FakeBot:
+    """Заглушка Telegram бота: запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+async def setup(panel: MockPanel, url: str, servers: int):
+    """База, API и серверы пользователя 3001 в панели и базе"""
+    db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+    api = PterodactylAPI(url, panel.token, timeout=0.5, usage_ttl=0)
+    db.create_user(3001, "idle_user", "Idle", "User")
+    user = await api.create_user("idle@cloudspb.ru", "idle_user", "Idle", "secret", external_id="tg-3001")
+    identifiers = []
+    for index in range(servers):
+        allocation_id = await api.get_available_allocation(1)
+        result = await api.create_server(user['attributes']['id'], f"server_{index}", allocation_id)
+        identifier = result['attributes']['identifier']
+        db.create_server(3001, identifier, f"server_{index}")
+        identifiers.append(identifier)
+    reclaimer = IdleReclaimer(db, api, warn_days=7, suspend_days=10, delete_days=14, batch_size=2)
+    await reclaimer.start(FakeBot())
+    await reclaimer.stop()
+    return db, api, reclaimer, identifiers
+
+
+def days_later(days: float) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=days)
+
+
+async def test_stages():
+    """Выключенный сервер проходит предупреждение, приостановку и удаление"""
+    print("🔍 Стадии простоя...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, api, reclaimer, (identifier,) = await setup(panel, url, servers=1)
+
+        fresh = await reclaimer.run_once()
+        warned = await reclaimer.run_once(days_later(8))
+        suspended = await reclaimer.run_once(days_later(11))
+        server_suspended = next(iter(panel.servers.values()))['suspended']
+        deleted = await reclaimer.run_once(days_later(15))
+
+        stats = db.get_reclaim_stats()
+        actions = [log['action_type'] for log in db.get_recent_action_logs(10)]
+        ok = (
+            fresh['warned'] == 0
+            and warned['warned'] == 1
+            and suspended['suspended'] == 1 and server_suspended
+            and deleted['deleted'] == 1
+            and not panel.servers and not db.get_server(identifier)
+            and stats['suspend']['servers'] == 1 and stats['delete']['servers'] == 1
+            and set(actions) == {'reclaim_suspend', 'reclaim_delete'}
+            and len(reclaimer.bot.messages) == 3
+        )
+        print(f"   Отчеты: {warned}, {suspended}, {deleted}")
+        print(f"{'✅' if ok else '❌'} Сервер освобожден по стадиям")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_long_idle():
+    """Сервер, простаивающий дольше delete_days, получает полный срок после каждой стадии"""
+    print("\n🔍 Давно простаивающий сервер...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, api, reclaimer, (identifier,) = await setup(panel, url, servers=1)
+
+        # Проверка простоя включена, когда сервер уже выключен 20 дней
+        warned = await reclaimer.run_once(days_later(20))
+        early_suspend = await reclaimer.run_once(days_later(22))
+        suspended = await reclaimer.run_once(days_later(23))
+        early_delete = await reclaimer.run_once(days_later(26))
+        deleted = await reclaimer.run_once(days_later(27))
+
+        warning = reclaimer.bot.messages[0][1]
+        ok = (
+            warned['warned'] == 1
+            and early_suspend['suspended'] == 0 and suspended['suspended'] == 1
+            and early_delete['deleted'] == 0 and deleted['deleted'] == 1
+            and "Через 3 дн. он будет приостановлен" in warning and "еще через 4 дн." in warning
+            and not panel.servers and not db.get_server(identifier)
+        )
+        print(f"   Отчеты: {warned}, {early_suspend}, {suspended}, {early_delete}, {deleted}")
+        print(f"{'✅' if ok else '❌'} Сроки из уведомлений соблюдены")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_running_resets():
+    """Запущенный сервер не освобождается и сбрасывает отсчет"""
+    print("\n🔍 Запущенный сервер...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, api, reclaimer, identifiers = await setup(panel, url, servers=3)
+
+        await reclaimer.run_once(days_later(8))
+        await api.start_server(identifiers[0])
+        report = await reclaimer.run_once(days_later(11))
+
+        server = db.get_server(identifiers[0])
+        ok = (
+            report['checked'] == 3
+            and report['suspended'] == 2
+            and server['idle_stage'] is None and server['last_active_at']
+            and server['status'] != 'suspended'
+        )
+        print(f"   Отчет: {report}")
+        print(f"{'✅' if ok else '❌'} Запуск сервера сбросил отсчет")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_panel_errors():
+    """Сервер без ответа панели не считается простаивающим"""
+    print("\n🔍 Ошибки панели...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, _, reclaimer, identifiers = await setup(panel, url, servers=1)
+        panel.inject_error('GET', '/api/client/servers/{server_id}/resources', status=500, count=1)
+        report = await reclaimer.run_once(days_later(8))
+
+        # Поиск сервера в панели не удался - сервер не приостановлен и будет проверен снова
+        await reclaimer.run_once(days_later(8))
+        panel.inject_error('GET', '/api/application/servers', status=500, count=1)
+        failed = await reclaimer.run_once(days_later(11))
+        stage = db.get_server(identifiers[0])['idle_stage']
+        # Сервер удален из панели вручную - запись убирается без ошибки
+        await reclaimer.run_once(days_later(11))
+        panel.servers.clear()
+        gone = await reclaimer.run_once(days_later(15))
+
+        ok = (
+            report['warned'] == 0
+            and failed['failed'] == 1 and stage == 'warned'
+            and gone['deleted'] == 1 and not db.get_server(identifiers[0])
+        )
+        print(f"   Отчеты: {report}, {failed}, {gone}")
+        print(f"{'✅' if ok else '❌'} Без данных панели сервер не тронут")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование освобождения простаивающих серверов...\n")
+
+    results = {
+        "Стадии простоя": await test_stages(),
+        "Давний простой": await test_long_idle(),
+        "Запущенный сервер": await test_running_resets(),
+        "Ошибки панели": await test_panel_errors(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Тест перепроверки подписки владельцев серверов на имитации панели
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from telegram import Chat, ChatMemberLeft, ChatMemberMember, User
+from db.database import Database
+from mock_panel import MockPanel
+from pterodactyl_api import PterodactylAPI
+from subscription_checker import SubscriptionChecker
+from subscription_sweeper import SubscriptionSweeper
+
+
+class FakeBot:
+    """Заглушка Telegram бота: подписчики из members, сообщения запоминаются"""
+
+    def __init__(self, members: set):
+        self.members = members
+        self.member_calls = 0
+        self.messages = []
+
+    async def get_chat(self, chat_id):
+        return Chat(id=-1001, type=Chat.CHANNEL, username="CloudSPBru", title="CloudSPB")
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.member_calls += 1
+        user = User(id=user_id, first_name="User", is_bot=False)
+        return ChatMemberMember(user=user) if user_id in self.members else ChatMemberLeft(user=user)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+async def setup(panel: MockPanel, url: str, owners: list, members: set):
+    """База, API и по одному серверу на каждого владельца"""
+    db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+    api = PterodactylAPI(url, panel.token, timeout=0.5)
+    bot = FakeBot(members)
+    checker = SubscriptionChecker(bot, "@CloudSPBru", negative_ttl=0)
+    for index, telegram_id in enumerate(owners):
+        db.create_user(telegram_id, f"user_{telegram_id}", "User", None)
+        user = await api.create_user(f"{telegram_id}@cloudspb.ru", f"user_{telegram_id}", "User", "secret")
+        allocation_id = await api.get_available_allocation(1)
+        result = await api.create_server(user['attributes']['id'], f"server_{telegram_id}", allocation_id)
+        attributes = result['attributes']
+        if index % 2:
+            # Запись с числовым ID панели, как сохраняет очередь создания серверов
+            db.create_server_with_credentials(telegram_id, attributes['identifier'], f"server_{telegram_id}",
+                                              {'username': None, 'password': None, 'email': None},
+                                              panel_server_id=attributes['id'])
+        else:
+            db.create_server(telegram_id, attributes['identifier'], f"server_{telegram_id}")
+    sweeper = SubscriptionSweeper(db, api, checker, batch_size=2, concurrency=2, grace_hours=24, delete_days=7)
+    sweeper.bot = bot
+    return db, bot, sweeper
+
+
+def hours_later(hours: float) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=hours)
+
+
+async def test_policy():
+    """Отписавшийся владелец: предупреждение, приостановка, удаление"""
+    print("🔍 Политика после отписки...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, bot, sweeper = await setup(panel, url, owners=[5001, 5002, 5003], members={5001, 5003})
+
+        first = await sweeper.run_sweep()
+        early = await sweeper.run_sweep(hours_later(1))
+        suspended = await sweeper.run_sweep(hours_later(25))
+        server_suspended = [server['suspended'] for server in panel.servers.values()]
+        deleted = await sweeper.run_sweep(hours_later(24 * 7 + 1))
+
+        ok = (
+            first['checked'] == 3 and first['warned'] == 1 and first['unsubscribed'] == 1
+            and early['warned'] == 0 and early['suspended'] == 0 and early['unsubscribed'] == 1
+            and suspended['suspended'] == 1 and server_suspended.count(True) == 1
+            and deleted['deleted'] == 1 and len(panel.servers) == 2
+            and not db.get_user_servers(5002)
+            and db.get_user(5002)['unsubscribed_stage'] is None
+            and {chat_id for chat_id, _ in bot.messages} == {5002}
+        )
+        print(f"   Проходы: {first['warned']}/{suspended['suspended']}/{deleted['deleted']}, "
+              f"серверов в панели: {len(panel.servers)}")
+        print(f"{'✅' if ok else '❌'} Политика применена по стадиям")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_resubscribe():
+    """Повторная подписка снимает приостановку"""
+    print("\n🔍 Повторная подписка...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, bot, sweeper = await setup(panel, url, owners=[5004], members=set())
+
+        await sweeper.run_sweep()
+        await sweeper.run_sweep(hours_later(25))
+        bot.members.add(5004)
+        restored = await sweeper.run_sweep(hours_later(26))
+
+        server = db.get_user_servers(5004)[0]
+        ok = (
+            restored['restored'] == 1
+            and server['status'] == 'active'
+            and not any(server['suspended'] for server in panel.servers.values())
+            and db.get_user(5004)['unsubscribed_stage'] is None
+        )
+        print(f"   Статус сервера: {server['status']}")
+        print(f"{'✅' if ok else '❌'} Приостановка снята")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_resume():
+    """Прерванный проход продолжается с сохраненного курсора"""
+    print("\n🔍 Продолжение прохода...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, bot, sweeper = await setup(panel, url, owners=[5005, 5006, 5007, 5008], members={5005, 5006, 5007, 5008})
+
+        # Имитируем перезапуск после первой пачки
+        sweep = db.start_subscription_sweep()
+        db.update_subscription_sweep(sweep['id'], cursor=5006, checked=2, elapsed=0.5)
+        resumed = await sweeper.run_sweep()
+        resumed_calls = bot.member_calls
+        fresh = await sweeper.run_sweep()
+
+        ok = (
+            resumed['id'] == sweep['id'] and resumed['checked'] == 4
+            and resumed_calls == 2
+            and fresh['id'] != sweep['id'] and fresh['checked'] == 4
+            and db.get_last_subscription_sweep()['id'] == fresh['id']
+        )
+        print(f"   Проверено после продолжения: {resumed['checked']}, запросов к API: {resumed_calls}")
+        print(f"{'✅' if ok else '❌'} Проход продолжен с курсора")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование перепроверки подписок...\n")
+
+    results = {
+        "Политика": await test_policy(),
+        "Повторная подписка": await test_resubscribe(),
+        "Продолжение прохода": await test_resume(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
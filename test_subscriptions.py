@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Тест учета подписок на каналы по событиям chat_member
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from telegram import Chat, ChatMemberLeft, ChatMemberMember, ChatMemberUpdated, User
+from db.database import Database
+from subscription_checker import SubscriptionChecker
+
+CHANNEL = Chat(id=-1001, type=Chat.CHANNEL, username="CloudSPBru", title="CloudSPB")
+
+
+class FakeBot:
+    """Заглушка Telegram бота: считает запросы к API"""
+
+    def __init__(self, members: dict):
+        self.members = members
+        self.calls = 0
+
+    async def get_chat(self, chat_id):
+        self.calls += 1
+        return CHANNEL
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls += 1
+        user = User(id=user_id, first_name="User", is_bot=False)
+        if user_id in self.members:
+            return ChatMemberMember(user=user)
+        return ChatMemberLeft(user=user)
+
+
+class SlowChannelsBot:
+    """Заглушка Telegram бота с несколькими каналами и задержкой каждого запроса"""
+
+    def __init__(self, members: dict, delay: float):
+        # members: username канала -> множество подписчиков
+        self.members = members
+        self.chats = {-index: username for index, username in enumerate(members, start=10)}
+        self.delay = delay
+        self.calls = 0
+
+    async def get_chat(self, chat_id):
+        await asyncio.sleep(self.delay)
+        username = chat_id.lstrip('@')
+        chat_id = next(key for key, name in self.chats.items() if name == username)
+        return Chat(id=chat_id, type=Chat.CHANNEL, username=username, title=username)
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        username = self.chats[chat_id]
+        user = User(id=user_id, first_name="User", is_bot=False)
+        return ChatMemberMember(user=user) if user_id in self.members[username] else ChatMemberLeft(user=user)
+
+
+def member_update(user_id: int, joined: bool, minutes_ago: float, chat: Chat = CHANNEL) -> ChatMemberUpdated:
+    """Событие вступления в канал или выхода из него"""
+    user = User(id=user_id, first_name="User", is_bot=False)
+    member, left = ChatMemberMember(user=user), ChatMemberLeft(user=user)
+    return ChatMemberUpdated(
+        chat=chat, from_user=user,
+        date=datetime.now(timezone.utc) - timedelta(minutes=minutes_ago),
+        old_chat_member=left if joined else member,
+        new_chat_member=member if joined else left,
+    )
+
+
+def setup(members: dict):
+    db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+    checker = SubscriptionChecker(FakeBot(members), "@CloudSPBru", db=db)
+    return db, checker
+
+
+async def test_join_time():
+    """Правило 10 минут работает по времени вступления из события"""
+    print("🔍 Время подписки...")
+    db, checker = setup({})
+
+    checker.handle_member_update(member_update(4001, joined=True, minutes_ago=3))
+    checker.handle_member_update(member_update(4002, joined=True, minutes_ago=30))
+    fresh = await checker.check_subscription(4001)
+    old = await checker.check_subscription(4002)
+
+    ok = (
+        fresh['is_subscribed'] and not fresh['meets_time_requirement']
+        and old['is_subscribed'] and old['meets_time_requirement']
+        and checker.bot.calls == 0
+    )
+    print(f"   Подписан 3 мин: {fresh['meets_time_requirement']}, 30 мин: {old['meets_time_requirement']}, "
+          f"запросов к API: {checker.bot.calls}")
+    print(f"{'✅' if ok else '❌'} Время подписки проверяется по базе")
+    return ok
+
+
+async def test_leave_and_rejoin():
+    """Выход из канала виден сразу, повторное вступление начинает отсчет заново"""
+    print("\n🔍 Выход и повторная подписка...")
+    db, checker = setup({})
+
+    checker.handle_member_update(member_update(4003, joined=True, minutes_ago=60))
+    checker.handle_member_update(member_update(4003, joined=False, minutes_ago=5))
+    left = await checker.check_subscription(4003)
+    checker.handle_member_update(member_update(4003, joined=True, minutes_ago=1))
+    rejoined = await checker.check_subscription(4003)
+
+    ignored = checker.handle_member_update(
+        member_update(4004, joined=True, minutes_ago=1, chat=Chat(id=-2, type=Chat.CHANNEL, username="other"))
+    )
+    ok = (
+        not left['is_subscribed']
+        and rejoined['is_subscribed'] and not rejoined['meets_time_requirement']
+        and not ignored and db.get_subscription('cloudspbru', 4004) is None
+        and checker.bot.calls == 0
+    )
+    print(f"   После выхода: {left['status']}, после возврата: {rejoined['subscription_duration']}")
+    print(f"{'✅' if ok else '❌'} Выход и возврат учтены")
+    return ok
+
+
+async def test_api_fallback():
+    """Подписавшиеся до начала учета проверяются через API один раз"""
+    print("\n🔍 Подписка до начала учета...")
+    db, checker = setup({4005})
+
+    first = await checker.check_subscription(4005)
+    checker.member_caches['cloudspbru'].clear()
+    second = await checker.check_subscription(4005)
+    missing = await checker.check_subscription(4006)
+
+    ok = (
+        first['is_subscribed'] and first['meets_time_requirement']
+        and second['is_subscribed']
+        and not missing['is_subscribed']
+        and db.get_subscription('cloudspbru', 4005)['joined_at'] is None
+        and db.get_subscription('cloudspbru', 4006) is None
+        # канал + подписчик + не подписанный
+        and checker.bot.calls == 3
+    )
+    print(f"   Запросов к API: {checker.bot.calls}, статистика: {checker.stats()}")
+    print(f"{'✅' if ok else '❌'} К API обращаемся только для неизвестных пользователей")
+    return ok
+
+
+async def test_multiple_channels():
+    """Каналы проверяются параллельно, в ответе - каналы без подписки"""
+    print("\n🔍 Несколько каналов...")
+    db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+    bot = SlowChannelsBot({"CloudSPBru": {4007}, "partner": set(), "news": {4007}}, delay=0.2)
+    checker = SubscriptionChecker(bot, "@CloudSPBru:10,@partner:30,@news", db=db)
+    partner = Chat(id=-3, type=Chat.CHANNEL, username="partner", title="partner")
+
+    started = time.monotonic()
+    result = await checker.check_subscription(4007)
+    elapsed = time.monotonic() - started
+
+    # Подписка на partner 20 минут из 30 нужных
+    checker.handle_member_update(member_update(4007, joined=True, minutes_ago=20, chat=partner))
+    waiting = await checker.check_subscription(4007)
+    message = await checker.get_subscription_message(4007, waiting)
+
+    ok = (
+        not result['is_subscribed'] and result['missing'] == ['partner']
+        and [channel['is_subscribed'] for channel in result['channels']] == [True, False, True]
+        # канал и участник для трех каналов параллельно - около двух запросов, а не шести
+        and elapsed < 0.2 * 3
+        and waiting['is_subscribed'] and not waiting['meets_time_requirement']
+        and waiting['missing'] == [] and waiting['waiting'] == ['partner']
+        and '@partner' in message and '@news' not in message
+    )
+    print(f"   Время проверки 3 каналов: {elapsed:.2f} с, не подписан: {result['missing']}, "
+          f"ожидание: {waiting['waiting']}")
+    print(f"{'✅' if ok else '❌'} Каналы проверены параллельно")
+    return ok
+
+
+async def test_legacy_migration():
+    """Подписки из таблицы версии с одним каналом переносятся, а не удаляются"""
+    print("\n🔍 Перенос подписок с одним каналом...")
+    db_path = os.path.join(tempfile.mkdtemp(), "test.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE subscriptions (
+                telegram_id INTEGER PRIMARY KEY, status TEXT NOT NULL, is_member BOOLEAN NOT NULL,
+                joined_at TIMESTAMP, left_at TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute("INSERT INTO subscriptions (telegram_id, status, is_member, joined_at) "
+                     "VALUES (701, 'member', 1, '2024-01-01 10:00:00')")
+
+    # Без канала по умолчанию записи сохраняются до запуска, где канал известен
+    Database(db_path)
+    db = Database(db_path, default_channel="cloudspbru")
+    migrated = db.get_subscription("cloudspbru", 701)
+    Database(db_path, default_channel="cloudspbru")
+
+    ok = (
+        migrated is not None and migrated['is_member'] and migrated['joined_at'] == '2024-01-01 10:00:00'
+        and db.get_subscription("cloudspbru", 701) == migrated
+    )
+    print(f"   Перенесено: {migrated}")
+    print(f"{'✅' if ok else '❌'} Время подписки сохранено")
+    return ok
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование учета подписок...\n")
+
+    results = {
+        "Время подписки": await test_join_time(),
+        "Выход и возврат": await test_leave_and_rejoin(),
+        "Подписка до учета": await test_api_fallback(),
+        "Несколько каналов": await test_multiple_channels(),
+        "Перенос подписок": await test_legacy_migration(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
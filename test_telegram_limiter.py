@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Тест планировщика исходящих запросов бота с учетом flood control
+"""
+
+import asyncio
+import time
+from telegram.error import RetryAfter
+from utils.telegram_limiter import FloodControlLimiter
+
+
+class FakeEndpoint:
+    """Заглушка запроса к Bot API: первые failures вызовов отвечают RetryAfter"""
+
+    def __init__(self, failures: int = 0, retry_after: int = 1):
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = []
+
+    async def __call__(self):
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.failures:
+            raise RetryAfter(self.retry_after)
+        return True
+
+
+async def request(limiter: FloodControlLimiter, endpoint: FakeEndpoint, name: str, chat_id=None):
+    data = {'chat_id': chat_id} if chat_id is not None else {}
+    return await limiter.process_request(endpoint, (), {}, name, data, None)
+
+
+async def test_lane_pause():
+    """RetryAfter приостанавливает только свой чат, запрос повторяется"""
+    print("🔍 Пауза полосы...")
+    limiter = FloodControlLimiter(private_rate=100, lookup_rate=0)
+    flooded, other, lookup = FakeEndpoint(failures=1), FakeEndpoint(), FakeEndpoint()
+
+    started = time.monotonic()
+    flooded_task = asyncio.create_task(request(limiter, flooded, "sendMessage", chat_id=6001))
+    await asyncio.sleep(0.05)
+    other_ok = await request(limiter, other, "sendMessage", chat_id=6002)
+    lookup_ok = await request(limiter, lookup, "getChatMember", chat_id=-1001)
+    unaffected = time.monotonic() - started
+    flooded_ok = await flooded_task
+    paused = flooded.calls[1] - flooded.calls[0]
+
+    ok = (
+        flooded_ok and other_ok and lookup_ok
+        and unaffected < 0.5 and paused >= 0.95
+        and len(flooded.calls) == 2 and limiter.retries == 1
+    )
+    print(f"   Другие полосы: {unaffected:.2f} с, пауза чата: {paused:.2f} с")
+    print(f"{'✅' if ok else '❌'} Приостановлен только чат с RetryAfter")
+    return ok
+
+
+async def test_retries_exhausted():
+    """После max_retries RetryAfter пробрасывается"""
+    print("\n🔍 Исчерпание повторов...")
+    limiter = FloodControlLimiter(lookup_rate=0, max_retries=0)
+    endpoint = FakeEndpoint(failures=1)
+    try:
+        await request(limiter, endpoint, "getChat", chat_id="@CloudSPBru")
+        ok = False
+    except RetryAfter:
+        ok = len(endpoint.calls) == 1
+    print(f"{'✅' if ok else '❌'} RetryAfter проброшен без повторов")
+    return ok
+
+
+async def test_chat_rate():
+    """Сообщения в один личный чат идут не чаще private_rate после запаса"""
+    print("\n🔍 Лимит личного чата...")
+    limiter = FloodControlLimiter(private_rate=10)
+    endpoint = FakeEndpoint()
+
+    started = time.monotonic()
+    await asyncio.gather(*(request(limiter, endpoint, "sendMessage", chat_id=6003) for _ in range(6)))
+    elapsed = time.monotonic() - started
+
+    # 3 сообщения из запаса, остальные 3 - по 0.1 с
+    ok = 0.25 <= elapsed < 0.6
+    print(f"   6 сообщений: {elapsed:.2f} с")
+    print(f"{'✅' if ok else '❌'} Лимит чата соблюден")
+    return ok
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование flood control...\n")
+
+    results = {
+        "Пауза полосы": await test_lane_pause(),
+        "Исчерпание повторов": await test_retries_exhausted(),
+        "Лимит чата": await test_chat_rate(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Тест обработки обновлений: по порядку для пользователя, параллельно для разных
+"""
+
+import asyncio
+import time
+from telegram import Update
+from utils.update_processor import PerUserUpdateProcessor
+
+
+def make_update(update_id: int, user_id: int) -> Update:
+    user = {'id': user_id, 'is_bot': False, 'first_name': "User"}
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {'message_id': update_id, 'date': 0, 'text': "/start",
+                    'from': user, 'chat': {'id': user_id, 'type': 'private'}},
+    }, None)
+
+
+class Recorder:
+    """Обработчик с заданной задержкой, записывает порядок и число одновременных вызовов"""
+
+    def __init__(self):
+        self.finished = []
+        self.running = 0
+        self.peak = 0
+
+    async def handle(self, update: Update, delay: float) -> None:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(delay)
+        self.running -= 1
+        self.finished.append((update.effective_user.id, update.update_id, time.monotonic()))
+
+
+async def dispatch(processor: PerUserUpdateProcessor, recorder: Recorder, updates) -> None:
+    """Как Application: задача на каждое обновление в порядке получения"""
+    await asyncio.gather(*(
+        asyncio.create_task(processor.process_update(update, recorder.handle(update, delay)))
+        for update, delay in updates
+    ))
+
+
+async def test_order():
+    """Обновления пользователя выполняются по порядку, даже если первое медленное"""
+    print("🔍 Порядок обновлений пользователя...")
+    processor = PerUserUpdateProcessor(8)
+    recorder = Recorder()
+
+    delays = [0.1, 0.01, 0.05, 0.0, 0.02]
+    await dispatch(processor, recorder, [(make_update(i, 8001), delay) for i, delay in enumerate(delays, 1)])
+
+    order = [update_id for _, update_id, _ in recorder.finished]
+    ok = order == [1, 2, 3, 4, 5] and recorder.peak == 1
+    print(f"   Порядок завершения: {order}")
+    print(f"{'✅' if ok else '❌'} Порядок сохранен")
+    return ok
+
+
+async def test_parallel():
+    """Медленное обновление одного пользователя не задерживает других"""
+    print("\n🔍 Параллельность между пользователями...")
+    processor = PerUserUpdateProcessor(8)
+    recorder = Recorder()
+
+    started = time.monotonic()
+    updates = [(make_update(1, 8002), 0.5), (make_update(2, 8002), 0.0)]
+    updates += [(make_update(10 + i, 8100 + i), 0.05) for i in range(5)]
+    await dispatch(processor, recorder, updates)
+
+    others = [finished - started for user_id, _, finished in recorder.finished if user_id != 8002]
+    ok = max(others) < 0.2 and recorder.finished[-1][1] == 2
+    print(f"   Другие пользователи завершены за {max(others):.2f} с")
+    print(f"{'✅' if ok else '❌'} Пользователи обрабатываются параллельно")
+    return ok
+
+
+async def test_limit_and_eviction():
+    """Общий лимит соблюдается, блокировки пользователей удаляются после обработки"""
+    print("\n🔍 Лимит и освобождение блокировок...")
+    processor = PerUserUpdateProcessor(4)
+    recorder = Recorder()
+
+    # Очередь одного пользователя не занимает слоты остальных
+    updates = [(make_update(i, 8200), 0.05) for i in range(10)]
+    updates += [(make_update(100 + i, 8300 + i), 0.05) for i in range(20)]
+    await dispatch(processor, recorder, updates)
+
+    ok = recorder.peak == 4 and processor.stats() == {'processed': 30, 'active_users': 0}
+    print(f"   Одновременно: {recorder.peak}, статистика: {processor.stats()}")
+    print(f"{'✅' if ok else '❌'} Лимит соблюден, блокировки освобождены")
+    return ok
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование обработки обновлений...\n")
+
+    results = {
+        "Порядок": await test_order(),
+        "Параллельность": await test_parallel(),
+        "Лимит": await test_limit_and_eviction(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
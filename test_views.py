@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Тест экранов бота: экранирование данных пользователя и неизменяемые клавиатуры
+"""
+
+import asyncio
+from views import (
+    Html, Template, BANNED, WELCOME, SERVER_ITEM, BACK_KEYBOARD, WELCOME_KEYBOARD,
+    CHECK_READY_KEYBOARD, SERVER_CREDENTIALS, SERVER_CREATED, SERVER_GIVEN, JOB_FAILED, GIVE_ACCEPTED,
+    subscribe_keyboard
+)
+
+
+async def test_escaping():
+    """Поля шаблона экранируются, готовые HTML-фрагменты подставляются как есть"""
+    print("🔍 Экранирование полей шаблонов...")
+
+    welcome = WELCOME.render(first_name="<b>Вася</b> & Co", subscription=Html("✅ <b>Подписка активна</b>"))
+    banned = BANNED.render(reason="Попытка использования неуникального email: a<script>@b.ru")
+    server = SERVER_ITEM.render(number=1, server_id="ab12", name="server_<i>", username=None,
+                                email="user@example.com", status="active", created_at="2024-01-01")
+
+    ok = (
+        "Привет, &lt;b&gt;Вася&lt;/b&gt; &amp; Co!" in welcome
+        and "✅ <b>Подписка активна</b>" in welcome
+        and "a&lt;script&gt;@b.ru" in banned
+        and "Название: server_&lt;i&gt;" in server and "Username: None" in server
+        and isinstance(welcome, Html)
+    )
+    print(f"   {welcome.splitlines()[0]}")
+    print(f"{'✅' if ok else '❌'} Данные пользователя экранированы")
+    return ok
+
+
+async def test_job_screens():
+    """Экраны заявки экранируют пароль, имя пользователя и текст ошибки панели"""
+    print("\n🔍 Экраны заявки на сервер...")
+
+    credentials = SERVER_CREDENTIALS.render(server_id="ab12", username="user_1", password="a&b<c",
+                                            email="user@example.com")
+    created = SERVER_CREATED.render(credentials=credentials)
+    given = SERVER_GIVEN.render(first_name="<Вася>", username="vasya", server_id="ab12",
+                                panel_username="user_1", email="user@example.com")
+    failed = JOB_FAILED.render(code="PT_USER_CREATE", message="422 - <html>Bad</html>")
+    accepted = GIVE_ACCEPTED.render(first_name="A&B", username="ab", profile="<mc>", position=1)
+
+    ok = (
+        "Password: a&amp;b&lt;c" in created and created.startswith("✅ <b>Сервер создан успешно!</b>")
+        and "Пользователь: &lt;Вася&gt; (@vasya)" in given
+        and "422 - &lt;html&gt;Bad&lt;/html&gt;" in failed
+        and "Пользователь: A&amp;B" in accepted and "Профиль: &lt;mc&gt;" in accepted
+    )
+    print(f"   {given.splitlines()[2]}")
+    print(f"{'✅' if ok else '❌'} Данные заявки экранированы")
+    return ok
+
+
+async def test_template_errors():
+    """Формат поля в шаблоне и пропущенное поле - ошибки"""
+    print("\n🔍 Ошибки шаблонов...")
+    errors = 0
+    try:
+        Template("Попаданий: {rate:.0%}")
+    except ValueError:
+        errors += 1
+    try:
+        BANNED.render()
+    except KeyError:
+        errors += 1
+
+    ok = errors == 2
+    print(f"{'✅' if ok else '❌'} Ошибки обнаружены: {errors}/2")
+    return ok
+
+
+async def test_keyboards():
+    """Клавиатуры создаются один раз и не меняются"""
+    print("\n🔍 Неизменяемые клавиатуры...")
+
+    frozen = False
+    try:
+        BACK_KEYBOARD.inline_keyboard = ()
+    except AttributeError:
+        frozen = True
+
+    single = subscribe_keyboard(("CloudSPBru",))
+    several = subscribe_keyboard(("CloudSPBru", "partner"))
+    ok = (
+        frozen
+        and subscribe_keyboard(("CloudSPBru",)) is single
+        and single.inline_keyboard[0][0].text == "📢 Подписаться на канал"
+        and [row[0].text for row in several.inline_keyboard[:2]] == ["📢 Подписаться на @CloudSPBru",
+                                                                    "📢 Подписаться на @partner"]
+        and several.inline_keyboard[2:] == CHECK_READY_KEYBOARD.inline_keyboard[1:]
+        and WELCOME_KEYBOARD.inline_keyboard[-1] == BACK_KEYBOARD.inline_keyboard[0]
+    )
+    print(f"   Клавиатура /check: {len(several.inline_keyboard)} рядов")
+    print(f"{'✅' if ok else '❌'} Клавиатуры неизменяемы и переиспользуются")
+    return ok
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование экранов бота...\n")
+
+    results = {
+        "Экранирование": await test_escaping(),
+        "Экраны заявки": await test_job_screens(),
+        "Ошибки шаблонов": await test_template_errors(),
+        "Клавиатуры": await test_keyboards(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
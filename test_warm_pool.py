@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Тест пула заранее созданных серверов на имитации панели
+"""
+
+import asyncio
+import os
+import tempfile
+from db.database import Database
+from mock_panel import MockPanel
+from provisioning import ProvisioningQueue
+from pterodactyl_api import PterodactylAPI
+from server_profiles import ServerProfileRegistry
+from utils.credentials import CredentialGenerator
+from warm_pool import WarmPool, POOL_OWNER_EXTERNAL_ID
+
+
+class FakeBot:
+    """Заглушка Telegram бота: запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def edit_message_text(self, text, **kwargs):
+        self.messages.append(text)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append(text)
+
+
+async def setup(panel: MockPanel, url: str, size: int):
+    """База, API, пул и очередь для теста"""
+    db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+    api = PterodactylAPI(url, panel.token, timeout=0.5)
+    profiles = ServerProfileRegistry(path="missing_profiles.json")
+    pool = WarmPool(db, api, profiles, size=size)
+    queue = ProvisioningQueue(db, api, workers=1, max_attempts=5, poll_interval=0.1,
+                              profiles=profiles, warm_pool=pool)
+    return db, pool, queue
+
+
+async def run_job(db: Database, queue: ProvisioningQueue, telegram_id: int) -> dict:
+    """Выполнить одну заявку через очередь и дождаться результата"""
+    db.create_user(telegram_id, "test_user", "Test", "User")
+    await queue.start(FakeBot())
+    job_id = queue.enqueue(telegram_id, chat_id=telegram_id, message_id=1)
+
+    job = db.get_provisioning_job(job_id)
+    for _ in range(100):
+        job = db.get_provisioning_job(job_id)
+        if job['status'] in ('done', 'failed'):
+            break
+        await asyncio.sleep(0.1)
+    await queue.stop()
+    return job
+
+
+def pool_owner_id(panel: MockPanel) -> int:
+    return next(user['id'] for user in panel.users.values() if user['external_id'] == POOL_OWNER_EXTERNAL_ID)
+
+
+async def test_replenish():
+    """Пополнение пула создает приостановленные серверы служебного пользователя"""
+    print("🔍 Пополнение пула...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, pool, _ = await setup(panel, url, size=3)
+        created = await pool.replenish()
+        again = await pool.replenish()
+
+        owner_id = pool_owner_id(panel)
+        ok = (
+            created == 3 and again == 0
+            and len(panel.servers) == 3
+            and all(server['suspended'] and server['user'] == owner_id for server in panel.servers.values())
+            and db.count_warm_servers() == {'minecraft': {'ready': 3}}
+        )
+        print(f"   Создано: {created}, повторно: {again}, серверов в панели: {len(panel.servers)}")
+        print(f"{'✅' if ok else '❌'} Пул пополнен до заданного размера")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_claim():
+    """Заявка получает сервер из пула без создания нового"""
+    print("\n🔍 Выдача сервера из пула...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, pool, queue = await setup(panel, url, size=2)
+        await pool.replenish()
+        job = await run_job(db, queue, 2001)
+
+        server = next(server for server in panel.servers.values()
+                      if server['identifier'] == job['server_identifier'])
+        user = next(user for user in panel.users.values()
+                    if user['external_id'] == CredentialGenerator.generate_external_id(2001))
+        ok = (
+            job['status'] == 'done'
+            and len(panel.servers) == 2
+            and panel.request_counts.get('POST /api/application/servers', 0) == 2
+            and server['user'] == user['id']
+            and not server['suspended']
+            and server['external_id'] == CredentialGenerator.generate_external_id(2001)
+            and db.count_warm_servers()['minecraft'] == {'ready': 1, 'assigned': 1}
+        )
+        print(f"   Статус заявки: {job['status']}, серверов в панели: {len(panel.servers)}")
+        print(f"{'✅' if ok else '❌'} Сервер выдан из пула")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_claim_retry():
+    """Сбой снятия приостановки: повтор продолжает с тем же сервером пула"""
+    print("\n🔍 Сбой при выдаче из пула...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, pool, queue = await setup(panel, url, size=2)
+        await pool.replenish()
+        panel.inject_error('POST', '/api/application/servers/{server_id}/unsuspend', status=500, count=2)
+        job = await run_job(db, queue, 2002)
+
+        counts = db.count_warm_servers()['minecraft']
+        ok = (
+            job['status'] == 'done'
+            and len(panel.servers) == 2
+            and counts == {'ready': 1, 'assigned': 1}
+            and not any(server['suspended'] for server in panel.servers.values()
+                        if server['identifier'] == job['server_identifier'])
+        )
+        print(f"   Статус заявки: {job['status']}, пул: {counts}")
+        print(f"{'✅' if ok else '❌'} Повтор не занял второй сервер пула")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def test_empty_pool():
+    """Пустой пул: сервер создается обычным способом"""
+    print("\n🔍 Пустой пул...")
+
+    panel = MockPanel()
+    url = await panel.start()
+    try:
+        db, _, queue = await setup(panel, url, size=1)
+        job = await run_job(db, queue, 2003)
+
+        ok = job['status'] == 'done' and len(panel.servers) == 1
+        print(f"   Статус заявки: {job['status']}, серверов в панели: {len(panel.servers)}")
+        print(f"{'✅' if ok else '❌'} Сервер создан без пула")
+        return ok
+    finally:
+        await panel.stop()
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование пула серверов...\n")
+
+    results = {
+        "Пополнение": await test_replenish(),
+        "Выдача": await test_claim(),
+        "Повтор выдачи": await test_claim_retry(),
+        "Пустой пул": await test_empty_pool(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
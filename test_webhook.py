@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Тест приема обновлений через webhook: локальный клиент Telegram отправляет
+обновления на встроенный сервер, ответы бота уходят в имитацию Bot API
+"""
+
+import asyncio
+import time
+import aiohttp
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application, CommandHandler
+from webhook_server import SECRET_HEADER, WebhookServer
+
+TOKEN = "123:test"
+SECRET = "webhook-secret"
+
+
+class FakeTelegramAPI:
+    """Имитация Bot API: отвечает на getMe и запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.messages = []
+        self._runner = None
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post(f"/bot{TOKEN}/{{method}}", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        return f"http://127.0.0.1:{self._runner.addresses[0][1]}/bot"
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        data = dict(await request.post())
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': "Test", 'username': "test_bot"}
+        elif method == 'sendMessage':
+            self.messages.append((int(data['chat_id']), data['text']))
+            result = {'message_id': len(self.messages), 'date': int(time.time()), 'text': data['text'],
+                      'chat': {'id': int(data['chat_id']), 'type': 'private'}}
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+
+def start_update(update_id: int, user_id: int) -> dict:
+    """Обновление с командой /start от пользователя"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': "User"}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': int(time.time()), 'text': "/start",
+            'from': user, 'chat': {'id': user_id, 'type': 'private'},
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }
+
+
+async def setup():
+    """Приложение с обработчиком /start, webhook сервер и имитация Bot API"""
+    telegram_api = FakeTelegramAPI()
+    base_url = await telegram_api.start()
+    application = Application.builder().token(TOKEN).base_url(base_url).build()
+
+    async def handle_start(update: Update, context) -> None:
+        await update.message.reply_text(f"Привет, {update.effective_user.id}")
+
+    application.add_handler(CommandHandler("start", handle_start))
+    await application.initialize()
+    await application.start()
+    server = WebhookServer(application, "/telegram", SECRET, render_metrics=lambda: "bot_up 1\n")
+    url = await server.start('127.0.0.1', 0, health_port=0)
+    return telegram_api, application, server, url
+
+
+async def teardown(telegram_api, application, server):
+    await server.stop()
+    await application.stop()
+    await application.shutdown()
+    await telegram_api.stop()
+
+
+async def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def test_updates():
+    """Обновления с верным секретом доходят до обработчиков"""
+    print("🔍 Прием обновлений...")
+    telegram_api, application, server, url = await setup()
+    try:
+        async with aiohttp.ClientSession() as session:
+            statuses = []
+            for update_id in range(1, 21):
+                async with session.post(f"{url}/telegram", json=start_update(update_id, 7000 + update_id),
+                                        headers={SECRET_HEADER: SECRET}) as response:
+                    statuses.append(response.status)
+        delivered = await wait_for(lambda: len(telegram_api.messages) == 20)
+
+        ok = (
+            statuses == [200] * 20 and delivered
+            and sorted(chat_id for chat_id, _ in telegram_api.messages) == list(range(7001, 7021))
+            and server.received == 20
+        )
+        print(f"   Принято: {server.received}, ответов бота: {len(telegram_api.messages)}")
+        print(f"{'✅' if ok else '❌'} Обновления обработаны")
+        return ok
+    finally:
+        await teardown(telegram_api, application, server)
+
+
+async def test_secret():
+    """Запросы без секрета или с неверным секретом отклоняются"""
+    print("\n🔍 Проверка секрета...")
+    telegram_api, application, server, url = await setup()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{url}/telegram", json=start_update(1, 7100)) as response:
+                missing = response.status
+            async with session.post(f"{url}/telegram", json=start_update(2, 7100),
+                                    headers={SECRET_HEADER: "wrong"}) as response:
+                wrong = response.status
+            async with session.post(f"{url}/telegram", data="not json",
+                                    headers={SECRET_HEADER: SECRET}) as response:
+                malformed = response.status
+        await asyncio.sleep(0.1)
+
+        ok = missing == 403 and wrong == 403 and malformed == 400 and not telegram_api.messages
+        print(f"   Без секрета: {missing}, неверный: {wrong}, не JSON: {malformed}")
+        print(f"{'✅' if ok else '❌'} Чужие запросы отклонены")
+        return ok
+    finally:
+        await teardown(telegram_api, application, server)
+
+
+async def test_health():
+    """Health и метрики доступны на служебном адресе, но не на публичном"""
+    print("\n🔍 Health и метрики...")
+    telegram_api, application, server, url = await setup()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{server.health_url}/health") as response:
+                running = (response.status, await response.json())
+            async with session.get(f"{server.health_url}/metrics") as response:
+                metrics = await response.text()
+            public = []
+            for path in ("/health", "/metrics"):
+                async with session.get(f"{url}{path}") as response:
+                    public.append(response.status)
+            await application.stop()
+            async with session.get(f"{server.health_url}/health") as response:
+                stopped = response.status
+            await application.start()
+
+        ok = (
+            running[0] == 200 and running[1]['status'] == 'ok' and "bot_up 1" in metrics and stopped == 503
+            and server.health_url != url and public == [404, 404]
+        )
+        print(f"   Работает: {running[0]}, остановлено: {stopped}, на публичном адресе: {public}")
+        print(f"{'✅' if ok else '❌'} Health отражает состояние")
+        return ok
+    finally:
+        await teardown(telegram_api, application, server)
+
+
+async def main():
+    """Основная функция тестирования"""
+    print("🧪 Тестирование webhook...\n")
+
+    results = {
+        "Прием обновлений": await test_updates(),
+        "Секрет": await test_secret(),
+        "Health": await test_health(),
+    }
+
+    print("\n📊 Результаты тестирования:")
+    for name, ok in results.items():
+        print(f"   {name}: {'✅ OK' if ok else '❌ Ошибка'}")
+
+    if all(results.values()):
+        print("\n🎉 Все тесты пройдены!")
+    else:
+        print("\n⚠️ Есть проблемы.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Время жизни записи: секунды или функция от сохраняемого значения
+TTL = Union[float, Callable[[Any], float]]
+
+
+class TTLCache:
+    """Асинхронный TTL-кэш с объединением параллельных запросов (single-flight)
+
+    Параллельные запросы одного ключа разделяют один вызов загрузчика.
+    При stale_ttl > 0 просроченное значение еще stale_ttl секунд отдается
+    сразу, а обновление выполняется в фоне.
+
+    Вместо числа ttl можно передать функцию от значения, например, чтобы
+    отрицательные результаты хранились меньше положительных.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, max_size: int = 1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        # key -> (время сохранения, ttl записи, значение)
+        self._entries: Dict[Hashable, Tuple[float, float, Any]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        # Счетчики попаданий
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Получить свежее значение без загрузки"""
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[0] < entry[1]:
+            self.hits += 1
+            return entry[2]
+        return None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[TTL] = None) -> None:
+        """Сохранить значение в кэше"""
+        if ttl is None:
+            ttl = self.ttl
+        elif callable(ttl):
+            ttl = ttl(value)
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic(), ttl, value)
+        while len(self._entries) > self.max_size:
+            # Словарь упорядочен по времени вставки - удаляем самую старую запись
+            self._entries.pop(next(iter(self._entries)))
+
+    def invalidate(self, key: Hashable) -> None:
+        """Сбросить значение и незавершенную загрузку для ключа"""
+        self._entries.pop(key, None)
+        # Результат уже запущенной загрузки не попадет в кэш
+        self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        self._entries.clear()
+        self._inflight.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          ttl: Optional[TTL] = None) -> Any:
+        """Получить значение из кэша или загрузить его
+
+        Результат None не кэшируется.
+        """
+        entry = self._entries.get(key)
+        if entry:
+            stored_at, entry_ttl, value = entry
+            age = time.monotonic() - stored_at
+            if age < entry_ttl:
+                self.hits += 1
+                return value
+            if age < entry_ttl + self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    task = asyncio.create_task(self._revalidate(key, loader, ttl))
+                    self._background.add(task)
+                    task.add_done_callback(self._background.discard)
+                return value
+            del self._entries[key]
+
+        inflight = self._inflight.get(key)
+        if inflight:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        return await self._load(key, loader, ttl)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                    ttl: Optional[TTL]) -> Any:
+        """Выполнить загрузку, разделяя результат с ожидающими запросами"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Помечаем исключение как полученное, если ожидающих нет
+                future.exception()
+            raise
+
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+            if value is not None:
+                self.set(key, value, ttl)
+        future.set_result(value)
+        return value
+
+    async def _revalidate(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          ttl: Optional[TTL]) -> None:
+        """Фоновое обновление устаревшего значения"""
+        try:
+            await self._load(key, loader, ttl)
+        except Exception as e:
+            logger.warning(f"Ошибка фонового обновления кэша для {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика попаданий в кэш"""
+        requests = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'size': len(self._entries),
+            'hit_rate': (self.hits + self.stale_hits + self.coalesced) / requests if requests else 0.0
+        }
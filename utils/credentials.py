@@ -50,6 +50,15 @@ class CredentialGenerator:
             'telegram_id': str(telegram_id)
         }
     
+    @staticmethod
+    def generate_external_id(telegram_id: int) -> str:
+        """Детерминированный external_id пользователя и сервера в панели
+        
+        Один и тот же для всех повторов создания сервера, поэтому повтор
+        после таймаута находит уже созданные объекты, а не дублирует их.
+        """
+        return f"tg-{telegram_id}"
+    
     @staticmethod
     def hash_password(password: str) -> str:
         """Хеширует пароль для безопасного хранения"""
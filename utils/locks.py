@@ -0,0 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable
+
+
+class _Entry:
+    """Блокировка ключа и число задач, которые ее держат или ждут"""
+
+    __slots__ = ('lock', 'holders')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.holders = 0
+
+
+class KeyedLock:
+    """Набор asyncio.Lock по ключу (например, по пользователю)
+
+    Задачи с одним ключом выполняются по очереди в порядке ожидания,
+    с разными - независимо. Блокировка удаляется, как только ее никто
+    не держит и не ждет, так что словарь не растет с числом ключей.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def locked(self, key: Hashable) -> bool:
+        """Держит ли кто-то блокировку ключа"""
+        entry = self._entries.get(key)
+        return bool(entry and entry.lock.locked())
+
+    @asynccontextmanager
+    async def __call__(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        entry.holders += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.holders -= 1
+            if not entry.holders:
+                del self._entries[key]
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+from telegram import Bot, CallbackQuery, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest
+from utils.locks import KeyedLock
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(text: str, reply_markup: Optional[InlineKeyboardMarkup] = None,
+                parse_mode: Optional[str] = None) -> bytes:
+    """Хэш отображаемого содержимого сообщения: текста, разметки и клавиатуры"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update((parse_mode or '').encode())
+    digest.update(b'\0')
+    digest.update(text.encode())
+    digest.update(b'\0')
+    if reply_markup:
+        digest.update(json.dumps(reply_markup.to_dict(), sort_keys=True, ensure_ascii=False).encode())
+    return digest.digest()
+
+
+class MessageEditor:
+    """Редактирование сообщений без лишних запросов к Telegram
+
+    Для каждого сообщения (chat_id, message_id) запоминается хэш последнего
+    показанного содержимого (не больше max_size сообщений, давно не
+    изменявшиеся вытесняются); правка с тем же содержимым не отправляется.
+    Если сообщения могут меняться в обход редактора (несколько экземпляров
+    бота), trust_ttl > 0 ограничивает срок доверия хэшу: позже правка уходит в
+    Telegram, а ответ "message is not modified" считается пропуском.
+    Правки хода выполнения (progress=True) отправляются не чаще раза в
+    min_interval: промежуточные заменяются последней, которая уйдет по
+    окончании интервала, если ее не опередит обычная правка. Правки одного
+    сообщения отправляются по очереди, чтобы устаревший текст не затер новый.
+    """
+
+    def __init__(self, max_size: int = 10000, min_interval: float = 1.0, trust_ttl: float = 0.0):
+        self.max_size = max_size
+        self.min_interval = min_interval
+        self.trust_ttl = trust_ttl
+        # (chat_id, message_id) -> (хэш содержимого, время последней отправленной правки, время хэша)
+        self._rendered: "OrderedDict[Hashable, Tuple[bytes, float, float]]" = OrderedDict()
+        # (chat_id, message_id) -> (таймер отложенной правки, аргументы _send)
+        self._pending: Dict[Hashable, Tuple[asyncio.Task, tuple]] = {}
+        self._locks = KeyedLock()
+        self.sent = 0
+        self.skipped = 0
+        self.debounced = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Отправлено правок, пропущено без изменений, объединено правок хода выполнения"""
+        return {'sent': self.sent, 'skipped': self.skipped, 'debounced': self.debounced,
+                'tracked': len(self._rendered)}
+
+    def remember(self, chat_id: int, message_id: int, text: str,
+                 reply_markup: Optional[InlineKeyboardMarkup] = None, parse_mode: Optional[str] = None) -> None:
+        """Запомнить содержимое отправленного сообщения"""
+        self._store((chat_id, message_id), fingerprint(text, reply_markup, parse_mode), 0.0)
+
+    def _store(self, key: Hashable, digest: bytes, edited_at: float) -> None:
+        self._rendered[key] = (digest, edited_at, time.monotonic())
+        self._rendered.move_to_end(key)
+        while len(self._rendered) > self.max_size:
+            self._rendered.popitem(last=False)
+
+    async def edit_query(self, query: CallbackQuery, text: str,
+                         reply_markup: Optional[InlineKeyboardMarkup] = None,
+                         parse_mode: Optional[str] = None, progress: bool = False) -> bool:
+        """Изменить сообщение, к которому привязана кнопка"""
+        if not query.message:
+            # Сообщение inline-режима: идентификатора чата нет, отправляем как есть
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+            return True
+        return await self.edit_text(query.get_bot(), query.message.chat_id, query.message.message_id,
+                                    text, reply_markup, parse_mode, progress)
+
+    async def edit_message(self, message: Message, text: str,
+                           reply_markup: Optional[InlineKeyboardMarkup] = None,
+                           parse_mode: Optional[str] = None, progress: bool = False) -> bool:
+        """Изменить отправленное ботом сообщение"""
+        return await self.edit_text(message.get_bot(), message.chat_id, message.message_id,
+                                    text, reply_markup, parse_mode, progress)
+
+    async def edit_text(self, bot: Bot, chat_id: int, message_id: int, text: str,
+                        reply_markup: Optional[InlineKeyboardMarkup] = None,
+                        parse_mode: Optional[str] = None, progress: bool = False) -> bool:
+        """Изменить сообщение, вернуть True, если правка отправлена сейчас"""
+        key = (chat_id, message_id)
+        digest = fingerprint(text, reply_markup, parse_mode)
+        pending = self._pending.pop(key, None)
+        if pending:
+            # Новая правка заменяет отложенную
+            pending[0].cancel()
+            self.debounced += 1
+
+        rendered = self._rendered.get(key)
+        if self._shown(rendered, digest) and not self._locks.locked(key):
+            self.skipped += 1
+            return False
+
+        if progress and rendered:
+            wait = rendered[1] + self.min_interval - time.monotonic()
+            if wait > 0:
+                args = (bot, key, digest, text, reply_markup, parse_mode)
+                self._pending[key] = (asyncio.create_task(self._send_later(wait, *args)), args)
+                return False
+
+        return await self._send(bot, key, digest, text, reply_markup, parse_mode)
+
+    def _shown(self, rendered: Optional[Tuple[bytes, float, float]], digest: bytes) -> bool:
+        """Содержимое уже показано и хэш еще не устарел"""
+        if not rendered or rendered[0] != digest:
+            return False
+        return not self.trust_ttl or time.monotonic() - rendered[2] < self.trust_ttl
+
+    async def close(self) -> None:
+        """Отправить отложенные правки хода выполнения сразу, не дожидаясь интервала"""
+        pending, self._pending = self._pending, {}
+        for task, _ in pending.values():
+            task.cancel()
+        results = await asyncio.gather(*(self._send(*args) for _, args in pending.values()),
+                                       return_exceptions=True)
+        for key, result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Не удалось обновить сообщение {key}: {result}")
+
+    async def _send_later(self, delay: float, bot: Bot, key: Hashable, digest: bytes, text: str,
+                          reply_markup: Optional[InlineKeyboardMarkup], parse_mode: Optional[str]) -> None:
+        await asyncio.sleep(delay)
+        # С этого момента правку уже нельзя отменить - она отправляется
+        self._pending.pop(key, None)
+        try:
+            await self._send(bot, key, digest, text, reply_markup, parse_mode)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить сообщение {key}: {e}")
+
+    async def _send(self, bot: Bot, key: Hashable, digest: bytes, text: str,
+                    reply_markup: Optional[InlineKeyboardMarkup], parse_mode: Optional[str]) -> bool:
+        async with self._locks(key):
+            if self._shown(self._rendered.get(key), digest):
+                self.skipped += 1
+                return False
+            chat_id, message_id = key
+            try:
+                await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id,
+                                            reply_markup=reply_markup, parse_mode=parse_mode)
+            except BadRequest as e:
+                if 'not modified' not in str(e).lower():
+                    raise
+                # Содержимое уже такое (сообщение изменено не через редактор)
+                self._store(key, digest, time.monotonic())
+                self.skipped += 1
+                return False
+            self._store(key, digest, time.monotonic())
+            self.sent += 1
+            return True
@@ -0,0 +1,180 @@
+import bisect
+import time
+from typing import Dict, Any, List, Tuple
+from urllib.parse import unquote
+import aiohttp
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Сегменты пути, за которыми следует идентификатор
+ID_PARENTS = {
+    'users': '{user}', 'servers': '{server}', 'nests': '{nest}', 'eggs': '{egg}',
+    'nodes': '{node}', 'external': '{external_id}', 'allocations': '{allocation}',
+}
+# Сегменты, которые не являются идентификаторами, даже если идут после ID_PARENTS
+LITERAL_SEGMENTS = {'external'}
+
+
+def endpoint_template(path: str) -> str:
+    """Шаблон эндпоинта вместо конкретного URL: /api/application/servers/{server}"""
+    segments = unquote(path).strip('/').split('/')
+    template = []
+    for index, segment in enumerate(segments):
+        previous = segments[index - 1] if index else None
+        if previous in ID_PARENTS and segment not in LITERAL_SEGMENTS:
+            template.append(ID_PARENTS[previous])
+        else:
+            template.append(segment)
+    return '/' + '/'.join(template)
+
+
+class Histogram:
+    """Гистограмма задержек с фиксированными корзинами"""
+
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else float('inf')
+        return float('inf')
+
+
+class EndpointMetrics:
+    """Метрики одного эндпоинта"""
+
+    __slots__ = ('latency', 'statuses', 'request_bytes', 'response_bytes')
+
+    def __init__(self):
+        self.latency = Histogram()
+        # Код ответа (или тип исключения) -> количество
+        self.statuses: Dict[str, int] = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    @property
+    def errors(self) -> int:
+        """Сбои панели: 5xx, 429 и исключения (404/422 - штатные ответы)"""
+        return sum(count for status, count in self.statuses.items()
+                   if status == '429' or not status.startswith(('2', '3', '4')))
+
+
+class ApiMetrics:
+    """Метрики запросов к API панели по шаблонам эндпоинтов
+
+    Собираются хуками aiohttp TraceConfig, поэтому не требуют изменений
+    в самих вызовах. Задержка считается до получения заголовков ответа.
+    """
+
+    def __init__(self):
+        self.endpoints: Dict[Tuple[str, str], EndpointMetrics] = {}
+
+    def _endpoint(self, method: str, url) -> EndpointMetrics:
+        key = (method, endpoint_template(url.path))
+        metrics = self.endpoints.get(key)
+        if metrics is None:
+            metrics = self.endpoints[key] = EndpointMetrics()
+        return metrics
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """TraceConfig для aiohttp.ClientSession"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.started_at = time.monotonic()
+
+        async def on_request_end(session, context, params):
+            metrics = self._endpoint(params.method, params.url)
+            metrics.latency.observe(time.monotonic() - context.started_at)
+            status = str(params.response.status)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+        async def on_request_exception(session, context, params):
+            metrics = self._endpoint(params.method, params.url)
+            metrics.latency.observe(time.monotonic() - context.started_at)
+            status = type(params.exception).__name__
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+        async def on_request_chunk_sent(session, context, params):
+            self._endpoint(params.method, params.url).request_bytes += len(params.chunk)
+
+        async def on_response_chunk_received(session, context, params):
+            self._endpoint(params.method, params.url).response_bytes += len(params.chunk)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+        trace_config.on_response_chunk_received.append(on_response_chunk_received)
+        return trace_config
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Сводка по эндпоинтам, самые нагруженные по суммарному времени первыми"""
+        rows = []
+        for (method, template), metrics in self.endpoints.items():
+            latency = metrics.latency
+            rows.append({
+                'method': method,
+                'endpoint': template,
+                'count': latency.count,
+                'errors': metrics.errors,
+                'statuses': dict(metrics.statuses),
+                'total_seconds': latency.total,
+                'avg': latency.total / latency.count if latency.count else 0.0,
+                'p50': latency.quantile(0.5),
+                'p95': latency.quantile(0.95),
+                'p99': latency.quantile(0.99),
+                'request_bytes': metrics.request_bytes,
+                'response_bytes': metrics.response_bytes,
+            })
+        rows.sort(key=lambda row: row['total_seconds'], reverse=True)
+        return rows
+
+    def render_prometheus(self, prefix: str = "pterodactyl_api") -> str:
+        """Метрики в текстовом формате Prometheus"""
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds Panel API request latency",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        for (method, template), metrics in sorted(self.endpoints.items()):
+            labels = f'method="{method}",endpoint="{template}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, metrics.latency.counts):
+                cumulative += count
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics.latency.count}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{{labels}}} {metrics.latency.total:.6f}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{{labels}}} {metrics.latency.count}')
+
+        lines += [f"# HELP {prefix}_responses_total Panel API responses by status",
+                  f"# TYPE {prefix}_responses_total counter"]
+        for (method, template), metrics in sorted(self.endpoints.items()):
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(
+                    f'{prefix}_responses_total{{method="{method}",endpoint="{template}",status="{status}"}} {count}'
+                )
+
+        for direction in ('request', 'response'):
+            lines += [f"# HELP {prefix}_{direction}_bytes_total Panel API {direction} payload bytes",
+                      f"# TYPE {prefix}_{direction}_bytes_total counter"]
+            for (method, template), metrics in sorted(self.endpoints.items()):
+                value = getattr(metrics, f"{direction}_bytes")
+                lines.append(f'{prefix}_{direction}_bytes_total{{method="{method}",endpoint="{template}"}} {value}')
+        return "\n".join(lines) + "\n"
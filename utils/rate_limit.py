@@ -0,0 +1,83 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+
+class AsyncTokenBucket:
+    """Ограничение частоты исходящих запросов: rate токенов в секунду, запас burst
+
+    Ожидающие получают токены по очереди, так что пачка одновременных
+    запросов растягивается во времени, а не упирается в 429 от панели.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        """Дождаться cost токенов"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+
+class KeyedRateLimiter:
+    """Ограничение частоты действий по ключу (пользователю) по алгоритму GCRA
+
+    На ключ хранится одно число - теоретическое время следующего запроса
+    (TAT) по time.monotonic. Действие стоимостью cost сдвигает TAT на
+    cost / rate; разрешено, пока TAT опережает текущее время не больше чем
+    на burst / rate. Ключи лежат в порядке последнего разрешенного действия,
+    поэтому простаивающие (TAT в прошлом - лимит полностью восстановлен)
+    вытесняются с начала словаря за амортизированное O(1).
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.interval = 1.0 / rate
+        self.window = burst * self.interval
+        self.clock = clock
+        self._tat: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> bool:
+        """Засчитать действие, False - лимит превышен (действие не засчитывается)"""
+        now = self.clock()
+        self.evict(now)
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + cost * self.interval
+        # Допуск на погрешность сложения дробных стоимостей
+        if new_tat - now > self.window + 1e-9:
+            return False
+        self._tat[key] = new_tat
+        self._tat.move_to_end(key)
+        return True
+
+    def retry_after(self, key: Hashable, cost: float = 1.0) -> float:
+        """Через сколько секунд действие стоимостью cost будет разрешено"""
+        now = self.clock()
+        tat = max(self._tat.get(key, now), now)
+        return max(0.0, tat + cost * self.interval - self.window - now)
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Удалить простаивающие ключи с начала очереди, вернуть их количество"""
+        now = self.clock() if now is None else now
+        evicted = 0
+        while self._tat:
+            key, tat = next(iter(self._tat.items()))
+            if tat > now:
+                break
+            del self._tat[key]
+            evicted += 1
+        return evicted
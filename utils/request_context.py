@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from telegram.ext import Application, CallbackContext, ExtBot
+from db.database import Database
+from subscription_checker import SubscriptionChecker
+
+
+class RequestContext(CallbackContext[ExtBot, Dict, Dict, Dict]):
+    """Контекст обработки одного обновления с мемоизацией запросов
+
+    PTB создает контекст один раз на обновление и передает его всем
+    обработчикам, поэтому запомненные здесь строка пользователя, его серверы
+    и статус подписки живут ровно до конца обработки обновления. После
+    изменения данных в базе соответствующую запись нужно сбросить через invalidate.
+    """
+
+    def __init__(self, application: Application, chat_id: Optional[int] = None,
+                 user_id: Optional[int] = None):
+        super().__init__(application, chat_id=chat_id, user_id=user_id)
+        self._memo: Dict[Hashable, Any] = {}
+
+    def memoize(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Результат синхронного загрузчика, вычисляемый один раз за обновление"""
+        if key not in self._memo:
+            self._memo[key] = loader()
+        return self._memo[key]
+
+    async def memoize_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Результат асинхронного загрузчика; параллельные вызовы ждут один запрос"""
+        future = self._memo.get(key)
+        if future is None:
+            future = self._memo[key] = asyncio.ensure_future(loader())
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # Ошибку не запоминаем: повторный вызов выполнит запрос снова
+            if self._memo.get(key) is future:
+                del self._memo[key]
+            raise
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Сбросить запомненные значения"""
+        for key in keys:
+            self._memo.pop(key, None)
+
+    def get_user(self, db: Database, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Строка пользователя из базы"""
+        return self.memoize(('user', telegram_id), lambda: db.get_user(telegram_id))
+
+    def get_user_servers(self, db: Database, telegram_id: int) -> List[Dict[str, Any]]:
+        """Серверы пользователя из базы"""
+        return self.memoize(('servers', telegram_id), lambda: db.get_user_servers(telegram_id))
+
+    async def check_subscription(self, subscription_checker: SubscriptionChecker,
+                                 telegram_id: int) -> Dict[str, Any]:
+        """Статус подписки пользователя на канал"""
+        return await self.memoize_async(
+            ('subscription', telegram_id), lambda: subscription_checker.check_subscription(telegram_id)
+        )
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, Hashable, List, Optional, Union
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from utils.rate_limit import AsyncTokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Полоса для запросов без отправки сообщений (getChat, getChatMember, answerCallbackQuery...)
+LOOKUP_LANE = 'lookup'
+
+# Лимиты Telegram: ~30 сообщений в секунду всего, 1 в секунду в личный чат, 20 в минуту в группу
+OVERALL_RATE = 30.0
+PRIVATE_CHAT_RATE = 1.0
+GROUP_CHAT_RATE = 20 / 60
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """Пауза из RetryAfter в секундах (PTB отдает int или timedelta)"""
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class FloodControlLimiter(BaseRateLimiter[int]):
+    """Планировщик исходящих запросов бота с учетом flood control Telegram
+
+    Сообщения (send*, edit*, delete*...) проходят через общий лимит и лимит
+    своего чата, запросы без отправки сообщений - через отдельную полосу
+    lookup. RetryAfter приостанавливает только полосу запроса (чат или
+    lookup), после паузы запрос повторяется - пользовательский сценарий
+    не получает ошибку, пока не исчерпаны max_retries.
+    rate_limit_args запроса переопределяет max_retries.
+    """
+
+    def __init__(self, overall_rate: float = OVERALL_RATE, private_rate: float = PRIVATE_CHAT_RATE,
+                 group_rate: float = GROUP_CHAT_RATE, lookup_rate: float = 20.0,
+                 max_retries: int = 3, max_chats: int = 10000):
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.overall = AsyncTokenBucket(overall_rate)
+        # Лимит полосы lookup (0 - без ограничения)
+        self.lookup = AsyncTokenBucket(lookup_rate) if lookup_rate > 0 else None
+        # Лимиты чатов; давно не писавшие чаты вытесняются - их корзина все равно полная
+        self._chats: "OrderedDict[Hashable, AsyncTokenBucket]" = OrderedDict()
+        # Полоса -> время (monotonic), до которого она приостановлена после RetryAfter
+        self._paused_until: Dict[Hashable, float] = {}
+        self.retries = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> AsyncTokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Отрицательные ID и @username - группы и каналы
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.private_rate
+            # Ответ на действие пользователя не ждет: запас на короткую серию сообщений
+            bucket = self._chats[chat_id] = AsyncTokenBucket(rate, burst=1.0 if is_group else 3.0)
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    @staticmethod
+    def _lane(endpoint: str, data: Dict[str, Any]) -> Hashable:
+        """Полоса запроса: чат сообщения или lookup"""
+        chat_id = data.get('chat_id')
+        if chat_id is None or endpoint.startswith('get') or endpoint.startswith('answer'):
+            return LOOKUP_LANE
+        return chat_id
+
+    async def _wait_lane(self, lane: Hashable) -> None:
+        """Дождаться окончания паузы полосы"""
+        while True:
+            delay = self._paused_until.get(lane, 0.0) - time.monotonic()
+            if delay <= 0:
+                self._paused_until.pop(lane, None)
+                return
+            await asyncio.sleep(delay)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        lane = self._lane(endpoint, data)
+        max_retries = rate_limit_args if rate_limit_args is not None else self.max_retries
+        attempt = 0
+        while True:
+            await self._wait_lane(lane)
+            if lane == LOOKUP_LANE:
+                if self.lookup:
+                    await self.lookup.acquire()
+            else:
+                await self._chat_bucket(lane).acquire()
+                await self.overall.acquire()
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                delay = retry_after_seconds(e)
+                self._paused_until[lane] = max(self._paused_until.get(lane, 0.0), time.monotonic() + delay)
+                logger.warning(f"Flood control {endpoint} (полоса {lane}): пауза {delay:.1f} с, "
+                               f"попытка {attempt}/{max_retries}")
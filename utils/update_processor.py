@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Dict, Hashable, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from utils.locks import KeyedLock
+
+# Базовый семафор PTB захватывается до do_process_update; если бы он ограничивал
+# обработку, обновления, ждущие своей очереди у пользователя, занимали бы слоты
+_UNBOUNDED = 2 ** 30
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Обработка обновлений: по порядку для одного пользователя, параллельно для разных
+
+    Application создает задачу на каждое обновление в порядке получения;
+    задачи одного пользователя выстраиваются в очередь на его блокировке
+    (asyncio.Lock отдает ее в порядке ожидания). Одновременно выполняется
+    не больше max_concurrent_updates обработчиков - слот занимается уже
+    после получения блокировки, поэтому очередь одного пользователя не
+    задерживает остальных. Блокировка удаляется, как только у пользователя
+    не остается обновлений в обработке.
+    """
+
+    def __init__(self, max_concurrent_updates: int = 64):
+        super().__init__(_UNBOUNDED)
+        self.limit = max_concurrent_updates
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks = KeyedLock()
+        self.processed = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @staticmethod
+    def _key(update: object) -> Optional[Hashable]:
+        """Пользователь (или чат), в порядке которого обрабатываются обновления"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            self.processed += 1
+            return
+
+        async with self._locks(key):
+            async with self._running:
+                await coroutine
+        self.processed += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Обработано обновлений, пользователей с обновлениями в работе"""
+        return {'processed': self.processed, 'active_users': len(self._locks)}
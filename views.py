@@ -0,0 +1,303 @@
+import html
+from functools import lru_cache
+from string import Formatter
+from typing import Any, List, Optional, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Экраны бота: клавиатуры создаются один раз при импорте и используются всеми
+# обработчиками (объекты PTB после создания неизменяемы), тексты с данными
+# пользователя собираются по шаблонам с экранированием HTML.
+
+
+class Html(str):
+    """Готовый HTML-фрагмент: подставляется в шаблон без экранирования"""
+
+
+class Template:
+    """HTML-шаблон с полями {имя}, разобранный один раз
+
+    Значения полей экранируются (кроме Html), поэтому имя пользователя,
+    email или причина блокировки не ломают разметку сообщения.
+    """
+
+    __slots__ = ('source', '_parts')
+
+    def __init__(self, source: str):
+        self.source = source
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if spec or conversion:
+                raise ValueError(f"Формат поля {field} задается при подстановке, а не в шаблоне")
+            self._parts.append((literal, field))
+
+    def render(self, **fields: Any) -> Html:
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                value = fields[field]
+                out.append(value if isinstance(value, Html) else html.escape(str(value), quote=False))
+        return Html(''.join(out))
+
+
+def keyboard(*rows: Tuple[str, str]) -> InlineKeyboardMarkup:
+    """Клавиатура из кнопок (текст, callback_data), по одной в ряд"""
+    return InlineKeyboardMarkup([[InlineKeyboardButton(text, callback_data=data)] for text, data in rows])
+
+
+# Кнопки
+SET_EMAIL = ("📧 Указать email", "set_email")
+SET_OTHER_EMAIL = ("📧 Указать другой email", "set_email")
+GET_SERVER = ("🖥️ Получить сервер", "get_server")
+MY_SERVER = ("📊 Мой сервер", "my_servers")
+MY_SERVERS = ("📊 Мои серверы", "my_servers")
+HELP = ("ℹ️ Помощь", "help")
+CHECK_AGAIN = ("🔄 Проверить снова", "check_subscription")
+BACK = ("🔙 Назад", "back_to_start")
+ADMIN_BACK = ("🔙 Назад", "admin_panel")
+
+# Клавиатуры
+BACK_KEYBOARD = keyboard(BACK)
+MAIN_MENU_KEYBOARD = keyboard(SET_EMAIL, GET_SERVER, MY_SERVER, HELP)
+WELCOME_KEYBOARD = keyboard(SET_EMAIL, GET_SERVER, MY_SERVER, HELP, BACK)
+GET_SERVER_KEYBOARD = keyboard(GET_SERVER, BACK)
+MY_SERVER_KEYBOARD = keyboard(MY_SERVER, BACK)
+SET_EMAIL_KEYBOARD = keyboard(SET_EMAIL, BACK)
+RETRY_EMAIL_KEYBOARD = keyboard(SET_OTHER_EMAIL, BACK)
+SUBSCRIPTION_KEYBOARD = keyboard(GET_SERVER, SET_EMAIL, MY_SERVERS, CHECK_AGAIN, BACK)
+CHECK_READY_KEYBOARD = keyboard(GET_SERVER, SET_EMAIL, MY_SERVER, CHECK_AGAIN, BACK)
+ADMIN_PANEL_KEYBOARD = keyboard(
+    ("📊 Статистика", "admin_stats"),
+    ("👥 Управление пользователями", "admin_users"),
+    ("🖥️ Управление серверами", "admin_servers"),
+    ("📝 Логи действий", "admin_logs"),
+)
+ADMIN_BACK_KEYBOARD = keyboard(ADMIN_BACK)
+
+_CHECK_ROWS = CHECK_READY_KEYBOARD.inline_keyboard[1:]
+
+
+@lru_cache(maxsize=64)
+def subscribe_keyboard(channels: Tuple[str, ...]) -> InlineKeyboardMarkup:
+    """Клавиатура /check с кнопкой на каждый канал без подписки (наборов каналов немного)"""
+    rows = []
+    for channel in channels:
+        title = "📢 Подписаться на канал" if len(channels) == 1 else f"📢 Подписаться на @{channel}"
+        rows.append((InlineKeyboardButton(title, url=f"https://t.me/{channel}"),))
+    return InlineKeyboardMarkup(tuple(rows) + _CHECK_ROWS)
+
+
+# Общие тексты
+SPAM_TEXT = "⚠️ Слишком много запросов. Подождите немного."
+ACCESS_DENIED_TEXT = "❌ Доступ запрещен"
+ADMIN_UNAVAILABLE_TEXT = "❌ Админские функции недоступны"
+
+BANNED = Template(
+    "🚫 <b>Вы заблокированы!</b>\n\n"
+    "Причина: {reason}\n\n"
+    "Обратитесь к администратору для разблокировки."
+)
+
+WELCOME = Template(
+    "👋 <b>Привет, {first_name}!</b>\n\n"
+    "Добро пожаловать в бот для получения игровых серверов.\n\n"
+    "{subscription}\n\n"
+    "Выберите действие:"
+)
+MAIN_MENU = Template(
+    "👋 <b>Главное меню</b>\n\n"
+    "{subscription}\n\n"
+    "Выберите действие:"
+)
+
+HELP_TEXT = (
+    "ℹ️ <b>Помощь</b>\n\n"
+    "<b>Команды:</b>\n"
+    "/start - Главное меню\n"
+    "/check - Проверить подписку\n"
+    "/help - Эта справка\n\n"
+    "<b>Как получить сервер:</b>\n"
+    "1. Подпишитесь на наш канал\n"
+    "2. Подождите минимум 10 минут\n"
+    "3. Укажите ваш email\n"
+    "4. Получите сервер\n\n"
+    "<b>Поддержка:</b>\n"
+    "По всем вопросам обращайтесь к администратору."
+)
+
+# Проверка подписки (/check)
+CHECK_STATUS = Template("{title}\n\n{channels}\n{footer}")
+CHECK_READY_TITLE = Html("✅ <b>Подписка активна!</b>")
+CHECK_WAITING_TITLE = Html("⏳ <b>Подписка активна, но недостаточно времени!</b>")
+CHECK_READY_FOOTER = "Вы можете получить сервер!"
+CHECK_WAITING_FOOTER = "Попробуйте позже."
+
+# Email
+SET_EMAIL_TEXT = (
+    "📧 <b>Укажите ваш email:</b>\n\n"
+    "Отправьте ваш email в следующем сообщении.\n"
+    "Он будет использован для входа в панель управления сервером.\n\n"
+    "Пример: user@example.com"
+)
+INVALID_EMAIL_TEXT = (
+    "❌ <b>Неверный формат email!</b>\n\n"
+    "Пожалуйста, укажите корректный email адрес.\n"
+    "Пример: user@example.com"
+)
+EMAIL_TAKEN = Template(
+    "🚫 <b>Вы заблокированы!</b>\n\n"
+    "Причина: Попытка использования email, который уже зарегистрирован.\n"
+    "Email: {email}\n\n"
+    "Для разблокировки обратитесь к администратору."
+)
+EMAIL_ERROR_TEXT = (
+    "❌ <b>Ошибка!</b>\n\n"
+    "Произошла ошибка при обработке вашего запроса.\n"
+    "Пожалуйста, обратитесь к администратору."
+)
+EMAIL_SAVED = Template(
+    "✅ <b>Email успешно сохранен!</b>\n\n"
+    "Ваш email: {email}\n\n"
+    "Теперь вы можете получить сервер."
+)
+EMAIL_SAVE_FAILED_TEXT = (
+    "❌ <b>Ошибка сохранения email!</b>\n\n"
+    "Пожалуйста, попробуйте позже или обратитесь к администратору."
+)
+USER_NOT_FOUND_TEXT = "❌ <b>Пользователь не найден!</b>"
+EMAIL_SET = Template(
+    "✅ <b>Email указан:</b> {email}\n\n"
+    "Вы можете получить сервер!"
+)
+EMAIL_NOT_SET_TEXT = (
+    "📧 <b>Email не указан!</b>\n\n"
+    "Для получения сервера необходимо указать email.\n"
+    "Отправьте ваш email в следующем сообщении."
+)
+
+# Получение сервера
+SERVICE_UNAVAILABLE_TEXT = (
+    "❌ <b>Сервис создания серверов недоступен!</b>\n\n"
+    "Код ошибки: PT_API_UNAVAILABLE\n"
+    "Обратитесь к администратору."
+)
+SERVER_EXISTS = Template(
+    "❌ <b>У вас уже есть сервер!</b>\n\n"
+    "Количество серверов: {count}\n"
+    "Один пользователь может иметь только один сервер."
+)
+EMAIL_REQUIRED_TEXT = (
+    "📧 <b>Сначала укажите email!</b>\n\n"
+    "Для получения сервера необходимо указать email.\n"
+    "Используйте кнопку '📧 Указать email'"
+)
+JOB_ACCEPTED = Template(
+    "⏳ <b>Заявка на сервер принята!</b>\n\n"
+    "Позиция в очереди: {position}\n"
+    "Сообщение обновится, когда сервер будет готов."
+)
+JOB_CREATE_FAILED_TEXT = (
+    "❌ <b>Ошибка при создании заявки!</b>\n\n"
+    "Код ошибки: DB_JOB_CREATE\n"
+    "Обратитесь к администратору."
+)
+ACTIVE_JOB = Template(
+    "{progress}\n\n"
+    "Заявка уже создана: ход и данные сервера будут показаны и в этом сообщении."
+)
+
+# Ход и итог заявки (сообщения обновляют воркеры очереди)
+JOB_QUEUED = Template(
+    "⏳ <b>Заявка на сервер в очереди</b>\n\n"
+    "Позиция в очереди: {position}\n"
+    "Пожалуйста, подождите."
+)
+JOB_PROGRESS = Template(
+    "⏳ <b>Создаем сервер... (попытка {attempt})</b>\n\n"
+    "Этап {number}/{total}: {title}\n"
+    "Пожалуйста, подождите."
+)
+SERVER_CREDENTIALS = Template(
+    "Server ID: {server_id}\n"
+    "Username: {username}\n"
+    "Password: {password}\n"
+    "Email: {email}\n\n"
+    "Данные для входа в панель управления."
+)
+SERVER_CREATED = Template("✅ <b>Сервер создан успешно!</b>\n\n{credentials}")
+SERVER_GRANTED = Template("🎉 <b>Вам выдан сервер!</b>\n\n{credentials}")
+SERVER_GIVEN = Template(
+    "✅ <b>Сервер выдан!</b>\n\n"
+    "Пользователь: {first_name} (@{username})\n"
+    "Server ID: {server_id}\n"
+    "Username: {panel_username}\n"
+    "Email: {email}\n\n"
+    "Данные отправлены пользователю."
+)
+JOB_FAILED = Template(
+    "❌ <b>Ошибка при создании сервера!</b>\n\n"
+    "Код ошибки: {code}\n"
+    "{message}\n"
+    "Обратитесь к администратору."
+)
+
+# Серверы пользователя
+NO_SERVERS_TEXT = (
+    "📊 <b>У вас нет серверов</b>\n\n"
+    "Используйте кнопку '🖥️ Получить сервер' для создания сервера."
+)
+SERVERS_HEADER = "📊 <b>Ваши серверы:</b>\n\n"
+SERVER_ITEM = Template(
+    "<b>Сервер {number}:</b>\n"
+    "ID: {server_id}\n"
+    "Название: {name}\n"
+    "Username: {username}\n"
+    "Email: {email}\n"
+    "Статус: {status}\n"
+    "Создан: {created_at}\n\n"
+)
+
+# Панель администратора
+ADMIN_PANEL_TEXT = (
+    "🔧 <b>Панель администратора</b>\n\n"
+    "Выберите действие:"
+)
+ADMIN_USERS_TEXT = (
+    "👥 <b>Управление пользователями</b>\n\n"
+    "Команды:\n"
+    "/ban &lt;user_id&gt; [причина] - Забанить пользователя\n"
+    "/unban &lt;user_id&gt; - Разбанить пользователя"
+)
+ADMIN_SERVERS_TEXT = (
+    "🖥️ <b>Управление серверами</b>\n\n"
+    "Команды:\n"
+    "/giveserver &lt;user_id&gt; [профиль] - Выдать сервер\n"
+    "/deleteserver &lt;user_id&gt; - Удалить сервер\n"
+    "/power &lt;start|stop|restart|kill&gt; &lt;node:N|profile:имя|all&gt; - Питание серверов\n"
+    "/apimetrics [export] - Задержки и ошибки запросов к панели"
+)
+GIVE_PROFILE_NOT_FOUND = Template(
+    "❌ <b>Профиль не найден:</b> {profile}\n\n"
+    "Доступные профили: {profiles}"
+)
+GIVE_IN_PROGRESS = Template("⏳ <b>Сервер для пользователя уже создается</b>\n\n{progress}")
+GIVE_SERVER_EXISTS = Template(
+    "❌ <b>У пользователя уже есть сервер!</b>\n\n"
+    "ID: {telegram_id}\n"
+    "Username: @{username}\n"
+    "Количество серверов: {count}"
+)
+GIVE_ACCEPTED = Template(
+    "⏳ <b>Заявка на выдачу сервера принята</b>\n\n"
+    "Пользователь: {first_name} (@{username})\n"
+    "Профиль: {profile}\n"
+    "Позиция в очереди: {position}"
+)
+ADMIN_LOGS_HEADER = "📝 <b>Последние действия администраторов:</b>\n\n"
+ADMIN_LOGS_EMPTY_TEXT = "📝 <b>Логи действий</b>\n\nНет записей"
+ADMIN_LOG_ENTRY = Template(
+    "👤 <b>{admin}</b>\n"
+    "Действие: {action}\n"
+    "Детали: {details}\n"
+    "Время: {created_at}\n\n"
+)
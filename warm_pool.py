@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import secrets
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from db.database import Database
+from pterodactyl_api import AllocationUnavailable, PterodactylAPI, PterodactylError
+from server_profiles import ServerProfile, ServerProfileRegistry
+from utils.credentials import CredentialGenerator
+
+logger = logging.getLogger(__name__)
+
+# Служебный пользователь панели, которому принадлежат серверы пула
+POOL_OWNER_EXTERNAL_ID = "warm-pool"
+POOL_OWNER_USERNAME = "warmpool"
+POOL_OWNER_EMAIL = "warm-pool@cloudspb.ru"
+
+
+def parse_hours(value: str) -> Optional[Tuple[int, int]]:
+    """Разобрать окно часов вида "2-8" (пустая строка - круглосуточно)"""
+    if not value:
+        return None
+    start, end = value.split("-")
+    return int(start) % 24, int(end) % 24
+
+
+class WarmPool:
+    """Пул заранее созданных приостановленных серверов
+
+    Серверы создаются от имени служебного пользователя панели и выдаются
+    сменой владельца, названия и external_id с последующим снятием приостановки,
+    так что пользователю не приходится ждать установки сервера.
+    """
+
+    def __init__(self, db: Database, pterodactyl_api: PterodactylAPI, profiles: ServerProfileRegistry,
+                 size: int = 0, profile_names: Optional[List[str]] = None,
+                 hours: Optional[Tuple[int, int]] = None, interval: float = 300.0):
+        self.db = db
+        self.pterodactyl_api = pterodactyl_api
+        self.profiles = profiles
+        self.size = size
+        self.profile_names = profile_names or [profiles.default_name]
+        self.hours = hours
+        self.interval = interval
+        self.owner_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Запустить пополнение пула"""
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Пул серверов запущен: {self.size} на профиль ({', '.join(self.profile_names)})")
+
+    async def stop(self) -> None:
+        """Остановить пополнение пула"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def is_offpeak(self, hour: Optional[int] = None) -> bool:
+        """Попадает ли час в окно пополнения пула"""
+        if not self.hours:
+            return True
+        hour = datetime.now().hour if hour is None else hour
+        start, end = self.hours
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def available(self, profile_name: str) -> bool:
+        """Есть ли в пуле готовый сервер профиля"""
+        return self.db.count_warm_servers().get(profile_name, {}).get('ready', 0) > 0
+
+    async def claim(self, telegram_id: int, profile_name: str, panel_user_id: int, server_name: str,
+                    external_id: str) -> Optional[Dict[str, Any]]:
+        """Выдать пользователю сервер из пула
+
+        Возвращает данные сервера или None, если пул пуст. При ошибке панели
+        выбрасывает PterodactylError: закрепление сохраняется и будет
+        продолжено повтором.
+        """
+        row = self.db.claim_warm_server(profile_name, telegram_id)
+        if not row:
+            return None
+
+        result = await self.pterodactyl_api.update_server_details(
+            row['panel_server_id'], server_name, panel_user_id, external_id
+        )
+        if not result:
+            raise PterodactylError(f"не удалось передать сервер пула {row['pterodactyl_id']}")
+        logger.info(f"Сервер пула {row['pterodactyl_id']} передан пользователю {telegram_id}")
+        return await self.activate(telegram_id, result)
+
+    async def activate(self, telegram_id: int, server_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Снять приостановку с переданного сервера пула и отметить его выданным"""
+        attributes = server_result.get('attributes', {})
+        if attributes.get('suspended'):
+            if not await self.pterodactyl_api.unsuspend_server(attributes.get('id')):
+                raise PterodactylError(f"не удалось снять приостановку сервера {attributes.get('identifier')}")
+            attributes['suspended'] = False
+        self.db.assign_warm_server(attributes.get('identifier'), telegram_id)
+        return server_result
+
+    def release(self, telegram_id: int) -> None:
+        """Вернуть в пул серверы, закрепленные за неудавшейся заявкой"""
+        released = self.db.release_warm_servers(telegram_id)
+        if released:
+            logger.info(f"Возвращено в пул серверов: {released}")
+
+    async def _loop(self) -> None:
+        """Цикл пополнения пула в часы низкой нагрузки"""
+        while True:
+            try:
+                if self.is_offpeak():
+                    await self.replenish()
+            except Exception as e:
+                logger.error(f"Ошибка пополнения пула серверов: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def replenish(self) -> int:
+        """Дополнить пул до заданного размера, вернуть число созданных серверов"""
+        if not await self._ensure_owner():
+            return 0
+
+        created = 0
+        counts = self.db.count_warm_servers()
+        for profile_name in self.profile_names:
+            profile = self.profiles.get(profile_name)
+            if not profile:
+                logger.warning(f"Профиль {profile_name} недоступен, пул не пополняется")
+                continue
+
+            # Сначала завершаем серверы, создание которых было прервано
+            pending = self.db.get_warm_servers(profile_name, 'creating')
+            missing = self.size - counts.get(profile_name, {}).get('ready', 0) - len(pending)
+            for _ in range(max(0, missing)):
+                external_id = f"pool-{secrets.token_hex(6)}"
+                pool_id = self.db.create_warm_server(profile_name, external_id)
+                if pool_id:
+                    pending.append({'id': pool_id, 'external_id': external_id})
+
+            for row in pending:
+                if not await self._create_server(profile, row):
+                    return created
+                created += 1
+        if created:
+            logger.info(f"Пул серверов пополнен на {created}")
+        return created
+
+    async def _ensure_owner(self) -> bool:
+        """Найти или создать служебного пользователя пула"""
+        if self.owner_id:
+            return True
+        try:
+            owner = await self.pterodactyl_api.get_user_by_external_id(POOL_OWNER_EXTERNAL_ID)
+        except PterodactylError as e:
+            logger.error(f"Не удалось найти владельца пула: {e}")
+            return False
+        if not owner:
+            owner = await self.pterodactyl_api.create_user(
+                email=POOL_OWNER_EMAIL,
+                username=POOL_OWNER_USERNAME,
+                first_name="Warm pool",
+                password=CredentialGenerator.generate_password(),
+                external_id=POOL_OWNER_EXTERNAL_ID
+            )
+        self.owner_id = owner.get('attributes', {}).get('id') if owner else None
+        return self.owner_id is not None
+
+    async def _create_server(self, profile: ServerProfile, row: Dict[str, Any]) -> bool:
+        """Создать (или найти после сбоя) сервер пула и приостановить его"""
+        try:
+            result = await self.pterodactyl_api.get_server_by_external_id(row['external_id'])
+        except PterodactylError as e:
+            logger.error(f"Не удалось проверить сервер пула {row['external_id']}: {e}")
+            return False
+
+        if not result:
+            # Allocation, зарезервированные заявками очереди, не занимаем
+            allocation_id = await self.pterodactyl_api.get_available_allocation(
+                profile.node, exclude=self.db.get_reserved_allocations()
+            )
+            if not allocation_id:
+                return False
+            try:
+                result = await self.pterodactyl_api.create_server(
+                    self.owner_id, f"pool_{row['external_id']}", allocation_id,
+                    external_id=row['external_id'], profile=profile
+                )
+            except AllocationUnavailable as e:
+                logger.warning(f"Сервер пула {row['external_id']} не создан: {e}")
+                return False
+            if not result:
+                return False
+
+        attributes = result.get('attributes', {})
+        self.db.update_warm_server(row['id'], panel_server_id=attributes.get('id'),
+                                   pterodactyl_id=attributes.get('identifier'))
+        if not attributes.get('suspended') and not await self.pterodactyl_api.suspend_server(attributes.get('id')):
+            return False
+        return self.db.update_warm_server(row['id'], status='ready')
@@ -0,0 +1,111 @@
+import hmac
+import json
+import logging
+from typing import Callable, List, Optional
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передает secret_token из setWebhook
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """Встроенный aiohttp сервер для приема обновлений через webhook
+
+    Обновления с верным секретом кладутся в update_queue приложения и
+    обрабатываются теми же обработчиками, что и при polling. /health (для
+    балансировщика) и, если передан render_metrics, метрики Prometheus на
+    /metrics отдаются отдельным служебным сервером, который не должен
+    быть доступен из интернета (по умолчанию слушает только loopback).
+    """
+
+    def __init__(self, application: Application, path: str, secret_token: str,
+                 render_metrics: Optional[Callable[[], str]] = None):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.render_metrics = render_metrics
+        self.received = 0
+        self.rejected = 0
+        # Адрес служебного сервера (/health, /metrics), если он запущен
+        self.health_url: Optional[str] = None
+        self._runners: List[web.AppRunner] = []
+
+    def build_app(self) -> web.Application:
+        """Маршруты публичного сервера: только прием обновлений"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        return app
+
+    def build_health_app(self) -> web.Application:
+        """Маршруты служебного сервера"""
+        app = web.Application()
+        app.router.add_get('/health', self.handle_health)
+        if self.render_metrics:
+            app.router.add_get('/metrics', self.handle_metrics)
+        return app
+
+    async def start(self, host: str = '0.0.0.0', port: int = 8080,
+                    health_host: str = '127.0.0.1', health_port: Optional[int] = None) -> str:
+        """Запустить сервер, вернуть адрес (порт 0 - любой свободный)
+
+        health_port - порт служебного сервера на health_host (None - не запускать).
+        """
+        url = await self._serve(self.build_app(), host, port)
+        logger.info(f"Webhook сервер слушает {url}{self.path}")
+        if health_port is not None:
+            self.health_url = await self._serve(self.build_health_app(), health_host, health_port)
+            logger.info(f"Health и метрики: {self.health_url}/health")
+        return url
+
+    async def _serve(self, app: web.Application, host: str, port: int) -> str:
+        runner = web.AppRunner(app)
+        await runner.setup()
+        self._runners.append(runner)
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        bound_host, bound_port = runner.addresses[0][:2]
+        return f"http://{bound_host}:{bound_port}"
+
+    async def stop(self) -> None:
+        """Остановить сервер"""
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners = []
+        self.health_url = None
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Принять обновление от Telegram"""
+        secret = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(secret.encode(), self.secret_token.encode()):
+            self.rejected += 1
+            logger.warning(f"Webhook: запрос с неверным секретом от {request.remote}")
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except (json.JSONDecodeError, ValueError, TypeError, KeyError) as e:
+            logger.error(f"Webhook: некорректное обновление: {e}")
+            return web.Response(status=400)
+
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """Состояние приложения"""
+        running = self.application.running
+        return web.json_response({
+            'status': 'ok' if running else 'stopped',
+            'pending_updates': self.application.update_queue.qsize(),
+            'received': self.received,
+            'rejected': self.rejected,
+        }, status=200 if running else 503)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """Метрики Prometheus"""
+        return web.Response(text=self.render_metrics(), content_type='text/plain')